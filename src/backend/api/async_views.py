@@ -0,0 +1,190 @@
+from asgiref.sync import sync_to_async
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import AnonymousUser
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils.decorators import classonlymethod
+from rest_framework.exceptions import APIException
+from rest_framework.request import Request
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+
+from apps.general.cache import aget_generations, aget_many, aset_many
+from apps.general.constants import CacheKey
+from apps.general.routers import read_primary_if_changed
+from apps.users.auth_cache import aget_auth_user
+from .mixins import build_validators, is_not_modified, set_validators
+
+User = get_user_model()
+
+JSON_CONTENT_TYPE = "application/json"
+
+
+async def aauthenticate(request):
+    """
+    Пользователь по JWT из заголовка `Authorization` или `None`.
+    Токен проверяется так же, как в `CachedJWTAuthentication`, пользователь
+    берется из кэша или загружается асинхронным запросом.
+    """
+    authentication = JWTAuthentication()
+    header = authentication.get_header(request)
+    raw_token = header and authentication.get_raw_token(header)
+    if not raw_token:
+        return None
+    try:
+        token = authentication.get_validated_token(raw_token)
+        user_id = token[api_settings.USER_ID_CLAIM]
+    except (InvalidToken, TokenError, KeyError):
+        return None
+    if api_settings.CHECK_REVOKE_TOKEN:
+        # отзыв токена проверяется по хэшу пароля из базы данных
+        user = await User.objects.filter(
+            **{api_settings.USER_ID_FIELD: user_id}
+        ).afirst()
+        if user is not None and token.get(
+            api_settings.REVOKE_TOKEN_CLAIM
+        ) != get_md5_hash_password(user.password):
+            return None
+    else:
+        user = await aget_auth_user(user_id)
+    if user is None or not user.is_active:
+        return None
+    return user
+
+
+def _render(view, request, *args, **kwargs):
+    response = view(request, *args, **kwargs)
+    if hasattr(response, "render"):
+        response.render()
+    return response
+
+
+class CachedReadView:
+    """
+    Асинхронное представление горячего пути чтения для режима ASGI.
+    GET отдается из кэша готовых ответов: пользователь проверяется по JWT
+    асинхронным запросом, поколения и тело ответа читаются асинхронным
+    клиентом Redis, поток не занимается. Перед ответом из кэша проверяются
+    права и ограничения частоты запросов представления. Остальные методы,
+    промахи кэша, ошибки аутентификации и доступа и браузерный API
+    обрабатывает исходное представление DRF в потоке.
+    """
+
+    def __init__(self, view_class, actions=None, public=False, per_user=False):
+        self.view_class = view_class
+        self.action = actions and actions.get("get")
+        self.public = public
+        self.per_user = per_user
+        self.view = (
+            view_class.as_view(actions) if actions else view_class.as_view()
+        )
+        self.sync_view = sync_to_async(_render)
+
+    @classonlymethod
+    def as_view(cls, view_class, actions=None, public=False, per_user=False):
+        read_view = cls(view_class, actions, public, per_user)
+
+        async def view(request, *args, **kwargs):
+            return await read_view.dispatch(request, *args, **kwargs)
+
+        view.csrf_exempt = True
+        return view
+
+    def get_view(self, request, user, kwargs):
+        """Экземпляр представления DRF для проверок и пространств имен"""
+        drf_request = Request(request)
+        drf_request.user = user or AnonymousUser()
+        return self.view_class(
+            action=self.action, request=drf_request, args=(), kwargs=kwargs
+        )
+
+    def has_permission(self, view):
+        """Права представления без объекта, как в `APIView.initial`"""
+        try:
+            view.check_permissions(view.request)
+        except APIException:
+            return False
+        return True
+
+    async def is_throttled(self, view):
+        """
+        Ограничения частоты запросов представления. Отказ не учитывается
+        ограничением, поэтому повторная проверка в DRF его не удваивает.
+        """
+        if not view.get_throttles():
+            return False
+        try:
+            await sync_to_async(view.check_throttles)(view.request)
+        except APIException:
+            return True
+        return False
+
+    def is_cacheable(self, request):
+        accept = request.headers.get("Accept", "")
+        return (
+            request.method == "GET"
+            and "text/html" not in accept
+            and "format" not in request.GET
+        )
+
+    async def get_allowed_view(self, request, kwargs):
+        """
+        Представление DRF для пользователя из JWT или `None`, если запрос
+        не аутентифицирован или прав недостаточно: ответ об ошибке
+        формирует DRF.
+        """
+        user = None
+        if not self.public:
+            user = await aauthenticate(request)
+            if user is None:
+                return None
+        view = self.get_view(request, user, kwargs)
+        if not self.has_permission(view):
+            return None
+        return view
+
+    async def dispatch(self, request, *args, **kwargs):
+        view = None
+        if self.is_cacheable(request):
+            view = await self.get_allowed_view(request, kwargs)
+        if view is None:
+            return await self.sync_view(self.view, request, *args, **kwargs)
+
+        path = request.get_full_path()
+        generations = await aget_generations(
+            *view.get_conditional_namespaces()
+        )
+        read_primary_if_changed(generations)
+        validators = build_validators(path, view.request.user.pk, generations)
+        if is_not_modified(request.headers, validators):
+            if await self.is_throttled(view):
+                return await self.sync_view(
+                    self.view, request, *args, **kwargs
+                )
+            return set_validators(HttpResponseNotModified(), validators)
+
+        # общий для всех пользователей ответ, кроме `per_user`
+        if not self.per_user:
+            validators_key = build_validators(path, None, generations)
+        else:
+            validators_key = validators
+        cache_key = CacheKey.RESPONSE.format(
+            etag=validators_key["ETag"].strip('"')
+        )
+        content = (await aget_many([cache_key])).get(cache_key)
+        if content is None:
+            response = await self.sync_view(
+                self.view, request, *args, **kwargs
+            )
+            if response.status_code != 200 or not response.get(
+                "Content-Type", ""
+            ).startswith(JSON_CONTENT_TYPE):
+                return response
+            content = response.content
+            await aset_many({cache_key: content})
+        elif await self.is_throttled(view):
+            return await self.sync_view(self.view, request, *args, **kwargs)
+        return set_validators(
+            HttpResponse(content, content_type=JSON_CONTENT_TYPE), validators
+        )
@@ -1,8 +1,40 @@
 import base64
+import re
 
+from django.conf import settings
 from django.core.files.base import ContentFile
+from django.core.files.uploadedfile import UploadedFile
+from PIL import Image
 from rest_framework import fields
 
+from apps.general.storage import HASH_LENGTH
+from apps.users.constants import (
+    AVATAR_FORMATS,
+    AVATAR_MAX_PIXELS,
+    AVATAR_UPLOAD_TYPES,
+)
+from apps.users.thumbnails import thumbnail_url
+from apps.users.uploads import avatar_storage, upload_prefix
+
+
+def avatar_format(file):
+    """
+    Формат аватара по заголовку изображения, пиксели не декодируются.
+    `None`, если это не изображение допустимого формата и размера.
+    """
+    try:
+        with Image.open(file) as image:
+            image_format, (width, height) = image.format, image.size
+    except (OSError, Image.DecompressionBombError):
+        return None
+    finally:
+        file.seek(0)
+    if image_format not in AVATAR_FORMATS or (
+        width * height > AVATAR_MAX_PIXELS
+    ):
+        return None
+    return image_format
+
 
 class Base64ImageField(fields.ImageField):
     """Поле для декодировки изображений"""
@@ -11,10 +43,104 @@ class Base64ImageField(fields.ImageField):
         if isinstance(data, str) and data.startswith("data:image"):
             img_format, img_str = data.split(";base64,")
             ext = img_format.split("/")[-1]
-            file_name = self.root.instance.email.split("@", 1)[0]
             data = ContentFile(
                 base64.b64decode(img_str),
-                name=f"{file_name}.{ext}",
+                name=self.get_file_name(ext),
             )
 
         return super().to_internal_value(data)
+
+    def get_file_name(self, ext):
+        return f"{self.root.instance.email.split('@', 1)[0]}.{ext}"
+
+
+class AvatarImageField(Base64ImageField):
+    """
+    Аватар из base64-строки или файла `multipart/form-data`.
+    Загруженный файл проверяется только по заголовку изображения: формат
+    и размеры читаются без декодирования пикселей.
+    """
+
+    def to_internal_value(self, data):
+        if not isinstance(data, UploadedFile):
+            return super().to_internal_value(data)
+
+        data = fields.FileField.to_internal_value(self, data)
+        image_format = avatar_format(data)
+        if image_format is None:
+            self.fail("invalid_image")
+        data.name = self.get_file_name(image_format.lower())
+        return data
+
+
+class AvatarKeyField(fields.CharField):
+    """
+    Ключ аватара, загруженного клиентом напрямую в хранилище.
+    Ключ должен быть из каталога загрузок текущего пользователя и
+    называться по хэшу содержимого, тип содержимого — совпадать с
+    расширением. Проверяются только метаданные, файл не читается.
+    Возвращается файл хранилища с хэшем из ключа: при сохранении он
+    копируется под имя по хэшу.
+    """
+
+    upload_name = re.compile(
+        rf"(?P<hash>[0-9a-f]{{{HASH_LENGTH}}})"
+        rf"\.(?P<ext>{'|'.join(AVATAR_UPLOAD_TYPES.values())})"
+    )
+
+    default_error_messages = {
+        "invalid_key": "Загрузка не найдена.",
+        "too_large": "Файл больше {max_size} байт.",
+        "invalid_image": fields.ImageField.default_error_messages[
+            "invalid_image"
+        ],
+    }
+
+    def to_internal_value(self, data):
+        key = super().to_internal_value(data)
+        storage = avatar_storage()
+        prefix = upload_prefix(self.root.instance.pk)
+        match = key.startswith(prefix) and self.upload_name.fullmatch(
+            key[len(prefix) :]
+        )
+        info = match and storage.upload_info(key)
+        if not info:
+            self.fail("invalid_key")
+        size, content_type = info
+        max_size = settings.AVATAR_MAX_UPLOAD_SIZE
+        if size > max_size:
+            self.fail("too_large", max_size=max_size)
+        if AVATAR_UPLOAD_TYPES.get(content_type) != match["ext"]:
+            self.fail("invalid_image")
+
+        file = storage.open(key)
+        # файловое хранилище называет открытый файл полным путем
+        file.name = key
+        # хэш сверен хранилищем при загрузке
+        file.content_hash = match["hash"]
+        return file
+
+
+class ThumbnailImageField(fields.ImageField):
+    """
+    Аватар с URL миниатюры размера `size`.
+    `thumbnails_source` берется у объекта, которому принадлежит изображение
+    (`user` для `source="user.image"`), пока миниатюр нет — URL оригинала.
+    """
+
+    def __init__(self, size, **kwargs):
+        self.size = size
+        kwargs["read_only"] = True
+        super().__init__(**kwargs)
+
+    def get_attribute(self, instance):
+        owner = fields.get_attribute(instance, self.source_attrs[:-1])
+        image = getattr(owner, self.source_attrs[-1])
+        return image, getattr(owner, "thumbnails_source", "")
+
+    def to_representation(self, value):
+        url = thumbnail_url(*value, self.size)
+        request = self.context.get("request")
+        if url is not None and request is not None:
+            return request.build_absolute_uri(url)
+        return url
@@ -0,0 +1,94 @@
+import re
+from functools import reduce
+from operator import add, and_, or_
+
+from django.conf import settings
+from django.contrib.postgres.search import TrigramWordSimilarity
+from django.db import connection
+from django.db.models import Q
+from django.db.models.functions import Greatest
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import ValidationError
+from rest_framework.filters import BaseFilterBackend, SearchFilter
+
+CHANGED_SINCE_PARAM = "changed_since"
+INVALID_CHANGED_SINCE = "Ожидается дата и время в формате ISO 8601."
+REQUIRED_CHANGED_SINCE = "Обязательный параметр."
+
+
+class PeopleSearchFilter(SearchFilter):
+    """
+    Поиск людей по ФИО, должности и городу.
+    В PostgreSQL используются GIN-индексы `pg_trgm`: каждое слово запроса
+    ищется по началу значения или по похожести слов (с опечатками),
+    результаты ранжируются по похожести. На других базах, в том числе
+    SQLite в тестах, работает обычный поиск по `search_fields`.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        fields = getattr(view, "trigram_search_fields", None)
+        terms = self.get_search_terms(request)
+        if connection.vendor != "postgresql" or not fields or not terms:
+            return super().filter_queryset(request, queryset, view)
+
+        conditions = []
+        ranks = []
+        for term in terms:
+            prefix = rf"^{re.escape(term)}"
+            conditions.append(
+                reduce(
+                    or_,
+                    (
+                        Q(**{f"{field}__trigram_word_similar": term})
+                        | Q(**{f"{field}__iregex": prefix})
+                        for field in fields
+                    ),
+                )
+            )
+            ranks.append(
+                Greatest(
+                    *(TrigramWordSimilarity(term, field) for field in fields)
+                )
+                if len(fields) > 1
+                else TrigramWordSimilarity(term, fields[0])
+            )
+
+        return (
+            queryset.filter(reduce(and_, conditions))
+            .alias(search_rank=reduce(add, ranks))
+            .order_by(
+                "-search_rank",
+                *(queryset.query.order_by or queryset.model._meta.ordering),
+            )
+        )
+
+
+class ChangedSinceFilter(BaseFilterBackend):
+    """
+    Только строки, измененные начиная с `?changed_since=`.
+    Поле времени изменения задается атрибутом `changed_since_field`.
+    """
+
+    def get_changed_since(self, request):
+        value = request.query_params.get(CHANGED_SINCE_PARAM)
+        if not value:
+            return None
+        try:
+            changed_since = parse_datetime(value)
+        except ValueError:
+            changed_since = None
+        if changed_since is None:
+            raise ValidationError({CHANGED_SINCE_PARAM: INVALID_CHANGED_SINCE})
+        if settings.USE_TZ and timezone.is_naive(changed_since):
+            changed_since = timezone.make_aware(changed_since)
+        elif not settings.USE_TZ and timezone.is_aware(changed_since):
+            changed_since = timezone.make_naive(changed_since)
+        return changed_since
+
+    def filter_queryset(self, request, queryset, view):
+        changed_since = self.get_changed_since(request)
+        if changed_since is None:
+            return queryset
+        field = getattr(view, "changed_since_field", "updated")
+        return queryset.filter(**{f"{field}__gte": changed_since})
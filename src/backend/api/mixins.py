@@ -0,0 +1,129 @@
+import hashlib
+import time
+
+from django.core.cache import cache
+from django.utils.http import (
+    http_date,
+    parse_etags,
+    parse_http_date_safe,
+    quote_etag,
+)
+from rest_framework import status
+from rest_framework.response import Response
+
+from apps.general.cache import get_generations, versioned_key
+from apps.general.routers import read_primary_if_changed
+
+
+class NotModified(Exception):
+    """Ресурс не изменился с версии клиента"""
+
+
+def build_validators(path, user_id, generations):
+    """
+    `ETag` и `Last-Modified` ответа по поколениям его пространств имен.
+    Поколения — отметки времени инвалидации в наносекундах. Пока секунда
+    последней инвалидации не прошла, в ней возможна еще одна, и дата
+    с точностью до секунды ее не различит: `Last-Modified` не отдается,
+    `If-Modified-Since` не учитывается, остается `ETag`.
+    """
+    version = ":".join((path, str(user_id), *map(str, generations)))
+    validators = {
+        "ETag": quote_etag(hashlib.md5(version.encode()).hexdigest()),
+    }
+    last_modified = max(generations) // 10**9
+    if last_modified < time.time_ns() // 10**9:
+        validators["Last-Modified"] = http_date(last_modified)
+    return validators
+
+
+def is_not_modified(headers, validators):
+    """
+    Совпадает ли версия клиента из условных заголовков с текущей.
+    При `If-None-Match` дата не учитывается (RFC 9110, 13.1.3).
+    """
+    if_none_match = headers.get("If-None-Match")
+    if if_none_match:
+        etags = parse_etags(if_none_match)
+        return "*" in etags or validators["ETag"] in etags
+    if "Last-Modified" not in validators:
+        return False
+    if_modified_since = parse_http_date_safe(headers.get("If-Modified-Since"))
+    last_modified = parse_http_date_safe(validators["Last-Modified"])
+    return if_modified_since is not None and last_modified <= if_modified_since
+
+
+def set_validators(response, validators):
+    for header, value in validators.items():
+        response[header] = value
+    # браузер переспрашивает сервер вместо эвристического кэша
+    response["Cache-Control"] = "private, no-cache"
+    return response
+
+
+class ConditionalGetMixin:
+    """
+    Условные GET-запросы по `ETag` и `Last-Modified`.
+    Валидаторы строятся из поколений пространств имен кэша, от которых
+    зависит ответ: неизмененный ресурс отдается с 304 после проверки прав,
+    без сериализации и запросов к базе данных.
+    """
+
+    conditional_namespaces = ()
+    conditional_validators = None
+    conditional_generations = None
+
+    def get_conditional_namespaces(self):
+        return self.conditional_namespaces
+
+    def get_conditional_validators(self, request):
+        namespaces = self.get_conditional_namespaces()
+        if request.method not in ("GET", "HEAD") or not namespaces:
+            return None
+        generations = get_generations(*namespaces)
+        read_primary_if_changed(generations)
+        self.conditional_generations = generations
+        return build_validators(
+            request.get_full_path(), request.user.pk, generations
+        )
+
+    def get_cached_data(self, key, build):
+        """
+        Сериализованные данные ответа из кэша.
+        Ключ версионируется поколениями, уже прочитанными для валидаторов:
+        теплый запрос — одно чтение поколений и одно чтение данных.
+        """
+        cache_key = versioned_key(
+            key,
+            *self.get_conditional_namespaces(),
+            generations=self.conditional_generations,
+        )
+        data = cache.get(cache_key)
+        if data is None:
+            data = build()
+            cache.set(cache_key, data)
+        return data
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        self.conditional_validators = self.get_conditional_validators(request)
+        if self.conditional_validators and is_not_modified(
+            request.headers, self.conditional_validators
+        ):
+            raise NotModified
+
+    def handle_exception(self, exc):
+        if isinstance(exc, NotModified):
+            return Response(status=status.HTTP_304_NOT_MODIFIED)
+        return super().handle_exception(exc)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(
+            request, response, *args, **kwargs
+        )
+        if self.conditional_validators and response.status_code in (
+            status.HTTP_200_OK,
+            status.HTTP_304_NOT_MODIFIED,
+        ):
+            set_validators(response, self.conditional_validators)
+        return response
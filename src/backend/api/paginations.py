@@ -0,0 +1,116 @@
+import base64
+import json
+from operator import attrgetter
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from django.db.models.constants import LOOKUP_SEP
+from rest_framework.exceptions import NotFound
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+INVALID_CURSOR = "Неверный курсор."
+
+
+def keyset_filter(ordering, values):
+    """
+    Условие `(f1, f2, ..., fn) > (v1, v2, ..., vn)`.
+    Первое поле дополнительно ограничено `>=`, чтобы составной индекс
+    использовался для поиска диапазона.
+    """
+    condition = Q()
+    for i, field in enumerate(ordering):
+        condition |= Q(
+            **dict(zip(ordering[:i], values[:i])),
+            **{f"{field}__gt": values[i]},
+        )
+    return Q(**{f"{ordering[0]}__gte": values[0]}) & condition
+
+
+def get_field(model, path):
+    """Поле модели по пути сортировки `user__last_name`"""
+    for name in path.split(LOOKUP_SEP):
+        field = model._meta.get_field(name)
+        model = field.related_model
+    return field
+
+
+class KeysetPaginationMixin:
+    """
+    Необязательная keyset-пагинация поверх постраничной.
+    Включается параметром `cursor` (пустым для первой страницы): страница
+    выбирается по значениям сортировки последней строки предыдущей,
+    без COUNT(*) и OFFSET.
+    """
+
+    cursor_query_param = "cursor"
+    keyset_ordering = ()
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.keyset = self.cursor_query_param in request.query_params
+        if not self.keyset:
+            return super().paginate_queryset(queryset, request, view)
+
+        self.request = request
+        page_size = self.get_page_size(request)
+        queryset = queryset.order_by(*self.keyset_ordering)
+        values = self.decode_cursor(request, queryset.model)
+        if values is not None:
+            queryset = queryset.filter(
+                keyset_filter(self.keyset_ordering, values)
+            )
+
+        rows = list(queryset[: page_size + 1])
+        self.next_values = None
+        if len(rows) > page_size:
+            rows = rows[:page_size]
+            self.next_values = self.get_keyset_values(rows[-1])
+        return rows
+
+    def get_paginated_response(self, data):
+        if not self.keyset:
+            return super().get_paginated_response(data)
+        return Response({"next": self.get_next_cursor_link(), "results": data})
+
+    def get_keyset_values(self, obj):
+        return [
+            attrgetter(field.replace("__", "."))(obj)
+            for field in self.keyset_ordering
+        ]
+
+    def get_next_cursor_link(self):
+        if self.next_values is None:
+            return None
+        cursor = base64.urlsafe_b64encode(
+            json.dumps(self.next_values).encode()
+        ).decode()
+        return replace_query_param(
+            self.request.build_absolute_uri(), self.cursor_query_param, cursor
+        )
+
+    def decode_cursor(self, request, model):
+        """
+        Значения сортировки из курсора, приведенные к типам полей.
+        Неверный курсор, в том числе со списками или объектами вместо
+        значений, дает 404.
+        """
+        cursor = request.query_params[self.cursor_query_param]
+        if not cursor:
+            return None
+        try:
+            values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        except (TypeError, ValueError):
+            raise NotFound(INVALID_CURSOR)
+        if not isinstance(values, list) or len(values) != len(
+            self.keyset_ordering
+        ):
+            raise NotFound(INVALID_CURSOR)
+        cleaned = []
+        for field, value in zip(self.keyset_ordering, values):
+            if isinstance(value, bool) or not isinstance(value, (str, int)):
+                raise NotFound(INVALID_CURSOR)
+            try:
+                cleaned.append(get_field(model, field).to_python(value))
+            except ValidationError:
+                raise NotFound(INVALID_CURSOR)
+        return cleaned
@@ -0,0 +1,57 @@
+from django.conf import settings
+from django.core.files.uploadhandler import TemporaryFileUploadHandler
+from rest_framework import parsers, status
+from rest_framework.exceptions import APIException
+
+# запас на заголовки частей и текстовые поля формы
+MULTIPART_OVERHEAD = 64 * 1024
+
+
+class UploadTooLarge(APIException):
+    status_code = status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+    default_detail = "Файл слишком большой."
+    default_code = "upload_too_large"
+
+
+class LimitedUploadHandler(TemporaryFileUploadHandler):
+    """
+    Файлы пишутся во временный файл на диске по частям, без копии в памяти.
+    Загрузка прерывается, как только файл превысит `max_size` байт.
+    """
+
+    def __init__(self, request, max_size):
+        super().__init__(request)
+        self.max_size = max_size
+        self.received = 0
+
+    def handle_raw_input(self, input_data, META, content_length, *args):
+        # заведомо большое тело отклоняется до чтения
+        if content_length > self.max_size + MULTIPART_OVERHEAD:
+            raise UploadTooLarge
+
+    def new_file(self, *args, **kwargs):
+        self.received = 0
+        super().new_file(*args, **kwargs)
+
+    def receive_data_chunk(self, raw_data, start):
+        self.received += len(raw_data)
+        if self.received > self.max_size:
+            self.file.close()
+            raise UploadTooLarge
+        return super().receive_data_chunk(raw_data, start)
+
+
+class LimitedMultiPartParser(parsers.MultiPartParser):
+    """
+    `multipart/form-data` с ограничением размера файла.
+    Предел в байтах берется из настройки, имя которой задает
+    `max_size_setting` наследника.
+    """
+
+    max_size_setting = None
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        request = parser_context["request"]
+        max_size = getattr(settings, self.max_size_setting)
+        request.upload_handlers = [LimitedUploadHandler(request, max_size)]
+        return super().parse(stream, media_type, parser_context)
@@ -1,6 +1,26 @@
 from rest_framework import serializers
 
 
+class FacetValueSerializer(serializers.Serializer):
+    value = serializers.CharField()
+    count = serializers.IntegerField()
+
+
+class FacetsSerializer(serializers.Serializer):
+    cities = FacetValueSerializer(many=True)
+    departments = FacetValueSerializer(many=True)
+    positions = FacetValueSerializer(many=True)
+
+    class Meta:
+        swagger_schema_fields = {
+            "example": {
+                "cities": [{"value": "Краснодар", "count": 12}],
+                "departments": [{"value": "Backend", "count": 30}],
+                "positions": [{"value": "Backend-разработчик", "count": 25}],
+            },
+        }
+
+
 class FilterSerializer(serializers.Serializer):
     cities = serializers.ListField(child=serializers.CharField())
     departments = serializers.ListField(child=serializers.CharField())
@@ -26,3 +46,26 @@ class FilterSerializer(serializers.Serializer):
                 ],
             },
         }
+
+
+class DeletedSerializer(serializers.Serializer):
+    projects = serializers.ListField(child=serializers.IntegerField())
+    teams = serializers.ListField(child=serializers.IntegerField())
+    members = serializers.ListField(child=serializers.IntegerField())
+    users = serializers.ListField(child=serializers.IntegerField())
+
+    class Meta:
+        swagger_schema_fields = {
+            "example": {
+                "projects": [12],
+                "teams": [],
+                "members": [40, 41],
+                "users": [],
+            },
+        }
+
+
+class SuggestPersonSerializer(serializers.Serializer):
+    id = serializers.IntegerField()
+    full_name = serializers.CharField()
+    position = serializers.CharField(allow_null=True)
@@ -1,7 +1,22 @@
+from django.conf import settings
 from django.urls import path
 
+from api.async_views import CachedReadView
 from . import views
 
 urlpatterns = [
     path("filters/", views.FilterViewSet.as_view(), name="filters"),
+    path("deleted/", views.DeletedView.as_view(), name="deleted"),
+    path(
+        "suggest/people/",
+        views.SuggestPeopleView.as_view(),
+        name="suggest-people",
+    ),
 ]
+
+if settings.ASYNC_VIEWS:
+    urlpatterns[0] = path(
+        "filters/",
+        CachedReadView.as_view(views.FilterViewSet, public=True),
+        name="filters",
+    )
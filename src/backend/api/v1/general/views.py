@@ -1,60 +1,110 @@
-from django.core.cache import cache
-from django.db.models import Q
+from drf_yasg import openapi
 from drf_yasg.utils import swagger_auto_schema
 from rest_framework import permissions, views
+from rest_framework.exceptions import ValidationError
 from rest_framework.response import Response
 
-from apps.projects.models import Department
-from apps.users.models import Profile
-from .serializers import FilterSerializer
+from api.filters import (
+    CHANGED_SINCE_PARAM,
+    REQUIRED_CHANGED_SINCE,
+    ChangedSinceFilter,
+)
+from api.mixins import ConditionalGetMixin
+from apps.general.constants import DELETION_LOG, CacheNamespace
+from apps.general.models import Deletion
+from apps.projects.facets import get_facets
+from apps.projects.models import MemberDirectory
+from apps.users.constants import SUGGEST_LIMIT, SUGGEST_MAX_LIMIT
+from apps.users.suggest import people_index
+from .serializers import (
+    DeletedSerializer,
+    FilterSerializer,
+    SuggestPersonSerializer,
+)
 
 
-class FilterViewSet(views.APIView):
+class FilterViewSet(ConditionalGetMixin, views.APIView):
+    """Значения фильтров списка участников из счетчиков фасетов"""
+
     permission_classes = [permissions.AllowAny]
+    conditional_namespaces = (CacheNamespace.MEMBERS,)
     swagger_tags = ["filter"]
 
-    def get_cached_values(
-        self, cache_key, *, lookup_field, model, exclude=None
-    ):
-        res = cache.get(cache_key)
-        if res is None:
-            qs = model.objects
-            if exclude is not None:
-                ex = Q()
-                for k, v in exclude.items():
-                    ex |= Q(**{k: v})
-                qs = qs.exclude(ex)
-            res = set(qs.values_list(lookup_field, flat=True))
-            cache.set(cache_key, res)
-        return sorted(res)
-
     @swagger_auto_schema(
         responses={200: FilterSerializer()},
         security=[],
     )
     def get(self, request, format=None):
-        cities = self.get_cached_values(
-            "cities",
-            lookup_field="city",
-            model=Profile,
-            exclude={"city": ""},
-        )
-        positions = self.get_cached_values(
-            "positions",
-            lookup_field="position",
-            model=Profile,
-            exclude={"position__isnull": True, "position": ""},
-        )
-        departments = self.get_cached_values(
-            "departments",
-            lookup_field="name",
-            model=Department,
-        )
+        facets = get_facets(MemberDirectory.objects.all())
         data = {
-            "cities": cities,
-            "positions": positions,
-            "departments": departments,
+            name: [item["value"] for item in values]
+            for name, values in facets.items()
         }
         serializer = FilterSerializer(data=data)
         serializer.is_valid(raise_exception=True)
         return Response(serializer.data)
+
+
+class DeletedView(views.APIView):
+    """
+    ID строк, удаленных начиная с `?changed_since=`, по спискам.
+    Вместе с `?changed_since=` списков дает полную дельту для синхронизации.
+    """
+
+    swagger_tags = ["deleted"]
+
+    @swagger_auto_schema(
+        manual_parameters=[
+            openapi.Parameter(
+                CHANGED_SINCE_PARAM,
+                openapi.IN_QUERY,
+                type=openapi.TYPE_STRING,
+                format=openapi.FORMAT_DATETIME,
+                required=True,
+            ),
+        ],
+        responses={200: DeletedSerializer()},
+    )
+    def get(self, request, format=None):
+        changed_since = ChangedSinceFilter().get_changed_since(request)
+        if changed_since is None:
+            raise ValidationError(
+                {CHANGED_SINCE_PARAM: REQUIRED_CHANGED_SINCE}
+            )
+        data = {resource: [] for resource in DELETION_LOG}
+        rows = (
+            Deletion.objects.filter(deleted__gte=changed_since)
+            .order_by("deleted")
+            .values_list("resource", "object_id")
+        )
+        for resource, object_id in rows:
+            if resource in data and object_id not in data[resource]:
+                data[resource].append(object_id)
+        return Response(data)
+
+
+class SuggestPeopleView(views.APIView):
+    """
+    Подсказки людей по началу ФИО или имени.
+    Отвечает из индекса в памяти процесса, без запросов к базе данных.
+    """
+
+    swagger_tags = ["suggest"]
+
+    @swagger_auto_schema(
+        manual_parameters=[
+            openapi.Parameter("q", openapi.IN_QUERY, type=openapi.TYPE_STRING),
+            openapi.Parameter(
+                "limit", openapi.IN_QUERY, type=openapi.TYPE_INTEGER
+            ),
+        ],
+        responses={200: SuggestPersonSerializer(many=True)},
+    )
+    def get(self, request, format=None):
+        try:
+            limit = int(request.query_params.get("limit", SUGGEST_LIMIT))
+        except ValueError:
+            limit = SUGGEST_LIMIT
+        limit = min(max(limit, 1), SUGGEST_MAX_LIMIT)
+        query = request.query_params.get("q", "")
+        return Response(people_index.search(query, limit))
@@ -2,3 +2,9 @@ MEMBER_PAGE_SIZE = 12
 SUBORDINATES = "subordinates"
 WITHOUT_PARENT = "without_parent"
 MAX_DEEP_SUBORDINATES = 12
+MEMBER_ORDERING = (
+    "last_name",
+    "first_name",
+    "middle_name",
+    "member_id",
+)
@@ -1,22 +1,20 @@
 from django_filters.rest_framework import CharFilter, FilterSet
 
-from apps.projects.models import Member
+from apps.projects.models import MemberDirectory
+
+
+class LowerCharFilter(CharFilter):
+    """Точное совпадение с колонкой, хранящейся в нижнем регистре"""
+
+    def filter(self, qs, value):
+        return super().filter(qs, value.lower() if value else value)
 
 
 class MemberFilter(FilterSet):
-    position = CharFilter(
-        field_name="user__profile__position",
-        lookup_expr="iexact",
-    )
-    city = CharFilter(
-        field_name="user__profile__city",
-        lookup_expr="iexact",
-    )
-    department = CharFilter(
-        field_name="department__name",
-        lookup_expr="iexact",
-    )
+    position = LowerCharFilter(field_name="position_lower")
+    city = LowerCharFilter(field_name="city_lower")
+    department = LowerCharFilter(field_name="department_lower")
 
     class Meta:
-        model = Member
+        model = MemberDirectory
         fields = ("department", "position", "city")
@@ -1,7 +1,9 @@
 from rest_framework.pagination import PageNumberPagination
 
-from .constants import MEMBER_PAGE_SIZE
+from api.paginations import KeysetPaginationMixin
+from .constants import MEMBER_ORDERING, MEMBER_PAGE_SIZE
 
 
-class MemberPagination(PageNumberPagination):
+class MemberPagination(KeysetPaginationMixin, PageNumberPagination):
     page_size = MEMBER_PAGE_SIZE
+    keyset_ordering = MEMBER_ORDERING
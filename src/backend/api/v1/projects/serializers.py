@@ -1,17 +1,24 @@
 from collections import defaultdict
 
 from django.contrib.auth import get_user_model
-from django.core.cache import cache
+from django.db import transaction
 from django.utils import timezone
 from drf_yasg.utils import swagger_serializer_method
 from rest_framework import serializers
 
-from api.fields import Base64ImageField
+from api.fields import ThumbnailImageField
 from api.v1.projects.constants import MAX_DEEP_SUBORDINATES
-from api.v1.projects.utils import get_tree
-from apps.general.constants import CacheKey
-from apps.projects.constants import GREATER_THAN_ENDED_DATE, LESS_THAN_TODAY
-from apps.projects.models import Member, Project, Team
+from api.v1.projects.utils import get_max_deep, get_tree
+from apps.general.cache import invalidate
+from apps.general.constants import CacheNamespace
+from apps.projects.constants import (
+    GREATER_THAN_ENDED_DATE,
+    LESS_THAN_TODAY,
+    MEMBER_MOVE_FIELDS,
+)
+from apps.projects.models import Member, MemberDirectory, Project, Team
+from apps.projects.trees import get_team_tree, move_member_nodes
+from apps.users.constants import THUMBNAIL_LIST_SIZE, THUMBNAIL_TREE_SIZE
 
 User = get_user_model()
 
@@ -41,7 +48,7 @@ class TeamShortSerializer(serializers.ModelSerializer):
 class MemberTeamSerializer(serializers.ModelSerializer):
     """Сериалайзер для отображения структуры команды"""
 
-    image = Base64ImageField(source="user.image")
+    image = ThumbnailImageField(THUMBNAIL_TREE_SIZE, source="user.image")
     subordinates = serializers.ListField(read_only=True)
     without_parent = serializers.ListField(read_only=True)
     full_name = serializers.SerializerMethodField(read_only=True)
@@ -167,19 +174,14 @@ class ProjectStatusSerializer(serializers.ModelSerializer):
 
 
 class MemberSerializer(serializers.ModelSerializer):
-    """Сериалайзер сотрудников"""
+    """Сериалайзер сотрудников из справочника участников"""
 
-    department = serializers.SlugRelatedField(
-        slug_field="name", read_only=True
-    )
-    image = Base64ImageField(source="user.image")
+    id = serializers.IntegerField(source="member_id", read_only=True)
     full_name = serializers.SerializerMethodField(read_only=True)
-    position = serializers.CharField(
-        source="user.profile.position", read_only=True
-    )
+    image = ThumbnailImageField(THUMBNAIL_LIST_SIZE)
 
     class Meta:
-        model = Member
+        model = MemberDirectory
         fields = (
             "id",
             "full_name",
@@ -189,7 +191,7 @@ class MemberSerializer(serializers.ModelSerializer):
         )
 
     def get_full_name(self, obj):
-        return obj.user.full_name()
+        return obj.full_name()
 
 
 class MemberTreeSerializer(serializers.ModelSerializer):
@@ -224,48 +226,108 @@ class MemberTreeSerializer(serializers.ModelSerializer):
     def update(self, instance, validated_data):
         member = validated_data.get("member_id")
         parent = validated_data.get("parent_id")
-        member_id = member.id
-        parent_id = parent.id
+        with transaction.atomic():
+            locked = self.lock_members(instance, member, parent)
+            if not all(m.path for m in locked.values()):
+                Member.objects.rebuild_paths(instance.id)
+                locked = self.lock_members(instance, member, parent)
+            member, parent = locked[member.id], locked[parent.id]
+
+            if member.is_ancestor_of(parent):
+                raise serializers.ValidationError(
+                    "Нельзя сменить руководителя, "
+                    "который находится в подчинении."
+                )
+
+            member.parent = parent
+            member.save(update_fields=MEMBER_MOVE_FIELDS)
+        return instance
 
-        members = cache.get(
-            CacheKey.MEMBERS_TEAM_BY_ID.format(team_id=instance.id)
+    def lock_members(self, team, *members):
+        """Актуальные пути участников с блокировкой строк в транзакции"""
+        locked = Member.objects.select_for_update().in_bulk(
+            [m.id for m in members]
         )
-        if members is None:
-            members = instance.members.values_list("parent_id", "id")
-            cache.set(
-                CacheKey.MEMBERS_TEAM_BY_ID.format(team_id=instance.id),
-                members,
-            )
+        for member in members:
+            if member.id not in locked or locked[member.id].team_id != team.id:
+                raise serializers.ValidationError(
+                    f"Участник `{member}`, не привязан к этой команде."
+                )
+        return locked
 
-        tree = defaultdict(list)
-        for p_id, pk in members:
-            tree[p_id].append(pk)
 
-        if parent_id not in tree:
-            raise serializers.ValidationError(
-                f"Участник `{parent}`, не привязан к этой команде."
+class MemberMoveListSerializer(serializers.ListSerializer):
+    """
+    Массовое изменение позиций участников команды.
+    Перемещения проверяются по порядку на одном снимке дерева команды.
+    """
+
+    def to_internal_value(self, data):
+        # ошибки по каждому перемещению, как и ошибки полей элементов списка
+        attrs = super().to_internal_value(data)
+        parents = dict(
+            self.instance.members.select_for_update().values_list(
+                "id", "parent_id"
             )
-        children = set()
+        )
+        errors = [{} for _ in attrs]
+        for move, error in zip(attrs, errors):
+            member_id, parent_id = move["member_id"], move["parent_id"]
+            if member_id not in parents or parent_id not in parents:
+                error["member_id"] = "Участник не привязан к этой команде."
+            elif member_id == parent_id:
+                error["member_id"] = (
+                    "Участник не может быть в подчинении у себя же."
+                )
+            elif self.is_subordinate(parents, parent_id, member_id):
+                error["parent_id"] = (
+                    "Нельзя сменить руководителя, "
+                    "который находится в подчинении."
+                )
+            else:
+                parents[member_id] = parent_id
+
+        if any(errors):
+            raise serializers.ValidationError(errors)
+        return attrs
 
-        def dfs(_id):
-            if _id in children:
-                return
+    @staticmethod
+    def is_subordinate(parents, member_id, supervisor_id):
+        seen = set()
+        while member_id is not None and member_id not in seen:
+            if member_id == supervisor_id:
+                return True
+            seen.add(member_id)
+            member_id = parents[member_id]
+        return False
 
-            children.add(_id)
-            for child in tree[_id]:
-                dfs(child)
+    def update(self, instance, validated_data):
+        moved = {
+            move["member_id"]: move["parent_id"] for move in validated_data
+        }
+        now = timezone.now()
+        Member.objects.bulk_update(
+            [
+                Member(id=pk, parent_id=parent_id, updated=now)
+                for pk, parent_id in moved.items()
+            ],
+            MEMBER_MOVE_FIELDS,
+        )
+        Member.objects.rebuild_paths(instance.id)
 
-        for child_id in tree[member_id]:
-            dfs(child_id)
+        move_member_nodes(instance.id, moved)
+        invalidate(CacheNamespace.TEAM_BY_ID.format(team_id=instance.id))
+        return instance
 
-        if parent_id in children:
-            raise serializers.ValidationError(
-                "Нельзя сменить руководителя, который находится в подчинении."
-            )
 
-        member.parent = parent
-        member.save()
-        return instance
+class MemberMoveSerializer(serializers.Serializer):
+    """Перемещение участника в массовом изменении структуры команды"""
+
+    member_id = serializers.IntegerField()
+    parent_id = serializers.IntegerField()
+
+    class Meta:
+        list_serializer_class = MemberMoveListSerializer
 
 
 class MemberCreateSerializer(serializers.ModelSerializer):
@@ -284,6 +346,24 @@ class MemberCreateSerializer(serializers.ModelSerializer):
         read_only_fields = ("team",)
 
 
+class MemberImportSerializer(serializers.Serializer):
+    """
+    Сериализатор для отображения в свагере строки импорта участников.
+    Принимается JSON-список, CSV (`text/csv`) или JSON Lines.
+    """
+
+    email = serializers.EmailField()
+    parent = serializers.EmailField(required=False)
+    department = serializers.CharField()
+
+
+class MemberImportResultSerializer(serializers.Serializer):
+    """Сериализатор для отображения в свагере результата импорта"""
+
+    created = serializers.IntegerField()
+    errors = serializers.ListField(child=serializers.DictField())
+
+
 class TeamSerializer(serializers.ModelSerializer):
     """Сериалайзер команд"""
 
@@ -311,33 +391,10 @@ class TeamDetailSerializer(serializers.ModelSerializer):
 
     @swagger_serializer_method(serializer_or_field=MemberTeamSerializer)
     def get_employees(self, obj):
-        request = self.context.get("request")
-        max_deep = request.query_params.get("deep", f"{MAX_DEEP_SUBORDINATES}")
-        try:
-            max_deep = int(max_deep)
-        except ValueError:
-            max_deep = MAX_DEEP_SUBORDINATES
-        else:
-            max_deep = min(max(1, max_deep), MAX_DEEP_SUBORDINATES)
-
-        qs = (
-            Member.objects.filter(team=obj)
-            .select_related("user__profile", "department")
-            .only(
-                "id",
-                "parent_id",
-                "user_id",
-                "user__first_name",
-                "user__last_name",
-                "user__middle_name",
-                "user__image",
-                "department",
-                "user__profile__position",
-            )
-        )
-        supervisor = qs.get(user=obj.owner)
-        children = qs.exclude(user=obj.owner)
-        return get_tree(supervisor, children, max_deep, MemberTeamSerializer)
+        max_deep = get_max_deep(self.context.get("request"))
+        # полное дерево материализуется, усеченное читается только до max_deep
+        partial_deep = max_deep if max_deep < MAX_DEEP_SUBORDINATES else None
+        return get_tree(get_team_tree(obj, partial_deep), max_deep)
 
 
 class TeamCreateSerializer(serializers.ModelSerializer):
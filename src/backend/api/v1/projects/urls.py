@@ -1,6 +1,8 @@
+from django.conf import settings
 from django.urls import include, path
 from rest_framework import routers
 
+from api.async_views import CachedReadView
 from . import views
 
 router = routers.DefaultRouter()
@@ -11,3 +13,21 @@ router.register("members", views.MemberViewSet)
 urlpatterns = [
     path("", include(router.urls)),
 ]
+
+if settings.ASYNC_VIEWS:
+    urlpatterns = [
+        path(
+            "projects/",
+            CachedReadView.as_view(
+                views.ProjectViewSet, {"get": "list", "post": "create"}
+            ),
+        ),
+        path(
+            "teams/<int:pk>/",
+            CachedReadView.as_view(views.TeamViewSet, {"get": "retrieve"}),
+        ),
+        path(
+            "members/",
+            CachedReadView.as_view(views.MemberViewSet, {"get": "list"}),
+        ),
+    ] + urlpatterns
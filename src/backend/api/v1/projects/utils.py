@@ -1,32 +1,76 @@
 from collections import defaultdict
 
-from .constants import SUBORDINATES, WITHOUT_PARENT
+from rest_framework.exceptions import ValidationError
 
+from apps.projects.imports import number_rows, read_csv, read_json_lines
+from .constants import MAX_DEEP_SUBORDINATES, SUBORDINATES, WITHOUT_PARENT
 
-def get_tree(owner, children, max_deep, serializer) -> dict:
-    """Создание структуры дерева"""
-    tree = defaultdict(list)
-    nodes = defaultdict(list)
-    for child in children:
-        nodes[child.parent_id].append(child)
 
-    def build_subtree(employee, deep=0):
-        subtree = serializer(employee).data
-        subtree[SUBORDINATES] = []
+def get_max_deep(request):
+    """Глубина дерева из параметра `deep` запроса"""
+    max_deep = request.query_params.get("deep", f"{MAX_DEEP_SUBORDINATES}")
+    try:
+        max_deep = int(max_deep)
+    except ValueError:
+        return MAX_DEEP_SUBORDINATES
+    return min(max(1, max_deep), MAX_DEEP_SUBORDINATES)
 
-        if deep + 1 >= max_deep:
-            return subtree
 
-        for node in nodes[employee.id]:
-            subtree[SUBORDINATES].append(build_subtree(node, deep=deep + 1))
+def get_children(nodes, exclude=None):
+    """Группировка фрагментов узлов по руководителю"""
+    children = defaultdict(list)
+    for node in nodes.values():
+        if node["id"] != exclude:
+            children[node["parent_id"]].append(node)
+    return children
+
+
+def build_subtree(node, children, max_deep, deep=0):
+    subtree = dict(node)
+    subtree[SUBORDINATES] = []
+
+    if deep + 1 >= max_deep:
         return subtree
 
-    for parent_id in (owner.id, None):  # owner and non parent
-        [
-            tree[parent_id].append(build_subtree(node, 0))
-            for node in nodes[parent_id]
-        ]
-    res = serializer(owner).data
-    res[SUBORDINATES] = tree[owner.id]
-    res[WITHOUT_PARENT] = tree[None]
+    for child in children[node["id"]]:
+        subtree[SUBORDINATES].append(
+            build_subtree(child, children, max_deep, deep=deep + 1)
+        )
+    return subtree
+
+
+def get_tree(team_tree, max_deep) -> dict:
+    """Создание структуры дерева из готовых фрагментов узлов"""
+    owner_id = team_tree["owner"]
+    nodes = team_tree["nodes"]
+    children = get_children(nodes, exclude=owner_id)
+
+    res = dict(nodes[owner_id])
+    res[SUBORDINATES] = [
+        build_subtree(node, children, max_deep) for node in children[owner_id]
+    ]
+    res[WITHOUT_PARENT] = [
+        build_subtree(node, children, max_deep) for node in children[None]
+    ]
     return res
+
+
+def get_subtree(nodes, root_id, max_deep) -> dict:
+    """Создание поддерева участника на `max_deep` уровней вниз"""
+    return build_subtree(nodes[root_id], get_children(nodes), max_deep, -1)
+
+
+def get_import_rows(request):
+    """
+    Пронумерованные строки импорта участников из тела запроса.
+    CSV и JSON Lines читаются из потока построчно, JSON - целиком.
+    """
+    content_type = request.content_type.split(";")[0].strip()
+    if content_type == "text/csv":
+        return read_csv(request.stream or ())
+    if content_type == "application/x-ndjson":
+        return read_json_lines(request.stream or ())
+
+    if not isinstance(request.data, list):
+        raise ValidationError("Ожидается список участников.")
+    return number_rows(request.data)
@@ -1,27 +1,45 @@
 import random
 
-from django.core.cache import cache
+from django.db import transaction
+from django.http import Http404
 from django_filters.rest_framework import DjangoFilterBackend
+from drf_yasg import openapi
 from drf_yasg.utils import swagger_auto_schema
 from rest_framework import filters, mixins, status
 from rest_framework.decorators import action
-from rest_framework.filters import SearchFilter
+from rest_framework.exceptions import ParseError
 from rest_framework.generics import (
     ListCreateAPIView,
     RetrieveUpdateAPIView,
     get_object_or_404,
 )
 from rest_framework.response import Response
+from rest_framework.settings import api_settings
 from rest_framework.viewsets import GenericViewSet, ReadOnlyModelViewSet
 
-from apps.general.constants import CacheKey
-from apps.projects.models import Member, Project, Team
+from api.filters import (
+    CHANGED_SINCE_PARAM,
+    ChangedSinceFilter,
+    PeopleSearchFilter,
+)
+from api.mixins import ConditionalGetMixin
+from api.v1.general.serializers import FacetsSerializer
+from apps.general.constants import CacheKey, CacheNamespace
+from apps.projects.facets import count_facets, get_facets
+from apps.projects.imports import ImportFormatError, MemberImport
+from apps.projects.models import MemberDirectory, Project, Team
+from apps.projects.trees import get_member_subtree
+from .constants import MEMBER_ORDERING
 from .filters import MemberFilter
 from .paginations import MemberPagination
 from .permissions import OwnerOrAdminPermission
 from .serializers import (
     MemberCreateSerializer,
+    MemberImportResultSerializer,
+    MemberImportSerializer,
+    MemberMoveSerializer,
     MemberSerializer,
+    MemberTeamSerializer,
     MemberTreeSerializer,
     ProjectGetSerializer,
     ProjectSerializer,
@@ -31,9 +49,15 @@ from .serializers import (
     TeamDetailSerializer,
     TeamSerializer,
 )
+from .utils import get_import_rows, get_max_deep, get_subtree
 
 
-class ProjectViewSet(ListCreateAPIView, RetrieveUpdateAPIView, GenericViewSet):
+class ProjectViewSet(
+    ConditionalGetMixin,
+    ListCreateAPIView,
+    RetrieveUpdateAPIView,
+    GenericViewSet,
+):
     queryset = Project.objects.prefetch_related("teams").only(
         "id",
         "name",
@@ -42,8 +66,9 @@ class ProjectViewSet(ListCreateAPIView, RetrieveUpdateAPIView, GenericViewSet):
         "ended",
     )
     permission_classes = [OwnerOrAdminPermission]
-    filter_backends = [filters.SearchFilter]
+    filter_backends = [filters.SearchFilter, ChangedSinceFilter]
     search_fields = ("name",)
+    conditional_namespaces = (CacheNamespace.PROJECTS,)
     swagger_tags = ["projects"]
 
     def get_serializer_class(self):
@@ -51,28 +76,18 @@ class ProjectViewSet(ListCreateAPIView, RetrieveUpdateAPIView, GenericViewSet):
             return ProjectGetSerializer
         return ProjectSerializer
 
-    def get_queryset(self):
-        qs = cache.get(CacheKey.PROJECTS)
-        if qs is None:
-            qs = Project.objects.prefetch_related("teams").only(
-                "id",
-                "name",
-                "description",
-                "started",
-                "ended",
+    def list(self, request, *args, **kwargs):
+        build = super().list
+        key = CacheKey.PROJECTS_PAGE.format(
+            page=request.query_params.get("page", 1),
+            search=request.query_params.get(api_settings.SEARCH_PARAM, ""),
+            changed_since=request.query_params.get(CHANGED_SINCE_PARAM, ""),
+        )
+        return Response(
+            self.get_cached_data(
+                key, lambda: build(request, *args, **kwargs).data
             )
-            cache.set(CacheKey.PROJECTS, qs)
-        return qs
-
-    def get_object(self):
-        cache_key = CacheKey.PROJECT_BY_ID.format(
-            project_id=self.kwargs.get("pk")
         )
-        qs = cache.get(cache_key)
-        if qs is None:
-            qs = super().get_object()
-            cache.set(cache_key, qs)
-        return qs
 
     def perform_create(self, serializer):
         serializer.save(owner=self.request.user)
@@ -98,9 +113,7 @@ class ProjectViewSet(ListCreateAPIView, RetrieveUpdateAPIView, GenericViewSet):
     @action(detail=True, methods=["put"], url_path="update_team")
     def add_team_to_project(self, request, *args, **kwargs):
         team = get_object_or_404(Team, pk=request.data["team_id"])
-        self._remove_cached_users_project(team)
         instance = self.get_object()
-        self._remove_cached_project(instance)
         instance.teams.add(team)
         return Response(ProjectGetSerializer(instance).data)
 
@@ -108,28 +121,30 @@ class ProjectViewSet(ListCreateAPIView, RetrieveUpdateAPIView, GenericViewSet):
     @add_team_to_project.mapping.delete
     def remove_team_from_project(self, request, *args, **kwargs):
         team = get_object_or_404(Team, pk=request.data["team_id"])
-        self._remove_cached_users_project(team)
         instance = self.get_object()
-        self._remove_cached_project(instance)
         instance.teams.remove(team)
         return Response(status=status.HTTP_204_NO_CONTENT)
 
-    def _remove_cached_users_project(self, team):
-        [
-            cache.delete(CacheKey.MY_PROJECTS.format(user_id=user_id))
-            for user_id in team.members.values_list("user_id", flat=True)
-        ]
-
-    def _remove_cached_project(self, project):
-        cache.delete(CacheKey.PROJECT_BY_ID.format(project_id=project.id))
-
 
-class TeamViewSet(mixins.CreateModelMixin, ReadOnlyModelViewSet):
+class TeamViewSet(
+    ConditionalGetMixin, mixins.CreateModelMixin, ReadOnlyModelViewSet
+):
     queryset = Team.objects.all()
-    filter_backends = [filters.SearchFilter]
+    filter_backends = [filters.SearchFilter, ChangedSinceFilter]
     search_fields = ("name",)
     swagger_tags = ["teams"]
 
+    def get_conditional_namespaces(self):
+        if self.action == "list":
+            return CacheNamespace.TEAMS, CacheNamespace.PROJECTS
+        elif self.action in ("retrieve", "subtree"):
+            return (
+                CacheNamespace.TEAM_BY_ID.format(team_id=self.kwargs["pk"]),
+                CacheNamespace.MEMBERS,
+                CacheNamespace.PROJECTS,
+            )
+        return ()
+
     def get_serializer_class(self):
         if self.action == "retrieve":
             return TeamDetailSerializer
@@ -140,30 +155,30 @@ class TeamViewSet(mixins.CreateModelMixin, ReadOnlyModelViewSet):
     def get_queryset(self):
         qs = Team.objects.prefetch_related("projects")
         if self.action == "retrieve":
-            cache_key = CacheKey.TEAM_BY_ID.format(
-                team_id=self.kwargs.get("pk")
+            return qs.only("id", "name", "owner", "description")
+        elif self.action in ("change_employee", "change_employees", "subtree"):
+            return Team.objects.only("id", "owner")
+        return qs.only("id", "name")
+
+    def list(self, request, *args, **kwargs):
+        build = super().list
+        key = CacheKey.TEAMS_PAGE.format(
+            query=request.query_params.urlencode()
+        )
+        return Response(
+            self.get_cached_data(
+                key, lambda: build(request, *args, **kwargs).data
             )
-            cached_qs = cache.get(cache_key)
-            if cached_qs is None:
-                cached_qs = qs.prefetch_related("members").only(
-                    "id",
-                    "name",
-                    "owner",
-                    "description",
-                )
-                cache.set(cache_key, cached_qs)
-            return cached_qs
-        elif self.action == "change_employee":
-            return qs.prefetch_related("members").only("id")
-
-        cached_qs = cache.get(CacheKey.TEAMS)
-        if cached_qs is None:
-            cached_qs = qs.only(
-                "id",
-                "name",
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        build = super().retrieve
+        key = CacheKey.TEAM_BY_ID.format(team_id=kwargs["pk"])
+        return Response(
+            self.get_cached_data(
+                key, lambda: build(request, *args, **kwargs).data
             )
-            cache.set(CacheKey.TEAMS, cached_qs)
-        return cached_qs
+        )
 
     @action(
         detail=True,
@@ -176,6 +191,18 @@ class TeamViewSet(mixins.CreateModelMixin, ReadOnlyModelViewSet):
 
         return Response({"message": "ok"})
 
+    @swagger_auto_schema(request_body=MemberMoveSerializer(many=True))
+    @action(detail=True, methods=["put"])
+    def change_employees(self, request, *args, **kwargs):
+        with transaction.atomic():
+            serializer = MemberMoveSerializer(
+                self.get_object(), data=request.data, many=True
+            )
+            serializer.is_valid(raise_exception=True)
+            serializer.save()
+
+        return Response({"message": "ok"})
+
     @action(
         detail=True,
         methods=["post"],
@@ -190,33 +217,91 @@ class TeamViewSet(mixins.CreateModelMixin, ReadOnlyModelViewSet):
         serializer.save(team=team, department_id=random.randrange(18, 28))
         return Response({"message": "ok"})
 
+    @swagger_auto_schema(
+        request_body=MemberImportSerializer(many=True),
+        responses={201: MemberImportResultSerializer()},
+    )
+    @action(
+        detail=True,
+        methods=["post"],
+        url_path="members/import",
+        permission_classes=[OwnerOrAdminPermission],
+    )
+    def import_members(self, request, *args, **kwargs):
+        try:
+            result = MemberImport(self.get_object()).run(
+                get_import_rows(request)
+            )
+        except ImportFormatError as error:
+            raise ParseError(str(error))
+        return Response(result, status=status.HTTP_201_CREATED)
 
-class MemberViewSet(ReadOnlyModelViewSet):
-    queryset = Member.objects.all()
+    @swagger_auto_schema(
+        manual_parameters=[
+            openapi.Parameter(
+                "deep", openapi.IN_QUERY, type=openapi.TYPE_INTEGER
+            )
+        ],
+        responses={200: MemberTeamSerializer()},
+    )
+    @action(
+        detail=True,
+        methods=["get"],
+        url_path=r"members/(?P<member_id>\d+)/subtree",
+    )
+    def subtree(self, request, member_id, *args, **kwargs):
+        member_id = int(member_id)
+        max_deep = get_max_deep(request)
+        nodes = get_member_subtree(self.get_object(), member_id, max_deep)
+        if member_id not in nodes:
+            raise Http404
+        return Response(get_subtree(nodes, member_id, max_deep))
+
+
+class MemberViewSet(ConditionalGetMixin, ReadOnlyModelViewSet):
+    queryset = MemberDirectory.objects.order_by(*MEMBER_ORDERING)
     pagination_class = MemberPagination
     serializer_class = MemberSerializer
-    filter_backends = [SearchFilter, DjangoFilterBackend]
+    filter_backends = [
+        PeopleSearchFilter,
+        DjangoFilterBackend,
+        ChangedSinceFilter,
+    ]
     filterset_class = MemberFilter
     search_fields = [
-        "^user__first_name",
-        "^user__last_name",
-        "^user__middle_name",
+        "^first_name",
+        "^last_name",
+        "^middle_name",
+        "^position",
+        "^city",
+    ]
+    trigram_search_fields = [
+        "last_name",
+        "first_name",
+        "middle_name",
+        "position",
+        "city",
     ]
+    conditional_namespaces = (CacheNamespace.MEMBERS,)
     swagger_tags = ["members"]
 
-    def get_queryset(self):
-        qs = cache.get(CacheKey.MEMBERS)
-        if qs is None:
-            qs = Member.objects.select_related(
-                "user__profile", "department"
-            ).only(
-                "id",
-                "user__first_name",
-                "user__middle_name",
-                "user__last_name",
-                "department__name",
-                "user__profile__position",
-                "user__profile__city",
-            )
-            cache.set(CacheKey.MEMBERS, qs)
-        return qs
+    def is_filtered(self):
+        params = (
+            *self.filterset_class.base_filters,
+            api_settings.SEARCH_PARAM,
+            CHANGED_SINCE_PARAM,
+        )
+        return any(self.request.query_params.get(param) for param in params)
+
+    @swagger_auto_schema(responses={200: FacetsSerializer()})
+    @action(detail=False, pagination_class=None)
+    def facets(self, request):
+        """
+        Значения фильтров с количеством участников.
+        Без фильтров берутся из счетчиков, с фильтрами считаются
+        `GROUP BY` по отфильтрованному справочнику.
+        """
+        queryset = MemberDirectory.objects.all()
+        if self.is_filtered():
+            return Response(count_facets(self.filter_queryset(queryset)))
+        return Response(get_facets(queryset))
@@ -14,3 +14,7 @@ ERROR_PHONE = (
     f"Номер должен начинаться с 8 и содержать {MAX_PHONE_LENGTH} цифр."
 )
 USERS_PAGE_SIZE = 24
+USERS_ORDERING = ("last_name", "first_name", "middle_name", "id")
+INCLUDE_PROJECTS = "projects"
+ERROR_AVATAR = "Нужно передать либо `image`, либо `image_key`."
+ERROR_DIRECT_UPLOAD = "Прямая загрузка в хранилище не настроена."
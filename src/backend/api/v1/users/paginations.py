@@ -1,8 +1,10 @@
 from rest_framework.pagination import PageNumberPagination
 
-from .constants import USERS_PAGE_SIZE
+from api.paginations import KeysetPaginationMixin
+from .constants import USERS_ORDERING, USERS_PAGE_SIZE
 
 
-class UsersPagination(PageNumberPagination):
+class UsersPagination(KeysetPaginationMixin, PageNumberPagination):
     page_size = USERS_PAGE_SIZE
     page_size_query_param = "limit"
+    keyset_ordering = USERS_ORDERING
@@ -0,0 +1,5 @@
+from api.parsers import LimitedMultiPartParser
+
+
+class AvatarMultiPartParser(LimitedMultiPartParser):
+    max_size_setting = "AVATAR_MAX_UPLOAD_SIZE"
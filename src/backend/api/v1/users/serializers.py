@@ -1,23 +1,34 @@
+import posixpath
 import re
 
 from django.contrib.auth import get_user_model
 from django.contrib.auth.password_validation import validate_password
 from django.core import exceptions
 from django.core.cache import cache
+from django.db.models import Prefetch
 from rest_framework import serializers
 
-from api.fields import Base64ImageField
+from api.fields import AvatarImageField, AvatarKeyField, ThumbnailImageField
 from api.v1.projects.serializers import ProjectShortSerializer
 from api.v1.users.constants import (
+    ERROR_AVATAR,
     ERROR_PHONE,
     ERROR_TELEGRAM,
     ERROR_TIMEZONE,
     TELEGRAM_PATTERN,
 )
-from apps.general.constants import CacheKey
-from apps.projects.models import Member, Project, Team
-from apps.users.constants import MAX_TIMEZONE, MIN_TIMEZONE, RE_PHONE
+from apps.general.cache import versioned_key
+from apps.general.constants import CacheKey, CacheNamespace
+from apps.projects.models import UserProject
+from apps.users.constants import (
+    AVATAR_UPLOAD_TYPES,
+    MAX_TIMEZONE,
+    MIN_TIMEZONE,
+    RE_PHONE,
+    THUMBNAIL_PROFILE_SIZE,
+)
 from apps.users.models import Profile
+from apps.users.uploads import avatar_storage
 
 User = get_user_model()
 
@@ -37,6 +48,30 @@ class ProfileSerializer(serializers.ModelSerializer):
         )
 
 
+def user_projects_prefetch():
+    """Проекты пользователей из проекции одним запросом на выборку"""
+    return Prefetch(
+        "user_projects",
+        queryset=UserProject.objects.select_related("project")
+        .only("user", "project__id", "project__name")
+        .order_by("project__name"),
+        to_attr="project_list",
+    )
+
+
+class UserProjectsMixin:
+    """Миксин для проектов пользователя из проекции"""
+
+    def get_projects(self, user):
+        user_projects = getattr(user, "project_list", None)
+        if user_projects is None:
+            user_projects = user_projects_prefetch().queryset.filter(user=user)
+        return ProjectShortSerializer(
+            [user_project.project for user_project in user_projects],
+            many=True,
+        ).data
+
+
 class UserFullNameMixin:
     """Миксин для ФИО"""
 
@@ -47,13 +82,40 @@ class UserFullNameMixin:
 
 
 class AvatarUserSerializer(serializers.ModelSerializer):
-    """Сериалайзер для смены аватара"""
+    """
+    Сериалайзер для смены аватара.
+    Аватар передается в `image` или ключом прямой загрузки в `image_key`.
+    """
 
-    image = Base64ImageField()
+    image = AvatarImageField(required=False)
+    image_key = AvatarKeyField(write_only=True, required=False)
 
     class Meta:
         model = User
-        fields = ("image",)
+        fields = ("image", "image_key")
+
+    def validate(self, attrs):
+        if ("image" in attrs) == ("image_key" in attrs):
+            raise serializers.ValidationError(ERROR_AVATAR)
+        return attrs
+
+    def update(self, instance, validated_data):
+        upload = validated_data.pop("image_key", None)
+        if upload is None:
+            return super().update(instance, validated_data)
+        key = upload.name
+        upload.name = posixpath.basename(key)
+        with upload:
+            instance = super().update(instance, {"image": upload})
+        avatar_storage().delete(key)
+        return instance
+
+
+class AvatarUploadSerializer(serializers.Serializer):
+    """Сериалайзер для запроса формы прямой загрузки аватара"""
+
+    content_type = serializers.ChoiceField(choices=list(AVATAR_UPLOAD_TYPES))
+    sha256 = serializers.RegexField(r"^[0-9a-f]{64}$")
 
 
 class UserListSerializer(UserFullNameMixin, serializers.ModelSerializer):
@@ -75,10 +137,22 @@ class UserListSerializer(UserFullNameMixin, serializers.ModelSerializer):
         return obj.full_name()
 
 
-class UserDetailSerializer(UserFullNameMixin, serializers.ModelSerializer):
+class UserListProjectsSerializer(UserProjectsMixin, UserListSerializer):
+    """Сериалайзер для списка пользователей с их проектами"""
+
+    projects = serializers.SerializerMethodField(read_only=True)
+
+    class Meta(UserListSerializer.Meta):
+        fields = UserListSerializer.Meta.fields + ("projects",)
+
+
+class UserDetailSerializer(
+    UserProjectsMixin, UserFullNameMixin, serializers.ModelSerializer
+):
     """Сериалайзер пользователя"""
 
     profile = ProfileSerializer()
+    image = ThumbnailImageField(THUMBNAIL_PROFILE_SIZE)
     projects = serializers.SerializerMethodField(read_only=True)
 
     class Meta:
@@ -92,19 +166,12 @@ class UserDetailSerializer(UserFullNameMixin, serializers.ModelSerializer):
             "projects",
         )
 
-    def get_projects(self, user):
-        projects = Project.objects.filter(
-            teams__in=Member.objects.filter(user=user).values_list(
-                "team_id", flat=True
-            )
-        ).only("id", "name")
-        return ProjectShortSerializer(projects, many=True).data
-
 
 class UserSerializer(UserFullNameMixin, serializers.ModelSerializer):
     """Сериалайзер пользователя"""
 
     profile = ProfileSerializer()
+    image = ThumbnailImageField(THUMBNAIL_PROFILE_SIZE)
 
     class Meta:
         model = User
@@ -146,10 +213,13 @@ class UserCreateSerializer(serializers.ModelSerializer):
         return User.objects.create_user(**validated_data)
 
 
-class UserMeSerializer(UserFullNameMixin, serializers.ModelSerializer):
+class UserMeSerializer(
+    UserProjectsMixin, UserFullNameMixin, serializers.ModelSerializer
+):
     """Сериализатор для отображения собственной информации пользователя"""
 
     profile = ProfileSerializer()
+    image = ThumbnailImageField(THUMBNAIL_PROFILE_SIZE)
     projects = serializers.SerializerMethodField()
 
     class Meta:
@@ -164,15 +234,18 @@ class UserMeSerializer(UserFullNameMixin, serializers.ModelSerializer):
         )
 
     def get_projects(self, obj):
-        my_projects = cache.get(CacheKey.MY_PROJECTS.format(user_id=obj.id))
+        cache_key = versioned_key(
+            CacheKey.MY_PROJECTS.format(user_id=obj.id),
+            CacheNamespace.USER_BY_ID.format(user_id=obj.id),
+        )
+        my_projects = cache.get(cache_key)
         if my_projects is None:
-            my_projects = set(
-                Team.objects.filter(
-                    members__user=obj,
-                ).values_list("projects__name", flat=True)
+            # `/users/me/` отдает отсортированные названия, как и раньше
+            my_projects = sorted(
+                {project["name"] for project in super().get_projects(obj)}
             )
-            cache.set(CacheKey.MY_PROJECTS.format(user_id=obj.id), my_projects)
-        return sorted(my_projects)
+            cache.set(cache_key, my_projects)
+        return my_projects
 
 
 class UserProfileUpdateSerializer(serializers.ModelSerializer):
@@ -1,6 +1,8 @@
+from django.conf import settings
 from django.urls import include, path
 from rest_framework import routers
 
+from api.async_views import CachedReadView
 from api.v1.users import views
 
 router = routers.DefaultRouter()
@@ -9,3 +11,15 @@ router.register("users", views.UserViewSet)
 urlpatterns = [
     path("", include(router.urls)),
 ]
+
+if settings.ASYNC_VIEWS:
+    urlpatterns = [
+        path(
+            "users/me/",
+            CachedReadView.as_view(
+                views.UserViewSet,
+                {"get": "me", "patch": "update_me"},
+                per_user=True,
+            ),
+        ),
+    ] + urlpatterns
@@ -1,72 +1,136 @@
 from django.contrib.auth import get_user_model
-from django.core.cache import cache
-from rest_framework import generics, permissions, viewsets
+from django.db.models import prefetch_related_objects
+from rest_framework import generics, parsers, permissions, status, viewsets
 from rest_framework.decorators import action
+from rest_framework.exceptions import NotFound
 from rest_framework.response import Response
 
-from apps.general.constants import CacheKey
+from api.filters import ChangedSinceFilter, PeopleSearchFilter
+from api.mixins import ConditionalGetMixin
+from apps.general.constants import CacheKey, CacheNamespace
+from apps.users.uploads import direct_upload_enabled, presign_avatar_upload
+from .constants import ERROR_DIRECT_UPLOAD, INCLUDE_PROJECTS
 from .paginations import UsersPagination
+from .parsers import AvatarMultiPartParser
 from .permissions import IsCurrentUserOrAdminPermission
 from .serializers import (
+    AvatarUploadSerializer,
     AvatarUserSerializer,
     UserCreateSerializer,
     UserDetailSerializer,
+    UserListProjectsSerializer,
     UserListSerializer,
     UserMeSerializer,
     UserProfileUpdateSerializer,
     UserSerializer,
+    user_projects_prefetch,
 )
 
 User = get_user_model()
 
 
 class UserViewSet(
+    ConditionalGetMixin,
     generics.ListCreateAPIView,
     generics.RetrieveAPIView,
     viewsets.GenericViewSet,
 ):
     queryset = User.objects.all()
     pagination_class = UsersPagination
+    filter_backends = [PeopleSearchFilter, ChangedSinceFilter]
+    search_fields = [
+        "^first_name",
+        "^last_name",
+        "^middle_name",
+        "^profile__position",
+        "^profile__city",
+    ]
+    trigram_search_fields = [
+        "last_name",
+        "first_name",
+        "middle_name",
+        "profile__position",
+        "profile__city",
+    ]
     swagger_tags = ["users"]
 
     def get_serializer_class(self):
         if self.action == "create":
             return UserCreateSerializer
         elif self.action == "list":
+            if self.include_projects:
+                return UserListProjectsSerializer
             return UserListSerializer
         elif self.action == "retrieve":
             return UserDetailSerializer
         return UserSerializer
 
+    @property
+    def include_projects(self):
+        include = self.request.query_params.get("include", "")
+        return INCLUDE_PROJECTS in include.split(",")
+
+    def get_conditional_namespaces(self):
+        if self.action == "list":
+            if self.include_projects:
+                return (
+                    CacheNamespace.USERS,
+                    CacheNamespace.MEMBERS,
+                    CacheNamespace.PROJECTS,
+                )
+            return (CacheNamespace.USERS,)
+        elif self.action in ("retrieve", "me"):
+            user_id = self.kwargs.get("pk", self.request.user.pk)
+            return (
+                CacheNamespace.USER_BY_ID.format(user_id=user_id),
+                CacheNamespace.PROJECTS,
+            )
+        return ()
+
+    def paginate_queryset(self, queryset):
+        page = super().paginate_queryset(queryset)
+        if page is not None and self.include_projects:
+            prefetch_related_objects(page, user_projects_prefetch())
+        return page
+
     def get_queryset(self):
         if self.request.method == "GET":
-            qs = cache.get(CacheKey.USERS)
-            if qs is None:
-                qs = User.objects.select_related("profile").only(
-                    "id",
-                    "email",
-                    "first_name",
-                    "last_name",
-                    "middle_name",
-                    "image",
-                    "profile__phone",
-                    "profile__telegram",
-                    "profile__bio",
-                    "profile__position",
-                    "profile__birthday",
-                    "profile__time_zone",
-                )
-                cache.set(CacheKey.USERS, qs)
-            return qs
+            return User.objects.select_related("profile").only(
+                "id",
+                "email",
+                "first_name",
+                "last_name",
+                "middle_name",
+                "image",
+                "thumbnails_source",
+                "profile__phone",
+                "profile__telegram",
+                "profile__bio",
+                "profile__position",
+                "profile__birthday",
+                "profile__time_zone",
+            )
         return User.objects.all()
 
-    def get_object(self):
-        cache_key = CacheKey.USER_BY_ID.format(user_id=self.kwargs.get("pk"))
-        queryset = cache.get(cache_key)
-        if queryset is None:
-            queryset = super().get_object()
-            cache.set(cache_key, queryset)
-        return queryset
+    def list(self, request, *args, **kwargs):
+        build = super().list
+        key = CacheKey.USERS_PAGE.format(
+            query=request.query_params.urlencode()
+        )
+        return Response(
+            self.get_cached_data(
+                key, lambda: build(request, *args, **kwargs).data
+            )
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        build = super().retrieve
+        key = CacheKey.USER_BY_ID.format(user_id=kwargs["pk"])
+        return Response(
+            self.get_cached_data(
+                key, lambda: build(request, *args, **kwargs).data
+            )
+        )
 
     def get_permissions(self):
         if self.action == "create":
@@ -76,23 +140,53 @@ class UserViewSet(
 
         return [permission() for permission in permissions_classes]
 
+    def get_current_user(self):
+        """Текущий пользователь со всеми полями и профилем"""
+        # аутентификация загружает только id и права пользователя
+        return User.objects.select_related("profile").get(
+            pk=self.request.user.pk
+        )
+
     @action(detail=False, methods=["get"])
     def me(self, request):
-        serializer = UserMeSerializer(request.user)
+        serializer = UserMeSerializer(self.get_current_user())
         return Response(serializer.data)
 
     @me.mapping.patch
     def update_me(self, request):
         serializer = UserProfileUpdateSerializer(
-            request.user, data=request.data, partial=True
+            self.get_current_user(), data=request.data, partial=True
         )
         serializer.is_valid(raise_exception=True)
         serializer.save()
         return Response(serializer.data)
 
-    @action(detail=False, methods=["patch"])
+    @action(
+        detail=False,
+        methods=["patch"],
+        parser_classes=[parsers.JSONParser, AvatarMultiPartParser],
+    )
     def avatar(self, request):
-        serializer = AvatarUserSerializer(request.user, data=request.data)
+        serializer = AvatarUserSerializer(
+            self.get_current_user(), data=request.data
+        )
         serializer.is_valid(raise_exception=True)
         serializer.save()
         return Response(serializer.data)
+
+    @action(detail=False, methods=["post"], url_path="avatar/upload")
+    def avatar_upload(self, request):
+        """
+        Форма для загрузки аватара напрямую в хранилище S3.
+        Клиент передает тип и SHA-256 файла, отправляет файл на `url`
+        с полями `fields`, затем передает `key` в `image_key` запроса смены
+        аватара.
+        """
+        if not direct_upload_enabled():
+            raise NotFound(ERROR_DIRECT_UPLOAD)
+        serializer = AvatarUploadSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        upload = presign_avatar_upload(
+            request.user.pk, **serializer.validated_data
+        )
+        return Response(upload, status=status.HTTP_201_CREATED)
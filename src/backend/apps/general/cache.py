@@ -0,0 +1,243 @@
+import asyncio
+import time
+import weakref
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.cache import DEFAULT_CACHE_ALIAS, cache
+from django.core.cache.backends.base import DEFAULT_TIMEOUT
+from django.db import transaction
+from django_redis import get_redis_connection
+from redis import asyncio as aioredis
+from redis.exceptions import RedisError
+
+from .constants import CacheKey, CacheNamespace
+from .metrics import cache_metrics
+
+LOCK_TIMEOUT = 10
+
+# асинхронные клиенты привязаны к циклу событий, в котором созданы
+_async_clients = weakref.WeakKeyDictionary()
+
+DEPENDENCIES = {
+    "projects.Project": lambda project: (CacheNamespace.PROJECTS,),
+    "projects.Team": lambda team: (
+        CacheNamespace.TEAMS,
+        CacheNamespace.PROJECTS,
+        CacheNamespace.TEAM_BY_ID.format(team_id=team.id),
+    ),
+    "projects.ProjectTeam": lambda project_team: (
+        CacheNamespace.TEAMS,
+        CacheNamespace.PROJECTS,
+        CacheNamespace.TEAM_BY_ID.format(team_id=project_team.team_id),
+    ),
+    "projects.Member": lambda member: (
+        CacheNamespace.MEMBERS,
+        CacheNamespace.TEAM_BY_ID.format(team_id=member.team_id),
+        CacheNamespace.USER_BY_ID.format(user_id=member.user_id),
+    ),
+    "projects.Department": lambda department: (CacheNamespace.MEMBERS,),
+    "users.CustomUser": lambda user: (
+        CacheNamespace.USERS,
+        CacheNamespace.MEMBERS,
+        CacheNamespace.USER_BY_ID.format(user_id=user.id),
+    ),
+    "users.Profile": lambda profile: (
+        CacheNamespace.USERS,
+        CacheNamespace.MEMBERS,
+        CacheNamespace.USER_BY_ID.format(user_id=profile.user_id),
+    ),
+}
+
+
+def _new_generation():
+    return time.time_ns()
+
+
+def get_generations(*namespaces):
+    """Текущие поколения пространств имен за один запрос к кэшу"""
+    keys = [CacheKey.GENERATION.format(namespace=ns) for ns in namespaces]
+    generations = cache.get_many(keys)
+    missing = {
+        key: _new_generation() for key in keys if key not in generations
+    }
+    if missing:
+        cache.set_many(missing, timeout=None)
+        generations.update(missing)
+    return [generations[key] for key in keys]
+
+
+async def aget_generations(*namespaces):
+    """Асинхронный вариант `get_generations`"""
+    keys = [CacheKey.GENERATION.format(namespace=ns) for ns in namespaces]
+    generations = await aget_many(keys)
+    missing = {
+        key: _new_generation() for key in keys if key not in generations
+    }
+    if missing:
+        await aset_many(missing, timeout=None)
+        generations.update(missing)
+    return [generations[key] for key in keys]
+
+
+def advance_generation(namespace):
+    """
+    Новое поколение пространства имен.
+    Возвращает пару (предыдущее, новое): процесс, чей материализованный
+    вид был на предыдущем поколении, после своего изменения остается
+    актуальным.
+    """
+    key = CacheKey.GENERATION.format(namespace=namespace)
+    with cache_lock(key):
+        previous = get_generations(namespace)[0]
+        generation = _new_generation()
+        cache.set(key, generation, timeout=None)
+    return previous, generation
+
+
+def versioned_key(key, *namespaces, generations=None):
+    """
+    Ключ кэша, который устаревает при инвалидации любого из пространств.
+    `generations` — поколения этих пространств, уже прочитанные в запросе.
+    """
+    if generations is None:
+        generations = get_generations(*namespaces)
+    return f"{key}:{'.'.join(map(str, generations))}"
+
+
+def get_dependent_namespaces(instance):
+    """Пространства имен, зависящие от экземпляра модели"""
+    return DEPENDENCIES[instance._meta.label](instance)
+
+
+def _invalidate_now(namespaces, keys):
+    if namespaces:
+        cache.set_many(
+            {
+                CacheKey.GENERATION.format(namespace=ns): _new_generation()
+                for ns in namespaces
+            },
+            timeout=None,
+        )
+    if keys:
+        cache.delete_many(keys)
+
+
+def invalidate(*namespaces, keys=()):
+    """
+    Инвалидация пространств имен и отдельных ключей после фиксации
+    транзакции: запрос, прочитавший данные до фиксации, не сохранит их под
+    новым поколением. Все поколения обновляются одним `set_many`, ключи
+    удаляются одним `delete_many`, независимо от их количества.
+    """
+    namespaces, keys = set(namespaces), list(keys)
+    transaction.on_commit(lambda: _invalidate_now(namespaces, keys))
+
+
+def invalidate_instance(instance, *namespaces):
+    """Инвалидация всего, что зависит от экземпляра модели"""
+    invalidate(*get_dependent_namespaces(instance), *namespaces)
+
+
+@contextmanager
+def cache_lock(key, blocking_timeout=None):
+    """
+    Блокировка для read-modify-write значений в кэше, отдает признак
+    захвата. Бэкенды без поддержки блокировок (locmem) работают без нее,
+    недоступный Redis и истекший `blocking_timeout` дают `False`.
+    """
+    if not hasattr(cache, "lock"):
+        yield True
+        return
+    lock = cache.lock(
+        CacheKey.LOCK.format(key=key),
+        timeout=LOCK_TIMEOUT,
+        blocking_timeout=blocking_timeout,
+    )
+    try:
+        acquired = lock.acquire()
+    except RedisError:
+        acquired = False
+    try:
+        yield acquired
+    finally:
+        if acquired:
+            try:
+                lock.release()
+            except RedisError:
+                pass
+
+
+def get_redis():
+    """Клиент Redis кэша или `None` для других бэкендов (locmem)"""
+    if not hasattr(cache, "client"):
+        return None
+    return get_redis_connection()
+
+
+def get_async_redis():
+    """
+    Асинхронный клиент Redis кэша для текущего цикла событий
+    или `None` для других бэкендов.
+    """
+    if not hasattr(cache, "client"):
+        return None
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None:
+        params = settings.CACHES[DEFAULT_CACHE_ALIAS]
+        options = params.get("OPTIONS", {})
+        pool = options.get("CONNECTION_POOL_KWARGS", {})
+        location = params["LOCATION"]
+        if isinstance(location, (list, tuple)):
+            location = location[0]
+        client = _async_clients[loop] = aioredis.from_url(
+            location,
+            max_connections=pool.get("max_connections"),
+            socket_connect_timeout=options.get("SOCKET_CONNECT_TIMEOUT"),
+            socket_timeout=options.get("SOCKET_TIMEOUT"),
+        )
+    return client
+
+
+async def aget_many(keys):
+    """
+    Чтение ключей кэша без блокировки цикла событий.
+    Значения кодируются так же, как в django-redis, поэтому доступны
+    и синхронному коду.
+    """
+    redis = get_async_redis()
+    if redis is None:
+        return await cache.aget_many(keys)
+    try:
+        values = await redis.mget([cache.make_key(key) for key in keys])
+    except RedisError:
+        # как IGNORE_EXCEPTIONS в синхронном клиенте: недоступность — промах
+        return {}
+    result = {
+        key: cache.client.decode(value)
+        for key, value in zip(keys, values)
+        if value is not None
+    }
+    cache_metrics.record_get(len(result), len(keys) - len(result))
+    return result
+
+
+async def aset_many(mapping, timeout=DEFAULT_TIMEOUT):
+    """Запись ключей кэша без блокировки цикла событий"""
+    redis = get_async_redis()
+    if redis is None:
+        return await cache.aset_many(mapping, timeout=timeout)
+    if timeout is DEFAULT_TIMEOUT:
+        timeout = cache.default_timeout
+    try:
+        async with redis.pipeline(transaction=False) as pipe:
+            for key, value in mapping.items():
+                pipe.set(
+                    cache.make_key(key),
+                    cache.client.encode(value),
+                    ex=None if timeout is None else max(int(timeout), 1),
+                )
+            await pipe.execute()
+    except RedisError:
+        pass
@@ -0,0 +1,65 @@
+import pickle
+
+import msgpack
+from django_redis.client import DefaultClient
+from django_redis.compressors import zlib
+from django_redis.serializers.base import BaseSerializer
+
+from .metrics import cache_metrics
+
+MSGPACK_MARKER = b"M"
+_MISSING = object()
+
+
+class HybridSerializer(BaseSerializer):
+    """
+    msgpack для простых данных (словари, списки, строки, числа, байты),
+    pickle для остального: экземпляров моделей и QuerySet.
+    Значения msgpack помечаются первым байтом, значения pickle
+    (в том числе записанные до перехода) начинаются с `\\x80`.
+    """
+
+    def dumps(self, value):
+        try:
+            return MSGPACK_MARKER + msgpack.packb(value, use_bin_type=True)
+        except (TypeError, ValueError, OverflowError):
+            return pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+
+    def loads(self, value):
+        if value[:1] == MSGPACK_MARKER:
+            # ключи узлов дерева команды — числа
+            return msgpack.unpackb(value[1:], raw=False, strict_map_key=False)
+        return pickle.loads(value)
+
+
+class ZlibCompressor(zlib.ZlibCompressor):
+    """Сжатие значений длиннее `COMPRESS_MIN_LENGTH` байт"""
+
+    def __init__(self, options):
+        super().__init__(options)
+        self.min_length = options.get("COMPRESS_MIN_LENGTH", self.min_length)
+
+
+class MeteredClient(DefaultClient):
+    """Клиент django-redis со счетчиками попаданий и размеров значений"""
+
+    def get(self, key, default=None, version=None, client=None):
+        value = super().get(key, _MISSING, version=version, client=client)
+        cache_metrics.record_get(value is not _MISSING, value is _MISSING)
+        self.flush_metrics()
+        return default if value is _MISSING else value
+
+    def get_many(self, keys, version=None, client=None):
+        values = super().get_many(keys, version=version, client=client)
+        cache_metrics.record_get(len(values), len(keys) - len(values))
+        self.flush_metrics()
+        return values
+
+    def encode(self, value):
+        value = super().encode(value)
+        if isinstance(value, bytes):
+            cache_metrics.record_set(len(value))
+        return value
+
+    def flush_metrics(self):
+        cache_metrics.flush(self.get_client(write=True))
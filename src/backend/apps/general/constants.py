@@ -3,15 +3,45 @@ from dataclasses import dataclass
 
 @dataclass(frozen=True)
 class CacheKey:
-    USERS = "users"
+    USERS_PAGE = "users:page:{query}"
     USER_BY_ID = "users:{user_id}"
-    PROJECTS = "projects"
-    PROJECT_BY_ID = "projects:{project_id}"
+    AUTH_USER = "auth_user:{user_id}"
+    PROJECTS_PAGE = (
+        "projects:page:{page}:search:{search}:changed_since:{changed_since}"
+    )
     MY_PROJECTS = "my_projects:{user_id}"
-    POSITIONS = "positions"
-    CITIES = "cities"
-    TEAMS = "teams"
+    TEAMS_PAGE = "teams:page:{query}"
     TEAM_BY_ID = "team:{team_id}"
+    TEAM_TREE = "team:{team_id}:tree"
+    FACET = "facet:{facet}"
+    FACETS_BUILD = "facets:build"
+    THUMBNAILS_RETRY = "thumbnails:retry"
+    RESPONSE = "response:{etag}"
+    METRICS = "metrics:cache"
+    GENERATION = "generation:{namespace}"
+    LOCK = "lock:{key}"
+
+
+@dataclass(frozen=True)
+class CacheNamespace:
+    USERS = "users"
+    PROJECTS = "projects"
+    TEAMS = "teams"
     MEMBERS = "members"
-    MEMBERS_TEAM_BY_ID = "members:team:{team_id}"
-    DEPARTMENTS = "departments"
+    TEAM_BY_ID = "team:{team_id}"
+    TEAM_TREE = "team:{team_id}:tree"
+    USER_BY_ID = "user:{user_id}"
+    SUGGEST = "suggest"
+    AUTH_USER = "auth_user:{user_id}"
+
+
+# cookie закрепления клиента за основной базой после записи
+REPLICA_PIN_COOKIE = "replica_pin"
+
+# списки с `?changed_since=` -> модели, удаления которых записываются
+DELETION_LOG = {
+    "projects": "projects.Project",
+    "teams": "projects.Team",
+    "members": "projects.MemberDirectory",
+    "users": "users.CustomUser",
+}
@@ -1,6 +1,19 @@
+from django.contrib.auth import get_user_model
 from django.core.management import BaseCommand, call_command
+from django.db import transaction
 
-from apps.projects.models import Member, ProjectTeam
+from apps.general.cache import invalidate
+from apps.general.constants import CacheNamespace
+from apps.projects.models import (
+    Member,
+    MemberDirectory,
+    ProjectTeam,
+    Team,
+    UserProject,
+)
+from apps.projects.trees import drop_team_trees
+
+User = get_user_model()
 
 
 class Command(BaseCommand):
@@ -13,3 +26,27 @@ class Command(BaseCommand):
         call_command("loaddata", "members.json")
         ProjectTeam.objects.all().delete()
         call_command("loaddata", "project_teams.json")
+        with transaction.atomic():
+            self.rebuild()
+
+    def rebuild(self):
+        """
+        Сигналы пропускают строки фикстур (`raw`): пути, проекции,
+        справочник участников и кэши пересчитываются один раз после загрузки.
+        """
+        team_ids = list(Team.objects.values_list("id", flat=True))
+        user_ids = list(User.objects.values_list("id", flat=True))
+        for team_id in team_ids:
+            Member.objects.rebuild_paths(team_id)
+        UserProject.objects.sync(user_ids)
+        MemberDirectory.objects.refresh(Member.objects.all())
+        drop_team_trees(team_ids)
+        invalidate(
+            CacheNamespace.USERS,
+            CacheNamespace.PROJECTS,
+            CacheNamespace.TEAMS,
+            CacheNamespace.MEMBERS,
+            CacheNamespace.SUGGEST,
+            *(CacheNamespace.TEAM_BY_ID.format(team_id=pk) for pk in team_ids),
+            *(CacheNamespace.USER_BY_ID.format(user_id=pk) for pk in user_ids),
+        )
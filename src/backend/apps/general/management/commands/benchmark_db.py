@@ -0,0 +1,57 @@
+import statistics
+import time
+
+from django.conf import settings
+from django.core.management import BaseCommand
+from django.core.signals import request_finished, request_started
+from django.db import connections
+from django.test import Client
+from django.test.utils import override_settings
+
+
+class Command(BaseCommand):
+    help = (
+        "Задержка запроса с новым соединением с базой данных на каждый "
+        "запрос и с постоянным соединением (CONN_MAX_AGE). Без --path "
+        "запрос выполняет один SELECT 1"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--path")
+        parser.add_argument("--requests", type=int, default=200)
+        parser.add_argument("--conn-max-age", type=int, default=60)
+
+    def handle(self, *args, **options):
+        connection = connections["default"]
+        for conn_max_age in (0, options["conn_max_age"]):
+            connection.close()
+            connection.settings_dict["CONN_MAX_AGE"] = conn_max_age
+            timings = self.measure(options["path"], options["requests"])
+            self.stdout.write(
+                f"CONN_MAX_AGE={conn_max_age}: "
+                f"mean {statistics.mean(timings):.2f} ms, "
+                f"p50 {statistics.median(timings):.2f} ms, "
+                f"p95 {statistics.quantiles(timings, n=20)[-1]:.2f} ms"
+            )
+        connection.close()
+        connection.settings_dict["CONN_MAX_AGE"] = settings.DATABASES[
+            "default"
+        ].get("CONN_MAX_AGE", 0)
+
+    def measure(self, path, count):
+        # тестовый клиент не закрывает соединения, как настоящий сервер,
+        # поэтому сигналы цикла запроса отправляются вручную
+        client = Client()
+        timings = []
+        with override_settings(ALLOWED_HOSTS=["*"]):
+            for _ in range(count):
+                start = time.perf_counter()
+                request_started.send(sender=self.__class__)
+                if path:
+                    client.get(path)
+                else:
+                    with connections["default"].cursor() as cursor:
+                        cursor.execute("SELECT 1")
+                request_finished.send(sender=self.__class__)
+                timings.append((time.perf_counter() - start) * 1000)
+        return timings
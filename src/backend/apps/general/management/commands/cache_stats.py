@@ -0,0 +1,19 @@
+from django.core.management import BaseCommand, CommandError
+
+from apps.general.cache import get_redis
+from apps.general.metrics import get_cache_stats
+
+
+class Command(BaseCommand):
+    help = "Доля попаданий и размеры значений кэша по всем воркерам"
+
+    def handle(self, *args, **options):
+        redis = get_redis()
+        if redis is None:
+            raise CommandError("Кэш работает не на Redis.")
+
+        stats = get_cache_stats(redis)
+        for name, value in stats.items():
+            if isinstance(value, float):
+                value = f"{value:.3f}"
+            self.stdout.write(f"{name}: {value}")
@@ -0,0 +1,52 @@
+import json
+from pathlib import Path
+
+from django.core.management import BaseCommand, CommandError
+
+from apps.projects.constants import IMPORT_BATCH_SIZE
+from apps.projects.imports import (
+    ImportFormatError,
+    MemberImport,
+    number_rows,
+    read_csv,
+    read_json_lines,
+)
+from apps.projects.models import Team
+
+
+class Command(BaseCommand):
+    help = "Импорт участников команды из CSV, JSON или JSON Lines файла"
+
+    def add_arguments(self, parser):
+        parser.add_argument("team_id", type=int)
+        parser.add_argument("path", type=Path)
+        parser.add_argument(
+            "--batch-size", type=int, default=IMPORT_BATCH_SIZE
+        )
+
+    def handle(self, *args, **options):
+        try:
+            team = Team.objects.get(pk=options["team_id"])
+        except Team.DoesNotExist:
+            raise CommandError(f"Команда {options['team_id']} не найдена.")
+
+        path = options["path"]
+        with path.open("rb") as f:
+            try:
+                if path.suffix == ".csv":
+                    rows = read_csv(f)
+                elif path.suffix == ".jsonl":
+                    rows = read_json_lines(f)
+                else:
+                    rows = number_rows(json.load(f))
+                result = MemberImport(team, options["batch_size"]).run(rows)
+            except (
+                ImportFormatError,
+                json.JSONDecodeError,
+                UnicodeDecodeError,
+            ) as error:
+                raise CommandError(f"{path}: {error}")
+
+        for error in result["errors"]:
+            self.stderr.write(f"{error['line']}: {error['errors']}")
+        self.stdout.write(f"Добавлено участников: {result['created']}")
@@ -0,0 +1,18 @@
+from django.core.management import BaseCommand
+
+from apps.users.thumbnails import make_thumbnails, pending_thumbnails
+
+
+class Command(BaseCommand):
+    help = "Миниатюры аватаров, для которых они еще не построены"
+
+    def handle(self, *args, **options):
+        count = 0
+        for user_id, image in pending_thumbnails().iterator():
+            try:
+                make_thumbnails(user_id, image)
+            except OSError as error:
+                self.stderr.write(f"{image}: {error}")
+            else:
+                count += 1
+        self.stdout.write(f"Обработано аватаров: {count}")
@@ -0,0 +1,94 @@
+import threading
+import time
+from collections import Counter
+
+from django.core.cache import cache
+from redis.exceptions import RedisError
+
+from .constants import CacheKey
+
+METRICS_FLUSH_INTERVAL = 10
+# границы корзин размера записанных значений, байт
+SIZE_BUCKETS = (
+    (1024, "size_1k"),
+    (10 * 1024, "size_10k"),
+    (100 * 1024, "size_100k"),
+)
+SIZE_OVERFLOW = "size_large"
+
+
+class CacheMetrics:
+    """
+    Счетчики кэша процесса: попадания, промахи, записи и размеры значений.
+    Раз в `METRICS_FLUSH_INTERVAL` секунд прибавляются к общему хэшу в Redis,
+    чтобы статистика собиралась со всех воркеров.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counters = Counter()
+        self.flushed = time.monotonic()
+
+    def record_get(self, hits, misses):
+        with self.lock:
+            self.counters["hits"] += hits
+            self.counters["misses"] += misses
+
+    def record_set(self, size):
+        bucket = next(
+            (name for limit, name in SIZE_BUCKETS if size <= limit),
+            SIZE_OVERFLOW,
+        )
+        with self.lock:
+            self.counters["sets"] += 1
+            self.counters["bytes"] += size
+            self.counters[bucket] += 1
+            self.counters["max_size"] = max(self.counters["max_size"], size)
+
+    def flush(self, redis, force=False):
+        now = time.monotonic()
+        if not force and now - self.flushed < METRICS_FLUSH_INTERVAL:
+            return
+        with self.lock:
+            counters, self.counters = self.counters, Counter()
+            self.flushed = now
+        if not counters:
+            return
+        key = cache.make_key(CacheKey.METRICS)
+        max_size = counters.pop("max_size", 0)
+        try:
+            with redis.pipeline(transaction=False) as pipe:
+                for name, value in counters.items():
+                    pipe.hincrby(key, name, value)
+                pipe.execute()
+            # максимум не суммируется, а сравнивается
+            if max_size > int(redis.hget(key, "max_size") or 0):
+                redis.hset(key, "max_size", max_size)
+        except RedisError:
+            # Redis недоступен: счетчики интервала теряются
+            pass
+
+
+cache_metrics = CacheMetrics()
+
+
+def get_cache_stats(redis):
+    """Накопленные счетчики и статистика сервера Redis"""
+    counters = {
+        name.decode(): int(value)
+        for name, value in redis.hgetall(
+            cache.make_key(CacheKey.METRICS)
+        ).items()
+    }
+    info = redis.info()
+    hits, misses = counters.get("hits", 0), counters.get("misses", 0)
+    sets = counters.get("sets", 0)
+    return {
+        **counters,
+        "hit_rate": hits / (hits + misses) if hits + misses else None,
+        "mean_size": counters.get("bytes", 0) / sets if sets else None,
+        "server_hits": info["keyspace_hits"],
+        "server_misses": info["keyspace_misses"],
+        "used_memory": info["used_memory_human"],
+        "connected_clients": info["connected_clients"],
+    }
@@ -0,0 +1,75 @@
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+
+from .constants import REPLICA_PIN_COOKIE
+from .routers import read_from_replica
+
+SAFE_METHODS = ("GET", "HEAD", "OPTIONS")
+
+
+class ReplicaMiddleware:
+    """
+    Безопасные запросы читают из реплик.
+    После успешного изменения клиент на `DATABASE_REPLICA_PIN_TIMEOUT`
+    секунд закрепляется за основной базой, чтобы видеть свои изменения
+    до того, как их догонит репликация. Срок закрепления хранится в cookie
+    клиента: запросы без недавних изменений не обращаются к кэшу.
+    Работает и в синхронной, и в асинхронной цепочке middleware.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    @staticmethod
+    def is_pinned(request):
+        try:
+            until = float(request.COOKIES.get(REPLICA_PIN_COOKIE, 0))
+        except ValueError:
+            return False
+        return until > time.time()
+
+    @staticmethod
+    def pin(response):
+        timeout = settings.DATABASE_REPLICA_PIN_TIMEOUT
+        if response.status_code < 400:
+            response.set_cookie(
+                REPLICA_PIN_COOKIE,
+                str(time.time() + timeout),
+                max_age=timeout,
+                httponly=True,
+                samesite="Lax",
+            )
+        return response
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not settings.DATABASE_REPLICAS:
+            return self.get_response(request)
+        if request.method not in SAFE_METHODS:
+            return self.pin(self.get_response(request))
+
+        token = read_from_replica.set(not self.is_pinned(request))
+        try:
+            return self.get_response(request)
+        finally:
+            read_from_replica.reset(token)
+
+    async def __acall__(self, request):
+        if not settings.DATABASE_REPLICAS:
+            return await self.get_response(request)
+        if request.method not in SAFE_METHODS:
+            return self.pin(await self.get_response(request))
+
+        token = read_from_replica.set(not self.is_pinned(request))
+        try:
+            return await self.get_response(request)
+        finally:
+            read_from_replica.reset(token)
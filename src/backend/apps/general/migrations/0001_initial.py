@@ -0,0 +1,50 @@
+# Generated by Django 4.2.14 on 2026-10-18 06:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    initial = True
+
+    dependencies = []
+
+    operations = [
+        migrations.CreateModel(
+            name="Deletion",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "resource",
+                    models.CharField(max_length=50, verbose_name="Список"),
+                ),
+                (
+                    "object_id",
+                    models.PositiveBigIntegerField(verbose_name="ID"),
+                ),
+                (
+                    "deleted",
+                    models.DateTimeField(
+                        auto_now_add=True, verbose_name="Удалено"
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Удаление",
+                "verbose_name_plural": "Удаления",
+                "indexes": [
+                    models.Index(
+                        fields=["deleted", "resource"],
+                        name="general_del_deleted_c8f0e7_idx",
+                    )
+                ],
+            },
+        ),
+    ]
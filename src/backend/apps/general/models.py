@@ -3,7 +3,23 @@ from django.db import models
 
 class CreatedField(models.Model):
     created = models.DateTimeField("Создано", auto_now_add=True)
-    updated = models.DateTimeField("Обновлено", auto_now=True)
+    updated = models.DateTimeField("Обновлено", auto_now=True, db_index=True)
 
     class Meta:
         abstract = True
+
+
+class Deletion(models.Model):
+    """Удаленная строка списка для клиентов с `?changed_since=`"""
+
+    resource = models.CharField("Список", max_length=50)
+    object_id = models.PositiveBigIntegerField("ID")
+    deleted = models.DateTimeField("Удалено", auto_now_add=True)
+
+    class Meta:
+        verbose_name = "Удаление"
+        verbose_name_plural = "Удаления"
+        indexes = [models.Index(fields=("deleted", "resource"))]
+
+    def __str__(self):
+        return f"{self.resource}:{self.object_id}"
@@ -0,0 +1,62 @@
+import random
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+# читать ли из реплик в текущем запросе, выставляет `ReplicaMiddleware`
+read_from_replica = ContextVar("read_from_replica", default=False)
+
+
+def read_primary_if_changed(generations):
+    """
+    Чтение из основной базы до конца запроса, если данные пространств имен
+    менялись позже `DATABASE_REPLICA_PIN_TIMEOUT` секунд назад: реплика
+    может отстать, а ответ сохраняется в кэш под новым поколением.
+    """
+    age = time.time_ns() - max(generations)
+    if age < settings.DATABASE_REPLICA_PIN_TIMEOUT * 10**9:
+        read_from_replica.set(False)
+
+
+@contextmanager
+def read_primary():
+    """
+    Чтение из основной базы внутри блока.
+    Для построения кэшей и материализованных данных: они сохраняются под
+    текущим поколением, и отставшая реплика закрепила бы старые данные.
+    """
+    token = read_from_replica.set(False)
+    try:
+        yield
+    finally:
+        read_from_replica.reset(token)
+
+
+class ReplicaRouter:
+    """
+    Чтение из реплик `DATABASE_REPLICAS` в безопасных запросах.
+    Запись, чтение вне запроса и внутри транзакции идут в основную базу.
+    """
+
+    def db_for_read(self, model, **hints):
+        replicas = settings.DATABASE_REPLICAS
+        if (
+            not replicas
+            or not read_from_replica.get()
+            or connections[DEFAULT_DB_ALIAS].in_atomic_block
+        ):
+            return DEFAULT_DB_ALIAS
+        return random.choice(replicas)
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # реплики содержат те же данные, что и основная база
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == DEFAULT_DB_ALIAS
@@ -0,0 +1,91 @@
+"""
+Хранилище аватаров в S3-совместимом объектном хранилище (S3, MinIO).
+Модуль импортируется, только если он указан в `STORAGES`: `django-storages`
+и `boto3` нужны лишь в этом режиме.
+"""
+
+import base64
+
+from botocore.exceptions import ClientError
+from storages.backends.s3 import S3File, S3Storage
+from storages.utils import clean_name
+
+from .storage import ContentHashMixin
+
+
+class S3ContentHashStorage(ContentHashMixin, S3Storage):
+    """
+    Файлы по хэшу содержимого в бакете S3.
+    Клиенты загружают файлы напрямую по presigned POST под ключом по
+    SHA-256 содержимого, хранилище сверяет хэш при загрузке. Файл из того
+    же бакета сохраняется копированием на стороне хранилища, без передачи
+    через бэкенд.
+    """
+
+    def __init__(self, upload_endpoint_url=None, **kwargs):
+        # адрес хранилища для клиентов, если бэкенд ходит по внутреннему
+        self.upload_endpoint_url = upload_endpoint_url
+        super().__init__(**kwargs)
+
+    def _head(self, name):
+        """Метаданные объекта одним HEAD или `None`, если его нет"""
+        obj = self.bucket.Object(self._normalize_name(clean_name(name)))
+        try:
+            obj.load()
+        except ClientError as error:
+            if error.response["ResponseMetadata"]["HTTPStatusCode"] == 404:
+                return None
+            raise
+        return obj
+
+    def exists(self, name):
+        # S3Storage с file_overwrite всегда отвечает False, а сохранение по
+        # хэшу и проверка прямых загрузок опираются на наличие объекта
+        return self._head(name) is not None
+
+    def upload_info(self, name):
+        obj = self._head(name)
+        if obj is None:
+            return None
+        return obj.content_length, obj.content_type
+
+    def presigned_post(self, name, content_type, sha256, max_size, expires):
+        """
+        Адрес и поля формы для загрузки файла `name` клиентом.
+        Хранилище отклоняет файл, SHA-256 которого не совпадает с `sha256`.
+        """
+        fields = {
+            "Content-Type": content_type,
+            "x-amz-checksum-algorithm": "SHA256",
+            "x-amz-checksum-sha256": base64.b64encode(
+                bytes.fromhex(sha256)
+            ).decode(),
+        }
+        post = self.bucket.meta.client.generate_presigned_post(
+            self.bucket_name,
+            self._normalize_name(clean_name(name)),
+            Fields=fields,
+            Conditions=[
+                *({field: value} for field, value in fields.items()),
+                ["content-length-range", 1, max_size],
+            ],
+            ExpiresIn=expires,
+        )
+        if self.upload_endpoint_url:
+            # подпись формы не зависит от адреса хранилища
+            post["url"] = (
+                f"{self.upload_endpoint_url.rstrip('/')}/{self.bucket_name}/"
+            )
+        return post
+
+    def _save(self, name, content):
+        if not (isinstance(content, S3File) and content._storage is self):
+            return super()._save(name, content)
+        cleaned_name = clean_name(name)
+        key = self._normalize_name(cleaned_name)
+        params = self._get_write_parameters(key, content)
+        self.bucket.Object(key).copy(
+            {"Bucket": self.bucket_name, "Key": content.obj.key},
+            ExtraArgs={**params, "MetadataDirective": "REPLACE"},
+        )
+        return cleaned_name
@@ -0,0 +1,21 @@
+from django.apps import apps
+from django.db.models.signals import post_delete
+
+from .constants import DELETION_LOG
+from .models import Deletion
+
+
+def log_deletion(resource):
+    def receiver(sender, instance, **kwargs):
+        Deletion.objects.create(resource=resource, object_id=instance.pk)
+
+    return receiver
+
+
+for resource, label in DELETION_LOG.items():
+    post_delete.connect(
+        log_deletion(resource),
+        sender=apps.get_model(label),
+        weak=False,
+        dispatch_uid=f"log_deletion:{resource}",
+    )
@@ -0,0 +1,84 @@
+import hashlib
+import mimetypes
+import posixpath
+
+from django.apps import apps
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage, storages
+
+HASH_LENGTH = 32
+
+
+class ContentHashMixin:
+    """
+    Файлы называются по хэшу содержимого: `<каталог>/<sha256>.<расширение>`.
+    Одинаковые загрузки сохраняются один раз, а измененный файл получает
+    новый URL, поэтому файлы можно кэшировать навсегда.
+    Файл удаляется, только если на него не ссылается ни одно поле из
+    `references` (`"app_label.Model.field"`): содержимое может быть общим.
+    Хэш, уже известный для файла (`content.content_hash`), повторно не
+    считается: файл не читается.
+    """
+
+    def __init__(self, references=(), **kwargs):
+        self.references = references
+        super().__init__(**kwargs)
+
+    def hashed_name(self, name, content):
+        content_hash = getattr(content, "content_hash", None)
+        if content_hash is None:
+            digest = hashlib.sha256()
+            for chunk in content.chunks():
+                digest.update(chunk)
+            content.seek(0)
+            content_hash = digest.hexdigest()
+        ext = posixpath.splitext(name)[1].lower()
+        return posixpath.join(
+            posixpath.dirname(name), content_hash[:HASH_LENGTH] + ext
+        )
+
+    def upload_info(self, name):
+        """Размер и тип содержимого файла или `None`, если его нет"""
+        if not self.exists(name):
+            return None
+        return self.size(name), mimetypes.guess_type(name)[0]
+
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        if not hasattr(content, "chunks"):
+            content = File(content, name)
+        name = self.hashed_name(name, content)
+        if self.exists(name):
+            return name
+        return super().save(name, content, max_length)
+
+    def save_derived(self, name, content):
+        """
+        Производный файл (миниатюра) под точным именем.
+        Имя получено из имени оригинала, то есть из его хэша, поэтому
+        существующий файл уже содержит нужные данные.
+        """
+        if self.exists(name):
+            return name
+        return super().save(name, content)
+
+    def is_referenced(self, name):
+        for reference in self.references:
+            label, field = reference.rsplit(".", 1)
+            model = apps.get_model(label)
+            if model._base_manager.filter(**{field: name}).exists():
+                return True
+        return False
+
+    def delete(self, name):
+        if not self.is_referenced(name):
+            super().delete(name)
+
+
+class ContentHashStorage(ContentHashMixin, FileSystemStorage):
+    pass
+
+
+def get_avatar_storage():
+    return storages["avatars"]
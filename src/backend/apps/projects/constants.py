@@ -7,3 +7,11 @@ GREATER_THAN_ENDED_DATE = "Начальная дата не может быть
 LESS_THAN_TODAY = "Нельзя создать проект задним числом."
 PROJECT_MAX_LENGTH = 255
 MAX_LENGTH = 150
+TEAM_TREE_TIMEOUT = 60 * 60
+MEMBER_PATH_MAX_LENGTH = 2048
+MEMBER_PATH_SEPARATOR = "/"
+IMPORT_BATCH_SIZE = 500
+FACETS_TIMEOUT = 60 * 60
+FACETS_BUILD_TIMEOUT = 30
+FACETS_LOCK_WAIT = 0.2
+MEMBER_MOVE_FIELDS = ("parent", "updated")
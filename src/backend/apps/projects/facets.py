@@ -0,0 +1,181 @@
+import uuid
+from collections import Counter
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, Q
+from redis.exceptions import RedisError
+
+from apps.general.cache import cache_lock, get_redis
+from apps.general.constants import CacheKey
+from apps.general.routers import read_primary
+from .constants import FACETS_BUILD_TIMEOUT, FACETS_LOCK_WAIT, FACETS_TIMEOUT
+
+FACET_FIELDS = {  # фасет -> колонка справочника участников
+    "cities": "city",
+    "positions": "position",
+    "departments": "department",
+}
+BUILT_FIELD = ""  # служебное поле: хэш построен, даже если значений нет
+
+# Счетчики меняются, только если хэш уже построен, обнуленные удаляются.
+# Изменение во время построения (KEYS[2]) отменяет публикацию новых хэшей
+INCREMENT_SCRIPT = """
+redis.call("del", KEYS[2])
+if redis.call("exists", KEYS[1]) == 0 then
+    return 0
+end
+for i = 1, #ARGV, 2 do
+    if redis.call("hincrby", KEYS[1], ARGV[i], ARGV[i + 1]) <= 0 then
+        redis.call("hdel", KEYS[1], ARGV[i])
+    end
+end
+return 1
+"""
+
+# Построенные хэши (ARGV) заменяют текущие (KEYS[2..]), только если
+# метка построения KEYS[1] не снята изменениями, иначе удаляются
+PUBLISH_SCRIPT = """
+local published = redis.call("get", KEYS[1]) == ARGV[1]
+for i = 2, #KEYS do
+    if published then
+        redis.call("rename", ARGV[i], KEYS[i])
+    else
+        redis.call("del", ARGV[i])
+    end
+end
+redis.call("del", KEYS[1])
+return published and 1 or 0
+"""
+
+
+def count_facets(queryset):
+    """Значения фасетов с количеством участников через `GROUP BY`"""
+    facets = {}
+    for name, field in FACET_FIELDS.items():
+        empty = Q(**{field: ""}) | Q(**{f"{field}__isnull": True})
+        rows = (
+            queryset.exclude(empty)
+            .values_list(field)
+            .annotate(count=Count("pk"))
+            .order_by(field)
+        )
+        facets[name] = [{"value": value, "count": n} for value, n in rows]
+    return facets
+
+
+def _facet_key(name):
+    return cache.make_key(CacheKey.FACET.format(facet=name))
+
+
+def _build_facets(redis, queryset):
+    """
+    Хэши строятся во временных ключах и публикуются `RENAME`, если за время
+    `GROUP BY` справочник не менялся; иначе их построит следующий запрос.
+    """
+    build_key = cache.make_key(CacheKey.FACETS_BUILD)
+    token = uuid.uuid4().hex
+    redis.set(build_key, token, ex=FACETS_BUILD_TIMEOUT)
+    with read_primary():
+        facets = count_facets(queryset)
+    keys = [_facet_key(name) for name in facets]
+    temp_keys = [f"{key}:{token}" for key in keys]
+    with redis.pipeline() as pipe:
+        for temp_key, values in zip(temp_keys, facets.values()):
+            pipe.hset(
+                temp_key,
+                mapping={
+                    BUILT_FIELD: 0,
+                    **{item["value"]: item["count"] for item in values},
+                },
+            )
+            pipe.expire(temp_key, FACETS_TIMEOUT)
+        pipe.execute()
+    publish = redis.register_script(PUBLISH_SCRIPT)
+    publish(keys=[build_key, *keys], args=[token, *temp_keys])
+    return facets
+
+
+def get_facets(queryset):
+    """
+    Фасеты по всем участникам.
+    С Redis счетчики хранятся в хэшах и обновляются `HINCRBY` при изменении
+    справочника, при отсутствии хэши строятся одним `GROUP BY` и живут
+    `FACETS_TIMEOUT`. Пока хэши строит другой запрос, а также без Redis
+    значения считаются запросом к базе данных.
+    """
+    redis = get_redis()
+    if redis is None:
+        return count_facets(queryset)
+
+    try:
+        with redis.pipeline(transaction=False) as pipe:
+            for name in FACET_FIELDS:
+                pipe.hgetall(_facet_key(name))
+            stored = pipe.execute()
+        if not all(stored):
+            with cache_lock(
+                CacheKey.FACETS_BUILD, blocking_timeout=FACETS_LOCK_WAIT
+            ) as acquired:
+                if not acquired:
+                    return count_facets(queryset)
+                return _build_facets(redis, queryset)
+    except RedisError:
+        return count_facets(queryset)
+
+    facets = {}
+    for name, counts in zip(FACET_FIELDS, stored):
+        values = {
+            value.decode(): int(n)
+            for value, n in counts.items()
+            if value.decode() != BUILT_FIELD
+        }
+        facets[name] = [
+            {"value": value, "count": values[value]}
+            for value in sorted(values)
+        ]
+    return facets
+
+
+def _increment(redis, deltas):
+    script = redis.register_script(INCREMENT_SCRIPT)
+    build_key = cache.make_key(CacheKey.FACETS_BUILD)
+    try:
+        with redis.pipeline(transaction=False) as pipe:
+            for name, args in deltas.items():
+                script(
+                    keys=[_facet_key(name), build_key], args=args, client=pipe
+                )
+            pipe.execute()
+    except RedisError:
+        # изменение потеряно, хэши пересоберутся через `FACETS_TIMEOUT`
+        pass
+
+
+def update_facets(removed=(), added=()):
+    """
+    Изменение счетчиков по удаленным и добавленным строкам справочника.
+    Строки — словари с колонками из `FACET_FIELDS`, счетчики меняются
+    после фиксации транзакции.
+    """
+    redis = get_redis()
+    if redis is None:
+        return
+
+    deltas = {}
+    for name, field in FACET_FIELDS.items():
+        delta = Counter(row[field] for row in added if row[field])
+        delta.subtract(row[field] for row in removed if row[field])
+        args = []
+        for value, n in delta.items():
+            if n:
+                args.extend((value, n))
+        if args:
+            deltas[name] = args
+    if deltas:
+        transaction.on_commit(lambda: _increment(redis, deltas))
+
+
+def facets_enabled():
+    """Нужно ли считать изменения счетчиков фасетов"""
+    return get_redis() is not None
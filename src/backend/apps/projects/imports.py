@@ -0,0 +1,212 @@
+import csv
+import json
+from itertools import islice
+
+from django.contrib.auth import get_user_model
+from django.db import transaction
+
+from apps.general.cache import invalidate
+from apps.general.constants import CacheKey, CacheNamespace
+from .constants import IMPORT_BATCH_SIZE
+from .models import Department, Member, MemberDirectory, UserProject
+
+User = get_user_model()
+
+IMPORT_FIELDS = ("email", "parent", "department")
+
+
+def batched(iterable, size):
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+class ImportFormatError(ValueError):
+    """Файл импорта нельзя прочитать дальше"""
+
+
+class InvalidRow:
+    """Строка файла, которую не удалось разобрать"""
+
+    def __init__(self, errors):
+        self.errors = errors
+
+
+INVALID_JSON = InvalidRow({"non_field_errors": "Некорректный JSON."})
+
+
+def read_csv(lines):
+    """
+    Пары (номер строки файла, строка) из байтовых строк CSV.
+    Номера считаются по файлу, вместе с заголовком.
+    """
+
+    def decode():
+        for number, line in enumerate(lines, start=1):
+            try:
+                yield line.decode("utf-8-sig" if number == 1 else "utf-8")
+            except UnicodeDecodeError:
+                raise ImportFormatError(
+                    f"Строка {number}: ожидается кодировка UTF-8."
+                )
+
+    reader = csv.DictReader(decode())
+    for row in reader:
+        yield reader.line_num, row
+
+
+def read_json_lines(lines):
+    """Пары (номер строки файла, строка) из байтовых строк JSON Lines"""
+    for number, line in enumerate(lines, start=1):
+        if not line.strip():
+            continue
+        try:
+            yield number, json.loads(line)
+        except ValueError:  # и UnicodeDecodeError
+            yield number, INVALID_JSON
+
+
+def number_rows(rows):
+    """Пары (номер, строка) для списка строк JSON"""
+    return enumerate(rows, start=1)
+
+
+def normalize_row(row):
+    if not isinstance(row, dict):
+        row = {}
+    return {key: str(row.get(key) or "").strip() for key in IMPORT_FIELDS}
+
+
+class MemberImport:
+    """
+    Массовое добавление участников в команду.
+    Строки обрабатываются пачками: пользователи, руководители и отделы
+    пачки ищутся одним запросом на каждую модель, участники создаются
+    через `bulk_create`. Руководитель (`parent`, email) должен уже состоять
+    в команде или идти раньше в импорте. Строки передаются парами
+    (номер строки, строка) из `read_csv`, `read_json_lines` или
+    `number_rows`.
+    Сигналы не отправляются: пути, проекции проектов и справочник
+    пересчитываются отдельно, кэш инвалидируется один раз в конце.
+    """
+
+    def __init__(self, team, batch_size=IMPORT_BATCH_SIZE):
+        self.team = team
+        self.batch_size = batch_size
+        self.members = {}  # email -> id участника команды
+        self.user_ids = []
+        self.errors = []
+
+    def run(self, rows):
+        with transaction.atomic():
+            for batch in batched(rows, self.batch_size):
+                self.import_batch(batch)
+            if self.user_ids:
+                Member.objects.rebuild_paths(self.team.id)
+            for user_ids in batched(self.user_ids, self.batch_size):
+                UserProject.objects.sync(user_ids)
+                MemberDirectory.objects.refresh(
+                    Member.objects.filter(team=self.team, user_id__in=user_ids)
+                )
+        self.invalidate()
+        return {"created": len(self.user_ids), "errors": self.errors}
+
+    def import_batch(self, rows):
+        valid = []
+        for line, row in rows:
+            if isinstance(row, InvalidRow):
+                self.errors.append({"line": line, "errors": row.errors})
+            else:
+                valid.append((line, normalize_row(row)))
+        rows = valid
+        emails = {row[k] for _, row in rows for k in ("email", "parent")}
+        emails.discard("")
+        users = User.objects.only("id", "email").in_bulk(
+            emails, field_name="email"
+        )
+        self.members.update(
+            Member.objects.filter(
+                team=self.team, user__email__in=emails
+            ).values_list("user__email", "id")
+        )
+        departments = self.get_departments(
+            {row["department"] for _, row in rows} - {""}
+        )
+
+        pending, seen = [], set()
+        for line, row in rows:
+            errors = self.validate_row(row, users, seen)
+            if errors:
+                self.errors.append({"line": line, "errors": errors})
+            else:
+                seen.add(row["email"])
+                pending.append((line, row))
+
+        while pending:
+            ready = [
+                (line, row)
+                for line, row in pending
+                if not row["parent"] or row["parent"] in self.members
+            ]
+            if not ready:
+                break
+            created = Member.objects.bulk_create(
+                Member(
+                    team=self.team,
+                    user=users[row["email"]],
+                    department=departments[row["department"]],
+                    parent_id=self.members.get(row["parent"]),
+                )
+                for _, row in ready
+            )
+            for (_, row), member in zip(ready, created):
+                self.members[row["email"]] = member.id
+                self.user_ids.append(member.user_id)
+            ready_lines = {line for line, _ in ready}
+            pending = [item for item in pending if item[0] not in ready_lines]
+
+        for line, _ in pending:
+            self.errors.append(
+                {"line": line, "errors": {"parent": "Нет в команде."}}
+            )
+
+    def validate_row(self, row, users, seen):
+        errors = {}
+        email = row["email"]
+        if not email:
+            errors["email"] = "Обязательное поле."
+        elif email not in users:
+            errors["email"] = "Пользователь не найден."
+        elif email in self.members or email in seen:
+            errors["email"] = "Уже состоит в команде."
+        if not row["department"]:
+            errors["department"] = "Обязательное поле."
+        if row["parent"] and row["parent"] == email:
+            errors["parent"] = "Участник не может быть в подчинении у себя же."
+        return errors
+
+    def get_departments(self, names):
+        departments = Department.objects.in_bulk(names, field_name="name")
+        missing = names - departments.keys()
+        if missing:
+            Department.objects.bulk_create(
+                [Department(name=name) for name in missing],
+                ignore_conflicts=True,
+            )
+            departments.update(
+                Department.objects.in_bulk(missing, field_name="name")
+            )
+        return departments
+
+    def invalidate(self):
+        if not self.user_ids:
+            return
+        invalidate(
+            CacheNamespace.MEMBERS,
+            CacheNamespace.TEAM_BY_ID.format(team_id=self.team.id),
+            *(
+                CacheNamespace.USER_BY_ID.format(user_id=user_id)
+                for user_id in self.user_ids
+            ),
+            keys=[CacheKey.TEAM_TREE.format(team_id=self.team.id)],
+        )
@@ -0,0 +1,193 @@
+from functools import reduce
+from operator import or_
+
+from django.db import connection, models
+from django.db.models import Q, Value
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import Concat, Substr
+
+from .constants import MEMBER_PATH_SEPARATOR
+from .facets import FACET_FIELDS, facets_enabled, update_facets
+
+DIRECTORY_MEMBER_FIELDS = {  # колонка справочника -> поле участника
+    "member_id": "id",
+    "last_name": "user__last_name",
+    "first_name": "user__first_name",
+    "middle_name": "user__middle_name",
+    "image": "user__image",
+    "thumbnails_source": "user__thumbnails_source",
+    "department": "department__name",
+    "position": "user__profile__position",
+    "city": "user__profile__city",
+}
+DIRECTORY_BATCH_SIZE = 1000
+
+HIERARCHY_SQL = """
+WITH RECURSIVE hierarchy (id, deep) AS (
+    SELECT id, {root_deep} FROM {table} WHERE {root_condition}
+    UNION ALL
+    SELECT m.id, h.deep + 1
+    FROM {table} m JOIN hierarchy h ON m.parent_id = h.id
+    WHERE h.deep < %s
+)
+SELECT id FROM hierarchy
+"""
+
+
+class MemberQuerySet(models.QuerySet):
+    def hierarchy(self, team, max_deep, root_id=None):
+        """
+        Участники команды не глубже `max_deep` уровней.
+        Без `root_id` корнем считается руководитель команды, а участники
+        без руководителя идут на первом уровне, как и его подчиненные.
+        `WITH RECURSIVE` поддерживают и PostgreSQL, и SQLite.
+        """
+        table = connection.ops.quote_name(self.model._meta.db_table)
+        if root_id is None:
+            sql = HIERARCHY_SQL.format(
+                table=table,
+                root_deep="CASE WHEN user_id = %s THEN 0 ELSE 1 END",
+                root_condition=(
+                    "team_id = %s AND (user_id = %s OR parent_id IS NULL)"
+                ),
+            )
+            params = (team.owner_id, team.id, team.owner_id, max_deep)
+        else:
+            sql = HIERARCHY_SQL.format(
+                table=table,
+                root_deep="0",
+                root_condition="team_id = %s AND id = %s",
+            )
+            params = (team.id, root_id, max_deep)
+        return self.filter(id__in=RawSQL(sql, params))
+
+    def replace_path_prefix(self, old_prefix, new_prefix):
+        """Перенос поддерева: замена префикса пути у всех его узлов"""
+        if not old_prefix:
+            return 0
+        return self.filter(path__startswith=old_prefix).update(
+            path=Concat(
+                Value(new_prefix),
+                Substr("path", len(old_prefix) + 1),
+                output_field=models.CharField(),
+            )
+        )
+
+    def rebuild_paths(self, team_id):
+        """Пересчет путей участников команды, сохраняются только измененные"""
+        parents, old_paths = {}, {}
+        for pk, parent_id, path in self.filter(team_id=team_id).values_list(
+            "id", "parent_id", "path"
+        ):
+            parents[pk], old_paths[pk] = parent_id, path
+        paths = {}
+
+        def get_path(member_id):
+            chain = []
+            while member_id is not None and member_id not in paths:
+                if member_id in chain:  # защита от циклов в старых данных
+                    break
+                chain.append(member_id)
+                member_id = parents.get(member_id)
+            prefix = paths.get(member_id, "")
+            for pk in reversed(chain):
+                prefix = paths[pk] = f"{prefix}{pk}{MEMBER_PATH_SEPARATOR}"
+            return prefix
+
+        members = [
+            self.model(id=pk, path=get_path(pk))
+            for pk in parents
+            if get_path(pk) != old_paths[pk]
+        ]
+        self.bulk_update(members, ["path"])
+
+
+class UserProjectQuerySet(models.QuerySet):
+    def sync(self, user_ids):
+        """
+        Пересчет проекций пользователей по их участию в командах.
+        Удаляются только устаревшие строки и добавляются только новые.
+        """
+        user_ids = set(user_ids)
+        if not user_ids:
+            return
+        project_model = self.model._meta.get_field("project").related_model
+        actual = set(
+            project_model.objects.filter(
+                teams__members__user_id__in=user_ids
+            ).values_list("teams__members__user_id", "id")
+        )
+        stored = set(
+            self.filter(user_id__in=user_ids).values_list(
+                "user_id", "project_id"
+            )
+        )
+        stale = stored - actual
+        if stale:
+            self.filter(
+                reduce(
+                    or_,
+                    (Q(user_id=user, project_id=pk) for user, pk in stale),
+                )
+            ).delete()
+        self.bulk_create(
+            [
+                self.model(user_id=user, project_id=pk)
+                for user, pk in actual - stored
+            ],
+            ignore_conflicts=True,
+        )
+
+    def sync_teams(self, team_ids):
+        """Пересчет проекций всех участников команд"""
+        user_model = self.model._meta.get_field("user").related_model
+        self.sync(
+            user_model.objects.filter(members__team_id__in=team_ids)
+            .values_list("id", flat=True)
+            .distinct()
+        )
+
+
+class MemberDirectoryQuerySet(models.QuerySet):
+    def refresh(self, members):
+        """
+        Пересборка строк справочника для выборки участников через upsert.
+        Счетчики фасетов сдвигаются на разницу старых и новых строк.
+        """
+        rows = [
+            self.model(
+                **{
+                    column: values[field]
+                    for column, field in DIRECTORY_MEMBER_FIELDS.items()
+                }
+            ).normalize()
+            for values in members.values(*DIRECTORY_MEMBER_FIELDS.values())
+        ]
+        if not rows:
+            return
+        removed = ()
+        if facets_enabled():
+            removed = list(
+                self.filter(
+                    member_id__in=[row.member_id for row in rows]
+                ).values(*FACET_FIELDS.values())
+            )
+        update_fields = [
+            field.name
+            for field in self.model._meta.concrete_fields
+            if not field.primary_key
+        ]
+        self.bulk_create(
+            rows,
+            batch_size=DIRECTORY_BATCH_SIZE,
+            update_conflicts=True,
+            unique_fields=["member"],
+            update_fields=update_fields,
+        )
+        update_facets(
+            removed,
+            [
+                {field: getattr(row, field) for field in FACET_FIELDS.values()}
+                for row in rows
+            ],
+        )
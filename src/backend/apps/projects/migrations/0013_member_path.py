@@ -0,0 +1,55 @@
+# Generated by Django 4.2.14 on 2026-10-18 04:34
+
+from django.db import migrations, models
+
+
+def fill_member_paths(apps, schema_editor):
+    Member = apps.get_model("projects", "Member")
+    parents = dict(Member.objects.values_list("id", "parent_id"))
+    paths = {}
+
+    def get_path(member_id):
+        chain = []
+        while member_id is not None and member_id not in paths:
+            if member_id in chain:
+                break
+            chain.append(member_id)
+            member_id = parents.get(member_id)
+        prefix = paths.get(member_id, "")
+        for pk in reversed(chain):
+            prefix = paths[pk] = f"{prefix}{pk}/"
+        return prefix
+
+    Member.objects.bulk_update(
+        [Member(id=pk, path=get_path(pk)) for pk in parents],
+        ["path"],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("projects", "0012_alter_department_name_alter_project_name"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="member",
+            name="path",
+            field=models.CharField(
+                blank=True,
+                editable=False,
+                max_length=2048,
+                verbose_name="Путь от корня",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="member",
+            index=models.Index(
+                fields=["path"],
+                name="member_path_index",
+                opclasses=["varchar_pattern_ops"],
+            ),
+        ),
+        migrations.RunPython(fill_member_paths, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,72 @@
+# Generated by Django 4.2.14 on 2026-10-18 04:46
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def fill_user_projects(apps, schema_editor):
+    Project = apps.get_model("projects", "Project")
+    UserProject = apps.get_model("projects", "UserProject")
+    pairs = (
+        Project.objects.filter(teams__members__isnull=False)
+        .values_list("teams__members__user_id", "id")
+        .distinct()
+    )
+    UserProject.objects.bulk_create(
+        [UserProject(user_id=user_id, project_id=pk) for user_id, pk in pairs],
+        batch_size=1000,
+        ignore_conflicts=True,
+    )
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ("projects", "0013_member_path"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="UserProject",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "project",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to="projects.project",
+                        verbose_name="Проект",
+                    ),
+                ),
+                (
+                    "user",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to=settings.AUTH_USER_MODEL,
+                        verbose_name="Пользователь",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Проект пользователя",
+                "verbose_name_plural": "Проекты пользователей",
+                "default_related_name": "user_projects",
+            },
+        ),
+        migrations.AddConstraint(
+            model_name="userproject",
+            constraint=models.UniqueConstraint(
+                fields=("user", "project"), name="unique_user_project"
+            ),
+        ),
+        migrations.RunPython(fill_user_projects, migrations.RunPython.noop),
+    ]
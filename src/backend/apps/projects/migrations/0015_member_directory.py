@@ -0,0 +1,163 @@
+# Generated by Django 4.2.14 on 2026-10-18 04:50
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+DIRECTORY_MEMBER_FIELDS = {
+    "member_id": "id",
+    "last_name": "user__last_name",
+    "first_name": "user__first_name",
+    "middle_name": "user__middle_name",
+    "image": "user__image",
+    "department": "department__name",
+    "position": "user__profile__position",
+    "city": "user__profile__city",
+}
+TRIGRAM_COLUMNS = ("last_name", "first_name", "middle_name", "position", "city")
+
+
+def fill_member_directory(apps, schema_editor):
+    Member = apps.get_model("projects", "Member")
+    MemberDirectory = apps.get_model("projects", "MemberDirectory")
+    rows = []
+    for values in Member.objects.values(*DIRECTORY_MEMBER_FIELDS.values()):
+        row = MemberDirectory(
+            **{
+                column: values[field]
+                for column, field in DIRECTORY_MEMBER_FIELDS.items()
+            }
+        )
+        row.city = row.city or ""
+        row.department_lower = row.department.lower()
+        row.position_lower = (row.position or "").lower()
+        row.city_lower = row.city.lower()
+        rows.append(row)
+    MemberDirectory.objects.bulk_create(rows, batch_size=1000)
+
+
+def create_trigram_indexes(apps, schema_editor):
+    # GIN-индексы есть только в PostgreSQL, в SQLite поиск работает без них
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    for column in TRIGRAM_COLUMNS:
+        schema_editor.execute(
+            f"CREATE INDEX IF NOT EXISTS projects_memberdirectory_{column}_trgm "
+            f"ON projects_memberdirectory USING gin ({column} gin_trgm_ops)"
+        )
+
+
+def drop_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    for column in TRIGRAM_COLUMNS:
+        schema_editor.execute(
+            f"DROP INDEX IF EXISTS projects_memberdirectory_{column}_trgm"
+        )
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("projects", "0014_user_project"),
+        ("users", "0006_trigram_search_indexes"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="MemberDirectory",
+            fields=[
+                (
+                    "member",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        serialize=False,
+                        to="projects.member",
+                        verbose_name="Участник",
+                    ),
+                ),
+                (
+                    "last_name",
+                    models.CharField(max_length=150, verbose_name="Имя"),
+                ),
+                (
+                    "first_name",
+                    models.CharField(max_length=150, verbose_name="Фамилия"),
+                ),
+                (
+                    "middle_name",
+                    models.CharField(max_length=150, verbose_name="Отчество"),
+                ),
+                (
+                    "image",
+                    models.ImageField(
+                        blank=True, upload_to="", verbose_name="Аватар"
+                    ),
+                ),
+                (
+                    "department",
+                    models.CharField(max_length=150, verbose_name="Отдел"),
+                ),
+                (
+                    "position",
+                    models.CharField(
+                        max_length=255, null=True, verbose_name="Должность"
+                    ),
+                ),
+                (
+                    "city",
+                    models.CharField(max_length=25, verbose_name="Город"),
+                ),
+                ("department_lower", models.CharField(max_length=150)),
+                ("position_lower", models.CharField(max_length=255)),
+                ("city_lower", models.CharField(max_length=25)),
+            ],
+            options={
+                "verbose_name": "Справочник участников",
+                "verbose_name_plural": "Справочник участников",
+                "default_related_name": "directory",
+                "indexes": [
+                    models.Index(
+                        fields=[
+                            "last_name",
+                            "first_name",
+                            "middle_name",
+                            "member",
+                        ],
+                        name="member_directory_index",
+                    ),
+                    models.Index(
+                        fields=[
+                            "department_lower",
+                            "last_name",
+                            "first_name",
+                            "middle_name",
+                            "member",
+                        ],
+                        name="directory_department_index",
+                    ),
+                    models.Index(
+                        fields=[
+                            "position_lower",
+                            "last_name",
+                            "first_name",
+                            "middle_name",
+                            "member",
+                        ],
+                        name="directory_position_index",
+                    ),
+                    models.Index(
+                        fields=[
+                            "city_lower",
+                            "last_name",
+                            "first_name",
+                            "middle_name",
+                            "member",
+                        ],
+                        name="directory_city_index",
+                    ),
+                ],
+            },
+        ),
+        migrations.RunPython(fill_member_directory, migrations.RunPython.noop),
+        migrations.RunPython(create_trigram_indexes, drop_trigram_indexes),
+    ]
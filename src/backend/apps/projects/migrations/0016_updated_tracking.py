@@ -0,0 +1,95 @@
+# Generated by Django 4.2.14 on 2026-10-18 04:57
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("projects", "0015_member_directory"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="department",
+            name="created",
+            field=models.DateTimeField(
+                auto_now_add=True,
+                default=django.utils.timezone.now,
+                verbose_name="Создано",
+            ),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name="department",
+            name="updated",
+            field=models.DateTimeField(
+                auto_now=True, db_index=True, verbose_name="Обновлено"
+            ),
+        ),
+        migrations.AddField(
+            model_name="member",
+            name="created",
+            field=models.DateTimeField(
+                auto_now_add=True,
+                default=django.utils.timezone.now,
+                verbose_name="Создано",
+            ),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name="member",
+            name="updated",
+            field=models.DateTimeField(
+                auto_now=True, db_index=True, verbose_name="Обновлено"
+            ),
+        ),
+        migrations.AddField(
+            model_name="memberdirectory",
+            name="updated",
+            field=models.DateTimeField(
+                auto_now=True, db_index=True, verbose_name="Обновлено"
+            ),
+        ),
+        migrations.AddField(
+            model_name="projectteam",
+            name="created",
+            field=models.DateTimeField(
+                auto_now_add=True,
+                default=django.utils.timezone.now,
+                verbose_name="Создано",
+            ),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name="projectteam",
+            name="updated",
+            field=models.DateTimeField(
+                auto_now=True, db_index=True, verbose_name="Обновлено"
+            ),
+        ),
+        migrations.AddField(
+            model_name="team",
+            name="created",
+            field=models.DateTimeField(
+                auto_now_add=True,
+                default=django.utils.timezone.now,
+                verbose_name="Создано",
+            ),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name="team",
+            name="updated",
+            field=models.DateTimeField(
+                auto_now=True, db_index=True, verbose_name="Обновлено"
+            ),
+        ),
+        migrations.AlterField(
+            model_name="project",
+            name="updated",
+            field=models.DateTimeField(
+                auto_now=True, db_index=True, verbose_name="Обновлено"
+            ),
+        ),
+    ]
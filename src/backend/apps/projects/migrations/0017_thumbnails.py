@@ -0,0 +1,20 @@
+# Generated by Django 4.2.14 on 2026-10-18 05:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("projects", "0016_updated_tracking"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="memberdirectory",
+            name="thumbnails_source",
+            field=models.CharField(
+                default="", max_length=100, verbose_name="Миниатюры для"
+            ),
+            preserve_default=False,
+        ),
+    ]
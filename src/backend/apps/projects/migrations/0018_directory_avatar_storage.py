@@ -0,0 +1,23 @@
+# Generated by Django 4.2.14 on 2026-10-18 06:16
+
+import apps.general.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("projects", "0017_thumbnails"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="memberdirectory",
+            name="image",
+            field=models.ImageField(
+                blank=True,
+                storage=apps.general.storage.get_avatar_storage,
+                upload_to="",
+                verbose_name="Аватар",
+            ),
+        ),
+    ]
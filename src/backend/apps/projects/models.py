@@ -1,13 +1,30 @@
 from django.contrib.auth import get_user_model
-from django.db import models
+from django.db import models, transaction
 
 from apps.general.models import CreatedField
-from .constants import MAX_LENGTH, PROJECT_MAX_LENGTH, STATUS_DISPLAY
+from apps.general.storage import get_avatar_storage
+from apps.users.constants import (
+    CITY_MAX_LENGTH,
+    MAX_LENGTH as USER_MAX_LENGTH,
+    MAX_LENGTH_NAME,
+)
+from .constants import (
+    MAX_LENGTH,
+    MEMBER_PATH_MAX_LENGTH,
+    MEMBER_PATH_SEPARATOR,
+    PROJECT_MAX_LENGTH,
+    STATUS_DISPLAY,
+)
+from .managers import (
+    MemberDirectoryQuerySet,
+    MemberQuerySet,
+    UserProjectQuerySet,
+)
 
 User = get_user_model()
 
 
-class Team(models.Model):
+class Team(CreatedField):
     name = models.CharField("Название", max_length=MAX_LENGTH, db_index=True)
     owner = models.ForeignKey(
         User, on_delete=models.CASCADE, verbose_name="Автор"
@@ -70,7 +87,7 @@ class Project(CreatedField):
         return STATUS_DISPLAY.get(self.status, "Неизвестный статус")
 
 
-class ProjectTeam(models.Model):
+class ProjectTeam(CreatedField):
     project = models.ForeignKey(Project, on_delete=models.CASCADE)
     team = models.ForeignKey(Team, on_delete=models.CASCADE)
 
@@ -83,7 +100,7 @@ class ProjectTeam(models.Model):
         return f"{self.project} - {self.team}"
 
 
-class Department(models.Model):
+class Department(CreatedField):
     name = models.CharField(
         "Отдел", max_length=MAX_LENGTH, unique=True, db_index=True
     )
@@ -96,7 +113,7 @@ class Department(models.Model):
         return self.name
 
 
-class Member(models.Model):
+class Member(CreatedField):
     team = models.ForeignKey(
         Team, on_delete=models.CASCADE, verbose_name="Команда"
     )
@@ -113,6 +130,14 @@ class Member(models.Model):
         null=True,
         blank=True,
     )
+    path = models.CharField(
+        "Путь от корня",
+        max_length=MEMBER_PATH_MAX_LENGTH,
+        blank=True,
+        editable=False,
+    )
+
+    objects = MemberQuerySet.as_manager()
 
     class Meta:
         constraints = [
@@ -120,9 +145,138 @@ class Member(models.Model):
                 fields=["team", "user"], name="unique_member"
             ),
         ]
+        indexes = [
+            models.Index(
+                fields=["path"],
+                name="member_path_index",
+                opclasses=["varchar_pattern_ops"],
+            ),
+        ]
         default_related_name = "members"
         verbose_name = "Участник"
         verbose_name_plural = "Участники"
 
     def __str__(self):
         return self.user.full_name()
+
+    def save(self, *args, **kwargs):
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            self.update_path()
+
+    def build_path(self):
+        prefix = self.parent.path if self.parent_id else ""
+        return f"{prefix}{self.id}{MEMBER_PATH_SEPARATOR}"
+
+    def update_path(self):
+        """Пересчет пути участника вместе со всем его поддеревом"""
+        old_path, self.path = self.path, self.build_path()
+        if old_path == self.path:
+            return
+        if old_path:
+            Member.objects.replace_path_prefix(old_path, self.path)
+        else:
+            Member.objects.filter(pk=self.pk).update(path=self.path)
+
+    def is_ancestor_of(self, member):
+        """Находится ли `member` в поддереве участника"""
+        return member.path.startswith(self.path)
+
+
+class UserProject(models.Model):
+    """
+    Проекция «пользователь — проект» через участие в командах.
+    Поддерживается сигналами `Member` и `ProjectTeam`, проекты пользователя
+    читаются из нее одним запросом.
+    """
+
+    user = models.ForeignKey(
+        User, on_delete=models.CASCADE, verbose_name="Пользователь"
+    )
+    project = models.ForeignKey(
+        Project, on_delete=models.CASCADE, verbose_name="Проект"
+    )
+
+    objects = UserProjectQuerySet.as_manager()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["user", "project"], name="unique_user_project"
+            ),
+        ]
+        default_related_name = "user_projects"
+        verbose_name = "Проект пользователя"
+        verbose_name_plural = "Проекты пользователей"
+
+    def __str__(self):
+        return f"{self.user} - {self.project}"
+
+
+class MemberDirectory(models.Model):
+    """
+    Плоская проекция участника для списка `/members/`.
+    Колонки фильтров хранятся в нижнем регистре, строки обновляются
+    сигналами участника, пользователя, профиля и отдела.
+    """
+
+    member = models.OneToOneField(
+        Member,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        verbose_name="Участник",
+    )
+    last_name = models.CharField("Имя", max_length=MAX_LENGTH_NAME)
+    first_name = models.CharField("Фамилия", max_length=MAX_LENGTH_NAME)
+    middle_name = models.CharField("Отчество", max_length=MAX_LENGTH_NAME)
+    image = models.ImageField("Аватар", blank=True, storage=get_avatar_storage)
+    thumbnails_source = models.CharField("Миниатюры для", max_length=100)
+    department = models.CharField("Отдел", max_length=MAX_LENGTH)
+    position = models.CharField(
+        "Должность", max_length=USER_MAX_LENGTH, null=True
+    )
+    city = models.CharField("Город", max_length=CITY_MAX_LENGTH)
+    updated = models.DateTimeField("Обновлено", auto_now=True, db_index=True)
+    department_lower = models.CharField(max_length=MAX_LENGTH)
+    position_lower = models.CharField(max_length=USER_MAX_LENGTH)
+    city_lower = models.CharField(max_length=CITY_MAX_LENGTH)
+
+    objects = MemberDirectoryQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["last_name", "first_name", "middle_name", "member"],
+                name="member_directory_index",
+            ),
+            *(
+                models.Index(
+                    fields=[
+                        f"{field}_lower",
+                        "last_name",
+                        "first_name",
+                        "middle_name",
+                        "member",
+                    ],
+                    name=f"directory_{field}_index",
+                )
+                for field in ("department", "position", "city")
+            ),
+        ]
+        default_related_name = "directory"
+        verbose_name = "Справочник участников"
+        verbose_name_plural = "Справочник участников"
+
+    def __str__(self):
+        return self.full_name()
+
+    def full_name(self):
+        return f"{self.last_name} {self.first_name} {self.middle_name}".strip()
+
+    def normalize(self):
+        """Заполнение колонок фильтров в нижнем регистре"""
+        self.city = self.city or ""  # у пользователя может не быть профиля
+        self.department_lower = self.department.lower()
+        self.position_lower = (self.position or "").lower()
+        self.city_lower = self.city.lower()
+        return self
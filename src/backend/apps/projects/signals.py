@@ -1,30 +1,225 @@
-from django.core.cache import cache
-from django.db.models.signals import post_save
+from django.db.models.signals import m2m_changed, post_delete, post_save
 from django.dispatch import receiver
+from django.utils import timezone
 
-from apps.general.constants import CacheKey
-from .models import Member, Project, Team
+from apps.general.cache import invalidate, invalidate_instance
+from apps.general.constants import CacheNamespace
+from apps.users.models import CustomUser, Profile
+from .constants import MEMBER_MOVE_FIELDS
+from .facets import FACET_FIELDS, facets_enabled, update_facets
+from .managers import DIRECTORY_MEMBER_FIELDS
+from .models import (
+    Department,
+    Member,
+    MemberDirectory,
+    Project,
+    ProjectTeam,
+    Team,
+    UserProject,
+)
+from .trees import (
+    TREE_MEMBER_FIELDS,
+    delete_member_node,
+    drop_team_trees,
+    save_member_node,
+)
+
+
+def copied_fields(prefix):
+    """Поля, которые справочник и деревья команд копируют в участника"""
+    fields = (*DIRECTORY_MEMBER_FIELDS.values(), *TREE_MEMBER_FIELDS)
+    return {
+        field.removeprefix(prefix)
+        for field in fields
+        if field.startswith(prefix) and "__" not in field.removeprefix(prefix)
+    }
+
+
+MEMBER_USER_FIELDS = {
+    CustomUser: copied_fields("user__"),
+    Profile: copied_fields("user__profile__"),
+}
+
+
+def get_users_namespaces(team_ids):
+    """Пространства имен участников переданных команд"""
+    return [
+        CacheNamespace.USER_BY_ID.format(user_id=user_id)
+        for user_id in Member.objects.filter(team_id__in=team_ids)
+        .values_list("user_id", flat=True)
+        .distinct()
+    ]
+
+
+def touch_links(project_ids=(), team_ids=()):
+    """
+    Проекты и команды показывают названия друг друга: при изменении связи
+    или названия `updated` сдвигается, и `?changed_since=` видит изменение.
+    """
+    now = timezone.now()
+    if project_ids:
+        Project.objects.filter(pk__in=project_ids).update(updated=now)
+    if team_ids:
+        Team.objects.filter(pk__in=team_ids).update(updated=now)
 
 
 @receiver(post_save, sender=Project)
-def project_post_save(sender, instance, created, **kwargs):
-    cache.delete(CacheKey.PROJECTS)
-    cache.delete(CacheKey.PROJECT_BY_ID.format(project_id=instance.id))
+@receiver(post_delete, sender=Project)
+def project_post_save(sender, instance, **kwargs):
+    if kwargs.get("raw"):
+        return
+    invalidate_instance(instance)
+
+
+@receiver(post_save, sender=Project)
+def project_renamed(sender, instance, created, update_fields, raw, **kwargs):
+    if (
+        not raw
+        and not created
+        and (update_fields is None or "name" in update_fields)
+    ):
+        touch_links(team_ids=list(instance.teams.values_list("pk", flat=True)))
+
+
+@receiver(m2m_changed, sender=Project.teams.through)
+def project_teams_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if action == "pre_clear":
+        # после очистки связанные строки уже не найти
+        related = instance.projects if reverse else instance.teams
+        instance._cleared_ids = list(related.values_list("pk", flat=True))
+        return
+    if action not in ("post_add", "post_remove", "post_clear"):
+        return
+
+    linked_ids = pk_set or getattr(instance, "_cleared_ids", [])
+    if linked_ids and reverse:
+        touch_links(project_ids=linked_ids, team_ids=[instance.id])
+    elif linked_ids:
+        touch_links(project_ids=[instance.id], team_ids=linked_ids)
+
+    users_namespaces = []
+    if reverse:
+        team_ids = [instance.id]
+    elif pk_set:
+        team_ids = pk_set
+    else:
+        # у проекта не осталось команд, участники берутся из проекции
+        team_ids = []
+        user_ids = list(
+            UserProject.objects.filter(project=instance).values_list(
+                "user_id", flat=True
+            )
+        )
+        UserProject.objects.sync(user_ids)
+        users_namespaces = [
+            CacheNamespace.USER_BY_ID.format(user_id=user_id)
+            for user_id in user_ids
+        ]
+    UserProject.objects.sync_teams(team_ids)
+    invalidate(
+        CacheNamespace.PROJECTS,
+        CacheNamespace.TEAMS,
+        *(CacheNamespace.TEAM_BY_ID.format(team_id=pk) for pk in team_ids),
+        *get_users_namespaces(team_ids),
+        *users_namespaces,
+    )
+
+
+@receiver(post_save, sender=ProjectTeam)
+@receiver(post_delete, sender=ProjectTeam)
+def project_team_post_save(sender, instance, **kwargs):
+    if kwargs.get("raw"):
+        return
+    touch_links([instance.project_id], [instance.team_id])
+    UserProject.objects.sync_teams([instance.team_id])
+    invalidate_instance(instance, *get_users_namespaces([instance.team_id]))
 
 
 @receiver(post_save, sender=Team)
-def team_post_save(sender, instance, created, **kwargs):
-    cache.delete(CacheKey.TEAMS)
-    cache.delete(CacheKey.TEAM_BY_ID.format(team_id=instance.id))
+def team_post_save(sender, instance, created, update_fields, raw, **kwargs):
+    if raw:
+        return
+    invalidate_instance(instance)
+    drop_team_trees([instance.id])
+    if not created and (update_fields is None or "name" in update_fields):
+        touch_links(
+            project_ids=list(instance.projects.values_list("pk", flat=True))
+        )
+
+
+@receiver(post_delete, sender=Team)
+def team_post_delete(sender, instance, **kwargs):
+    invalidate_instance(instance)
+    drop_team_trees([instance.id])
+
+
+@receiver(post_save, sender=Department)
+def department_post_save(sender, instance, created, raw, **kwargs):
+    if raw:
+        return
+    invalidate_instance(instance)
+    directory = MemberDirectory.objects.filter(member__department=instance)
+    removed = []
+    if facets_enabled():
+        removed = list(directory.values("department"))
+    directory.update(
+        department=instance.name,
+        department_lower=instance.name.lower(),
+        updated=timezone.now(),
+    )
+    update_facets(removed, [{"department": instance.name}] * len(removed))
+    drop_team_trees(
+        Member.objects.filter(department=instance)
+        .values_list("team_id", flat=True)
+        .distinct()
+    )
+
+
+@receiver(post_delete, sender=Department)
+def department_post_delete(sender, instance, **kwargs):
+    invalidate_instance(instance)
+
+
+@receiver(post_delete, sender=Member)
+def member_post_delete(sender, instance, **kwargs):
+    # подчиненные остаются без руководителя и становятся корнями
+    Member.objects.replace_path_prefix(instance.path, "")
+    UserProject.objects.sync([instance.user_id])
+    invalidate_instance(instance)
+    delete_member_node(instance)
 
 
 @receiver(post_save, sender=Member)
-def member_post_save(sender, instance, created, **kwargs):
-    cache.delete(CacheKey.MEMBERS)
-    cache.delete(CacheKey.TEAM_BY_ID.format(team_id=instance.team.id))
-    cache.delete(CacheKey.MEMBERS_TEAM_BY_ID.format(team_id=instance.team.id))
-
-    departments = cache.get(CacheKey.DEPARTMENTS)
-    if departments:
-        departments.add(instance.department.name)
-        cache.set(CacheKey.DEPARTMENTS, departments)
+def member_post_save(sender, instance, created, update_fields, raw, **kwargs):
+    if raw:
+        # пути и справочник пересчитываются после загрузки целиком
+        return
+    only_parent = update_fields == frozenset(MEMBER_MOVE_FIELDS)
+    if not only_parent:
+        UserProject.objects.sync([instance.user_id])
+        MemberDirectory.objects.refresh(Member.objects.filter(pk=instance.pk))
+    invalidate_instance(instance)
+    save_member_node(instance, only_parent=only_parent)
+
+
+@receiver(post_delete, sender=MemberDirectory)
+def member_directory_post_delete(sender, instance, **kwargs):
+    row = {field: getattr(instance, field) for field in FACET_FIELDS.values()}
+    update_facets(removed=[row])
+
+
+@receiver(post_save, sender=CustomUser)
+@receiver(post_save, sender=Profile)
+def member_user_post_save(sender, instance, raw, update_fields, **kwargs):
+    if raw:
+        return
+    # например, `last_login` при входе: справочник и деревья не меняются
+    if update_fields and not update_fields & MEMBER_USER_FIELDS[sender]:
+        return
+    user_id = instance.id if sender is CustomUser else instance.user_id
+    MemberDirectory.objects.refresh(Member.objects.filter(user_id=user_id))
+    drop_team_trees(
+        Member.objects.filter(user_id=user_id).values_list(
+            "team_id", flat=True
+        )
+    )
@@ -0,0 +1,176 @@
+from django.core.cache import cache
+from django.db import transaction
+
+from apps.general.cache import cache_lock
+from apps.general.constants import CacheKey
+from apps.general.routers import read_primary
+from apps.users.constants import THUMBNAIL_TREE_SIZE
+from apps.users.thumbnails import thumbnail_url
+from .constants import TEAM_TREE_TIMEOUT
+from .models import Member
+
+TREE_MEMBER_FIELDS = (
+    "id",
+    "parent_id",
+    "user_id",
+    "user__first_name",
+    "user__last_name",
+    "user__middle_name",
+    "user__image",
+    "user__thumbnails_source",
+    "department__name",
+    "user__profile__position",
+)
+
+
+def render_member(member):
+    """
+    Готовый фрагмент узла дерева.
+    Совпадает с представлением `MemberTeamSerializer` без вложенных узлов.
+    """
+    user = member.user
+    return {
+        "id": member.id,
+        "user_id": member.user_id,
+        "parent_id": member.parent_id,
+        "full_name": user.full_name(),
+        "department": member.department.name,
+        "position": user.profile.position,
+        "image": thumbnail_url(
+            user.image, user.thumbnails_source, THUMBNAIL_TREE_SIZE
+        ),
+    }
+
+
+def render_members(members):
+    """Фрагменты узлов выборки участников в порядке добавления"""
+    members = (
+        members.select_related("user__profile", "department")
+        .only(*TREE_MEMBER_FIELDS)
+        .order_by("id")
+    )
+    return {member.id: render_member(member) for member in members}
+
+
+def build_team_tree(team, max_deep=None):
+    """
+    Построение дерева команды из базы данных.
+    С `max_deep` загружаются только узлы до этой глубины.
+    """
+    if max_deep is None:
+        members = Member.objects.filter(team=team)
+    else:
+        members = Member.objects.hierarchy(team, max_deep)
+    nodes = render_members(members)
+
+    for node in nodes.values():
+        if node["user_id"] == team.owner_id:
+            return {"owner": node["id"], "nodes": nodes}
+    raise Member.DoesNotExist("Руководитель не состоит в команде.")
+
+
+def get_team_tree(team, max_deep=None):
+    """
+    Дерево команды из кэша.
+    При отсутствии полное дерево строится и материализуется, а усеченное
+    до `max_deep` строится по запросу без сохранения.
+    Построение идет под той же блокировкой, что и точечные обновления:
+    обновление, пришедшее во время построения, применяется к готовому
+    дереву, а не теряется.
+    """
+    cache_key = CacheKey.TEAM_TREE.format(team_id=team.id)
+    tree = cache.get(cache_key)
+    if tree is not None:
+        return tree
+    if max_deep is not None:
+        return build_team_tree(team, max_deep)
+
+    with cache_lock(cache_key):
+        tree = cache.get(cache_key)
+        if tree is None:
+            with read_primary():
+                tree = build_team_tree(team)
+            cache.set(cache_key, tree, TEAM_TREE_TIMEOUT)
+    return tree
+
+
+def get_member_subtree(team, member_id, max_deep):
+    """Узлы поддерева участника не глубже `max_deep` уровней"""
+    tree = cache.get(CacheKey.TEAM_TREE.format(team_id=team.id))
+    if tree is not None:
+        return tree["nodes"]
+    return render_members(Member.objects.hierarchy(team, max_deep, member_id))
+
+
+def _apply_patch(team_id, patch):
+    cache_key = CacheKey.TEAM_TREE.format(team_id=team_id)
+    with cache_lock(cache_key):
+        tree = cache.get(cache_key)
+        if tree is None:
+            return
+        if patch(tree) is False:
+            cache.delete(cache_key)
+            return
+        cache.set(cache_key, tree, TEAM_TREE_TIMEOUT)
+
+
+def _patch_team_tree(team_id, patch):
+    # после фиксации: откаченное изменение не попадает в дерево
+    transaction.on_commit(lambda: _apply_patch(team_id, patch))
+
+
+def save_member_node(member, only_parent=False):
+    """
+    Добавление или перемещение узла в материализованном дереве.
+    При `only_parent` фрагмент не рендерится заново.
+    """
+
+    def patch(tree):
+        node = tree["nodes"].get(member.id)
+        if node is not None and only_parent:
+            node["parent_id"] = member.parent_id
+        else:
+            tree["nodes"][member.id] = render_member(member)
+
+    _patch_team_tree(member.team_id, patch)
+
+
+def move_member_nodes(team_id, parents):
+    """Перемещение нескольких узлов за одно обновление дерева"""
+
+    def patch(tree):
+        for member_id, parent_id in parents.items():
+            if member_id not in tree["nodes"]:
+                return False
+            tree["nodes"][member_id]["parent_id"] = parent_id
+
+    _patch_team_tree(team_id, patch)
+
+
+def delete_member_node(member):
+    """Удаление узла, подчиненные остаются без руководителя"""
+
+    def patch(tree):
+        if tree["owner"] == member.id:
+            return False
+
+        tree["nodes"].pop(member.id, None)
+        for node in tree["nodes"].values():
+            if node["parent_id"] == member.id:
+                node["parent_id"] = None
+
+    _patch_team_tree(member.team_id, patch)
+
+
+def _drop_keys(keys):
+    for key in keys:
+        # построение, начатое до изменения, не сохранит старое дерево
+        with cache_lock(key):
+            cache.delete(key)
+
+
+def drop_team_trees(team_ids):
+    """Сброс деревьев после фиксации, если их нельзя обновить точечно"""
+    keys = [CacheKey.TEAM_TREE.format(team_id=pk) for pk in team_ids]
+    if keys:
+        transaction.on_commit(lambda: _drop_keys(keys))
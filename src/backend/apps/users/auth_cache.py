@@ -0,0 +1,128 @@
+import time
+
+from django.core.cache import cache
+from django.db import transaction
+
+from apps.general.cache import (
+    aget_generations,
+    aget_many,
+    aset_many,
+    invalidate,
+    versioned_key,
+)
+from apps.general.constants import CacheKey, CacheNamespace
+from apps.general.routers import read_primary
+from .constants import (
+    AUTH_USER_LOCAL_SIZE,
+    AUTH_USER_LOCAL_TIMEOUT,
+    AUTH_USER_TIMEOUT,
+)
+from .models import CustomUser
+
+# поля для аутентификации и проверки прав, в порядке полей модели
+AUTH_USER_FIELDS = tuple(
+    field.attname
+    for field in CustomUser._meta.concrete_fields
+    if field.attname in ("id", "is_staff", "is_active")
+)
+
+# id -> (срок годности, значения AUTH_USER_FIELDS)
+_local = {}
+
+
+def _namespace(user_id):
+    return CacheNamespace.AUTH_USER.format(user_id=user_id)
+
+
+def _cache_key(user_id):
+    # поколение читается до строки из базы: значение, прочитанное до
+    # изменения, записывается под старым поколением и уже не читается
+    return versioned_key(
+        CacheKey.AUTH_USER.format(user_id=user_id), _namespace(user_id)
+    )
+
+
+async def _acache_key(user_id):
+    generation = (await aget_generations(_namespace(user_id)))[0]
+    return f"{CacheKey.AUTH_USER.format(user_id=user_id)}:{generation}"
+
+
+def _get_local(user_id):
+    entry = _local.get(user_id)
+    if entry is not None and entry[0] > time.monotonic():
+        return entry[1]
+    return None
+
+
+def _set_local(user_id, values):
+    if len(_local) >= AUTH_USER_LOCAL_SIZE:
+        _local.clear()
+    _local[user_id] = (time.monotonic() + AUTH_USER_LOCAL_TIMEOUT, values)
+
+
+def _load(user_id):
+    with read_primary():
+        return (
+            CustomUser.objects.filter(pk=user_id)
+            .values_list(*AUTH_USER_FIELDS)
+            .first()
+        )
+
+
+def _build(values):
+    # остальные поля отложены и загрузятся из базы при обращении
+    return CustomUser.from_db(None, AUTH_USER_FIELDS, values)
+
+
+def get_auth_user(user_id):
+    """
+    Пользователь для аутентификации по id из токена или `None`.
+    Загружаются только `AUTH_USER_FIELDS`: из памяти процесса
+    (`AUTH_USER_LOCAL_TIMEOUT` секунд), из кэша (`AUTH_USER_TIMEOUT`)
+    или одним запросом к базе данных.
+    """
+    values = _get_local(user_id)
+    if values is None:
+        key = _cache_key(user_id)
+        values = cache.get(key)
+        if values is None:
+            values = _load(user_id)
+            if values is None:
+                return None
+            cache.set(key, values, AUTH_USER_TIMEOUT)
+        _set_local(user_id, values)
+    return _build(values)
+
+
+async def aget_auth_user(user_id):
+    """Асинхронный вариант `get_auth_user`"""
+    values = _get_local(user_id)
+    if values is None:
+        key = await _acache_key(user_id)
+        values = (await aget_many([key])).get(key)
+        if values is None:
+            with read_primary():
+                values = await (
+                    CustomUser.objects.filter(pk=user_id)
+                    .values_list(*AUTH_USER_FIELDS)
+                    .afirst()
+                )
+            if values is None:
+                return None
+            await aset_many({key: values}, timeout=AUTH_USER_TIMEOUT)
+        _set_local(user_id, values)
+    return _build(values)
+
+
+def forget_auth_user(user_id):
+    """
+    Сброс пользователя из кэша после фиксации изменения.
+    Память других процессов устаревает через `AUTH_USER_LOCAL_TIMEOUT`.
+    """
+
+    def forget():
+        _local.pop(user_id, None)
+        invalidate(_namespace(user_id))
+
+    _local.pop(user_id, None)
+    transaction.on_commit(forget)
@@ -7,3 +7,35 @@ MAX_LENGTH_NAME = 150
 DEFAULT_TIME_ZONE = 3
 MAX_LENGTH = 255
 CITY_MAX_LENGTH = 25
+SUGGEST_LIMIT = 10
+SUGGEST_MAX_LIMIT = 50
+SUGGEST_CHECK_INTERVAL = 5
+THUMBNAIL_TREE_SIZE = 48
+THUMBNAIL_LIST_SIZE = 96
+THUMBNAIL_PROFILE_SIZE = 256
+THUMBNAIL_SIZES = (
+    THUMBNAIL_TREE_SIZE,
+    THUMBNAIL_LIST_SIZE,
+    THUMBNAIL_PROFILE_SIZE,
+)
+THUMBNAIL_FORMAT = "webp"
+THUMBNAIL_QUALITY = 80
+THUMBNAIL_WORKERS = 2
+# аватары без миниатюр старше задержки повторяются раз в интервал
+THUMBNAIL_RETRY_DELAY = 60
+THUMBNAIL_RETRY_INTERVAL = 5 * 60
+AVATAR_FORMATS = ("JPEG", "PNG", "WEBP")
+AVATAR_MAX_PIXELS = 50_000_000
+AVATAR_UPLOAD_DIR = "uploads/avatars"
+AVATAR_UPLOAD_TYPES = {
+    "image/jpeg": "jpg",
+    "image/png": "png",
+    "image/webp": "webp",
+}
+AUTH_USER_TIMEOUT = 5 * 60
+AUTH_USER_LOCAL_TIMEOUT = 5
+AUTH_USER_LOCAL_SIZE = 10_000
+SUGGEST_USER_FIELDS = frozenset(
+    ("first_name", "last_name", "middle_name", "is_active")
+)
+SUGGEST_PROFILE_FIELDS = frozenset(("position",))
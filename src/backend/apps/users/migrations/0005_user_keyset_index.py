@@ -0,0 +1,19 @@
+# Generated by Django 4.2.14 on 2026-10-18 04:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("users", "0004_alter_customuser_first_name_and_more"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="customuser",
+            index=models.Index(
+                fields=["last_name", "first_name", "middle_name", "id"],
+                name="user_keyset_index",
+            ),
+        ),
+    ]
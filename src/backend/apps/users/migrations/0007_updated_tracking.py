@@ -0,0 +1,37 @@
+# Generated by Django 4.2.14 on 2026-10-18 04:57
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("users", "0006_trigram_search_indexes"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="customuser",
+            name="updated",
+            field=models.DateTimeField(
+                auto_now=True, db_index=True, verbose_name="Обновлено"
+            ),
+        ),
+        migrations.AddField(
+            model_name="profile",
+            name="created",
+            field=models.DateTimeField(
+                auto_now_add=True,
+                default=django.utils.timezone.now,
+                verbose_name="Создано",
+            ),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name="profile",
+            name="updated",
+            field=models.DateTimeField(
+                auto_now=True, db_index=True, verbose_name="Обновлено"
+            ),
+        ),
+    ]
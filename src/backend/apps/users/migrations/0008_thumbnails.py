@@ -0,0 +1,22 @@
+# Generated by Django 4.2.14 on 2026-10-18 05:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("users", "0007_updated_tracking"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="customuser",
+            name="thumbnails_source",
+            field=models.CharField(
+                blank=True,
+                editable=False,
+                max_length=100,
+                verbose_name="Миниатюры для",
+            ),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 4.2.14 on 2026-10-18 05:17
+
+import apps.general.storage
+import django.core.validators
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("users", "0008_thumbnails"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="customuser",
+            name="image",
+            field=models.ImageField(
+                blank=True,
+                storage=apps.general.storage.get_avatar_storage,
+                upload_to="images/users/",
+                validators=[
+                    django.core.validators.FileExtensionValidator(
+                        ["jpg", "jpeg"]
+                    )
+                ],
+                verbose_name="Аватар",
+            ),
+        ),
+    ]
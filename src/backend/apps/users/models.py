@@ -8,6 +8,8 @@ from django.core.validators import (
 from django.db import models
 from django_cleanup.cleanup import cleanup_select
 
+from apps.general.models import CreatedField
+from apps.general.storage import get_avatar_storage
 from .constants import (
     CITY_MAX_LENGTH,
     DEFAULT_TIME_ZONE,
@@ -37,10 +39,16 @@ class CustomUser(AbstractUser):
     )
     image = models.ImageField(
         upload_to="images/users/",
+        storage=get_avatar_storage,
         validators=[FileExtensionValidator(IMAGE_ALLOWED_EXTENSIONS)],
         blank=True,
         verbose_name="Аватар",
     )
+    # имя аватара, для которого готовы миниатюры
+    thumbnails_source = models.CharField(
+        "Миниатюры для", max_length=100, blank=True, editable=False
+    )
+    updated = models.DateTimeField("Обновлено", auto_now=True, db_index=True)
 
     USERNAME_FIELD = "email"
     REQUIRED_FIELDS = []
@@ -49,7 +57,11 @@ class CustomUser(AbstractUser):
     class Meta(AbstractUser.Meta):
         abstract = False
         indexes = [
-            models.Index(fields=["first_name", "last_name", "middle_name"])
+            models.Index(fields=["first_name", "last_name", "middle_name"]),
+            models.Index(
+                fields=["last_name", "first_name", "middle_name", "id"],
+                name="user_keyset_index",
+            ),
         ]
         ordering = ["last_name", "first_name", "middle_name"]
 
@@ -57,7 +69,7 @@ class CustomUser(AbstractUser):
         return f"{self.last_name} {self.first_name} {self.middle_name}".strip()
 
 
-class Profile(models.Model):
+class Profile(CreatedField):
     user = models.OneToOneField(
         CustomUser, on_delete=models.CASCADE, related_name="profile"
     )
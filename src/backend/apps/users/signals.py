@@ -1,27 +1,65 @@
-from django.core.cache import cache
-from django.db.models.signals import post_save
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
+from django.utils import timezone
+from django_cleanup.signals import cleanup_post_delete
 
-from apps.general.constants import CacheKey
+from apps.general.cache import invalidate_instance
+from .auth_cache import forget_auth_user
+from .constants import SUGGEST_PROFILE_FIELDS, SUGGEST_USER_FIELDS
 from .models import CustomUser, Profile
+from .suggest import people_index
+from .thumbnails import delete_thumbnails, schedule_thumbnails
+
+
+def changes(update_fields, fields):
+    """Могли ли измениться поля `fields` при сохранении"""
+    return update_fields is None or not fields.isdisjoint(update_fields)
 
 
 @receiver(post_save, sender=CustomUser)
-def user_signal(sender, instance, created, **kwargs):
+def user_signal(sender, instance, created, update_fields, raw, **kwargs):
+    if raw:
+        # профиль и кэши загружаемых фикстур обновляются после загрузки
+        return
     if created:
         Profile.objects.create(user=instance)
-    cache.delete(CacheKey.USERS)
+    invalidate_instance(instance)
+    forget_auth_user(instance.id)
+    if changes(update_fields, SUGGEST_USER_FIELDS):
+        transaction.on_commit(lambda: people_index.update_user(instance))
+    schedule_thumbnails(instance)
+
+
+@receiver(post_delete, sender=CustomUser)
+def user_post_delete(sender, instance, **kwargs):
+    invalidate_instance(instance)
+    forget_auth_user(instance.id)
+    transaction.on_commit(lambda: people_index.remove_user(instance.id))
 
 
 @receiver(post_save, sender=Profile)
-def profile_after_save(sender, instance, **kwargs):
-    cache.delete(CacheKey.USERS)
-    cities = cache.get(CacheKey.CITIES)
-    if cities and instance.city:
-        cities.add(instance.city)
-        cache.set(CacheKey.CITIES, cities)
-
-    positions = cache.get(CacheKey.POSITIONS)
-    if positions and instance.position:
-        positions.add(instance.position)
-        cache.set(CacheKey.POSITIONS, positions)
+def profile_after_save(
+    sender, instance, created, update_fields, raw, **kwargs
+):
+    if raw:
+        return
+    if not created:
+        # профиль — часть пользователя в списке, изменения видны по `updated`
+        CustomUser.objects.filter(pk=instance.user_id).update(
+            updated=timezone.now()
+        )
+    invalidate_instance(instance)
+    if changes(update_fields, SUGGEST_PROFILE_FIELDS):
+        transaction.on_commit(
+            lambda: people_index.update_position(
+                instance.user_id, instance.position
+            )
+        )
+
+
+@receiver(cleanup_post_delete, sender=CustomUser)
+def image_post_delete(sender, file_name, field_name, **kwargs):
+    # django_cleanup удалил замененный или осиротевший аватар
+    if field_name == "image":
+        delete_thumbnails(file_name)
@@ -0,0 +1,199 @@
+import logging
+import threading
+import time
+from bisect import bisect_left, insort
+
+from django.conf import settings
+from django.db import connection
+
+from apps.general.cache import advance_generation, get_generations
+from apps.general.constants import CacheNamespace
+from apps.general.routers import read_primary
+from .constants import SUGGEST_CHECK_INTERVAL
+from .models import CustomUser
+
+logger = logging.getLogger(__name__)
+
+
+def normalize(value):
+    return " ".join(value.lower().replace("ё", "е").split())
+
+
+def name_keys(full_name):
+    """Ключи индекса: ФИО с каждого слова, чтобы искать и по имени"""
+    words = normalize(full_name).split()
+    return [" ".join(words[i:]) for i in range(len(words))]
+
+
+class PeopleIndex:
+    """
+    Префиксный индекс людей в памяти процесса.
+    Отсортированный список ключей ищется через `bisect`, база данных
+    нужна только для построения. Изменения в своем процессе применяются
+    после фиксации транзакции, изменения из других процессов — пересборкой
+    при смене поколения `CacheNamespace.SUGGEST` (проверяется не чаще
+    `SUGGEST_CHECK_INTERVAL` секунд). Построение запускается при старте
+    воркера и идет в отдельном потоке: поиск тем временем отвечает по
+    прежнему индексу, а до первого построения — пустым списком.
+    """
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.build_lock = threading.Lock()  # одно построение за раз
+        self.keys = []  # отсортированные пары (ключ, id пользователя)
+        self.people = {}  # id -> {"id", "full_name", "position"}
+        self.generation = None
+        self.checked = 0
+
+    @property
+    def is_built(self):
+        return self.generation is not None
+
+    def _build(self):
+        generation = get_generations(CacheNamespace.SUGGEST)[0]
+        with read_primary():
+            users = list(
+                CustomUser.objects.filter(is_active=True).values_list(
+                    "id",
+                    "last_name",
+                    "first_name",
+                    "middle_name",
+                    "profile__position",
+                )
+            )
+        people, keys = {}, []
+        for user_id, last_name, first_name, middle_name, position in users:
+            full_name = f"{last_name} {first_name} {middle_name}".strip()
+            if not full_name:
+                continue
+            people[user_id] = {
+                "id": user_id,
+                "full_name": full_name,
+                "position": position,
+            }
+            keys.extend((key, user_id) for key in name_keys(full_name))
+        keys.sort()
+        with self.lock:
+            self.people, self.keys = people, keys
+            self.generation = generation
+            self.checked = time.monotonic()
+
+    def _build_in_background(self):
+        try:
+            self._build()
+        except Exception:
+            logger.exception("Не удалось перестроить индекс людей")
+        finally:
+            self.build_lock.release()
+            connection.close()
+
+    def _start_build(self):
+        """Построение в фоновом потоке, если оно еще не идет"""
+        if not settings.PEOPLE_INDEX_IN_BACKGROUND:
+            with self.build_lock:
+                self._build()
+        elif self.build_lock.acquire(blocking=False):
+            threading.Thread(
+                target=self._build_in_background,
+                name="people-index",
+                daemon=True,
+            ).start()
+
+    def start(self):
+        """Построение при запуске воркера, до первого поиска"""
+        if not self.is_built:
+            self._start_build()
+
+    def refresh(self):
+        """Построение отсутствующего и пересборка устаревшего индекса"""
+        if not self.is_built:
+            self._start_build()
+            return
+        now = time.monotonic()
+        if now - self.checked < SUGGEST_CHECK_INTERVAL:
+            return
+        self.checked = now
+        if get_generations(CacheNamespace.SUGGEST)[0] != self.generation:
+            self._start_build()
+
+    def reset(self):
+        """Построить индекс заново при следующем поиске"""
+        with self.lock:
+            self.people, self.keys = {}, []
+            self.generation = None
+            self.checked = 0
+
+    def search(self, query, limit):
+        self.refresh()
+        query = normalize(query)
+        if not query:
+            return []
+        result, seen = [], set()
+        with self.lock:
+            index = bisect_left(self.keys, (query,))
+            while index < len(self.keys) and len(result) < limit:
+                key, user_id = self.keys[index]
+                if not key.startswith(query):
+                    break
+                if user_id not in seen:
+                    seen.add(user_id)
+                    result.append(self.people[user_id])
+                index += 1
+        return result
+
+    def _remove(self, user_id):
+        person = self.people.pop(user_id, None)
+        if person is None:
+            return
+        for key in name_keys(person["full_name"]):
+            index = bisect_left(self.keys, (key, user_id))
+            if index < len(self.keys) and self.keys[index] == (key, user_id):
+                del self.keys[index]
+
+    def _patch(self, patch):
+        """
+        Изменение из своего процесса: новое поколение отправляет другие
+        процессы на пересборку, а свой индекс обновляется на месте и
+        остается актуальным, если не отставал до изменения.
+        """
+        previous, generation = advance_generation(CacheNamespace.SUGGEST)
+        if not self.is_built:
+            return
+        with self.lock:
+            patch()
+            if self.generation == previous:
+                self.generation = generation
+
+    def update_user(self, user):
+        def patch():
+            person = self.people.get(user.id)
+            position = person["position"] if person else None
+            self._remove(user.id)
+            full_name = user.full_name()
+            if not user.is_active or not full_name:
+                return
+            self.people[user.id] = {
+                "id": user.id,
+                "full_name": full_name,
+                "position": position,
+            }
+            for key in name_keys(full_name):
+                insort(self.keys, (key, user.id))
+
+        self._patch(patch)
+
+    def update_position(self, user_id, position):
+        def patch():
+            if user_id in self.people:
+                self.people[user_id] = {
+                    **self.people[user_id],
+                    "position": position,
+                }
+
+        self._patch(patch)
+
+    def remove_user(self, user_id):
+        self._patch(lambda: self._remove(user_id))
+
+
+people_index = PeopleIndex()
@@ -0,0 +1,177 @@
+import logging
+import posixpath
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from io import BytesIO
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.db import close_old_connections, transaction
+from django.db.models import F
+from django.utils import timezone
+from PIL import Image, ImageOps
+
+from apps.general.constants import CacheKey
+from .constants import (
+    THUMBNAIL_FORMAT,
+    THUMBNAIL_QUALITY,
+    THUMBNAIL_RETRY_DELAY,
+    THUMBNAIL_RETRY_INTERVAL,
+    THUMBNAIL_SIZES,
+    THUMBNAIL_WORKERS,
+)
+from .models import CustomUser
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+
+
+def thumbnail_name(name, size):
+    """`images/users/ivanov.jpg` -> `images/users/thumbs/ivanov_48.webp`"""
+    directory, filename = posixpath.split(name)
+    stem = posixpath.splitext(filename)[0]
+    return posixpath.join(
+        directory, "thumbs", f"{stem}_{size}.{THUMBNAIL_FORMAT}"
+    )
+
+
+def thumbnail_url(image, thumbnails_source, size):
+    """
+    URL миниатюры аватара, если она построена для текущего файла,
+    иначе URL оригинала.
+    """
+    if not image:
+        return None
+    if image.name != thumbnails_source:
+        return image.url
+    return image.storage.url(thumbnail_name(image.name, size))
+
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            THUMBNAIL_WORKERS, thread_name_prefix="thumbnails"
+        )
+    return _executor
+
+
+def shutdown_executor():
+    """Воркер перед выходом дожидается поставленных миниатюр"""
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=True)
+        _executor = None
+
+
+def pending_thumbnails():
+    """Аватары без миниатюр: `thumbnails_source` отстает от `image`"""
+    return (
+        CustomUser.objects.exclude(image="")
+        .exclude(image=F("thumbnails_source"))
+        .values_list("id", "image")
+    )
+
+
+def build_thumbnails(storage, name):
+    sizes = [
+        size
+        for size in THUMBNAIL_SIZES
+        if not storage.exists(thumbnail_name(name, size))
+    ]
+    if not sizes:
+        # такой же аватар уже загружался
+        return
+    with storage.open(name) as file, Image.open(file) as image:
+        # JPEG декодируется сразу в уменьшенном масштабе
+        image.draft("RGB", (max(sizes),) * 2)
+        image = ImageOps.exif_transpose(image).convert("RGB")
+        for size in sizes:
+            buffer = BytesIO()
+            ImageOps.fit(image, (size, size), Image.LANCZOS).save(
+                buffer, THUMBNAIL_FORMAT, quality=THUMBNAIL_QUALITY
+            )
+            storage.save_derived(
+                thumbnail_name(name, size), ContentFile(buffer.getvalue())
+            )
+
+
+def make_thumbnails(user_id, name):
+    """
+    Миниатюры всех размеров из `THUMBNAIL_SIZES`.
+    Имя аватара — хэш содержимого, поэтому готовые миниатюры того же файла
+    не строятся заново. После построения `thumbnails_source` сохраняется
+    через `save`, и сигналы обновляют кэш, справочник и деревья команд.
+    """
+    build_thumbnails(CustomUser._meta.get_field("image").storage, name)
+
+    user = CustomUser.objects.filter(pk=user_id, image=name).first()
+    if user is not None:
+        user.thumbnails_source = name
+        user.save(update_fields=["thumbnails_source", "updated"])
+
+
+def _make_thumbnails_in_background(user_id, name):
+    close_old_connections()
+    try:
+        make_thumbnails(user_id, name)
+    except Exception:
+        logger.exception("Не удалось построить миниатюры %s", name)
+    finally:
+        close_old_connections()
+
+
+def _retry_pending_thumbnails():
+    close_old_connections()
+    try:
+        changed_before = timezone.now() - timedelta(
+            seconds=THUMBNAIL_RETRY_DELAY
+        )
+        pending = pending_thumbnails().filter(updated__lt=changed_before)
+        for user_id, name in pending.iterator():
+            _make_thumbnails_in_background(user_id, name)
+    finally:
+        close_old_connections()
+
+
+def retry_pending_thumbnails():
+    """
+    Повтор миниатюр, потерянных вместе с пулом завершенного воркера.
+    Вызывается при старте воркера: раз в `THUMBNAIL_RETRY_INTERVAL` один
+    воркер ставит в пул аватары, ждущие миниатюр дольше
+    `THUMBNAIL_RETRY_DELAY`. Разово их строит команда `make_thumbnails`.
+    """
+    if not settings.THUMBNAILS_IN_BACKGROUND:
+        return
+    if cache.add(CacheKey.THUMBNAILS_RETRY, 1, THUMBNAIL_RETRY_INTERVAL):
+        get_executor().submit(_retry_pending_thumbnails)
+
+
+def schedule_thumbnails(user):
+    """
+    Построение миниатюр нового аватара после фиксации транзакции.
+    Запрос сохраняет только оригинал, миниатюры строятся в пуле потоков,
+    при `THUMBNAILS_IN_BACKGROUND = False` — сразу.
+    """
+    name = user.image.name
+    if not name or name == user.thumbnails_source:
+        return
+    if settings.THUMBNAILS_IN_BACKGROUND:
+        transaction.on_commit(
+            lambda: get_executor().submit(
+                _make_thumbnails_in_background, user.id, name
+            )
+        )
+    else:
+        transaction.on_commit(lambda: make_thumbnails(user.id, name))
+
+
+def delete_thumbnails(name):
+    """Миниатюры удаляются вместе с оригиналом, если он больше не нужен"""
+    storage = CustomUser._meta.get_field("image").storage
+    if storage.exists(name):
+        return
+    for size in THUMBNAIL_SIZES:
+        storage.delete(thumbnail_name(name, size))
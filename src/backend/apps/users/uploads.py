@@ -0,0 +1,44 @@
+import posixpath
+
+from django.conf import settings
+
+from apps.general.storage import HASH_LENGTH
+from .constants import AVATAR_UPLOAD_DIR, AVATAR_UPLOAD_TYPES
+from .models import CustomUser
+
+
+def avatar_storage():
+    return CustomUser._meta.get_field("image").storage
+
+
+def upload_prefix(user_id):
+    """Каталог прямых загрузок пользователя"""
+    return posixpath.join(AVATAR_UPLOAD_DIR, str(user_id), "")
+
+
+def direct_upload_enabled():
+    return hasattr(avatar_storage(), "presigned_post")
+
+
+def upload_key(user_id, sha256, ext):
+    """Ключ прямой загрузки по хэшу содержимого"""
+    return upload_prefix(user_id) + f"{sha256[:HASH_LENGTH]}.{ext}"
+
+
+def presign_avatar_upload(user_id, content_type, sha256):
+    """
+    Ключ объекта и форма для загрузки аватара клиентом напрямую в
+    хранилище. Ключ содержит SHA-256 файла, который сверяет хранилище,
+    поэтому бэкенд не читает файл, чтобы его назвать. После загрузки ключ
+    передается в `image_key`, незавершенные загрузки удаляет правило
+    жизненного цикла бакета.
+    """
+    key = upload_key(user_id, sha256, AVATAR_UPLOAD_TYPES[content_type])
+    post = avatar_storage().presigned_post(
+        key,
+        content_type,
+        sha256,
+        settings.AVATAR_MAX_UPLOAD_SIZE,
+        settings.AVATAR_UPLOAD_EXPIRES,
+    )
+    return {"key": key, **post}
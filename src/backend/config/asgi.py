@@ -3,5 +3,8 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "config.settings.local")
+# под ASGI горячие пути чтения обслуживаются асинхронными представлениями
+os.environ.setdefault("ASYNC_VIEWS", "true")
+os.environ.setdefault("SERVER_MODE", "asgi")
 
 application = get_asgi_application()
@@ -19,6 +19,7 @@ DJANGO_APPS = [
     "django.contrib.sessions",
     "django.contrib.messages",
     "django.contrib.staticfiles",
+    "django.contrib.postgres",
 ]
 
 THIRD_PARTY_APPS = [
@@ -45,6 +46,7 @@ MIDDLEWARE = [
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
+    "apps.general.middleware.ReplicaMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
 ]
@@ -74,17 +76,48 @@ WSGI_APPLICATION = "config.wsgi.application"
 # Database
 # https://docs.djangoproject.com/en/4.2/ref/settings/#databases
 
+# wsgi - воркеры gthread, asgi - воркеры uvicorn (см. gunicorn.conf.py)
+SERVER_MODE = getenv("SERVER_MODE", "wsgi")
+
 DATABASES = {
     "default": {
         "ENGINE": "django.db.backends.postgresql",
         "NAME": getenv("POSTGRES_DB", "test_db"),
         "USER": getenv("POSTGRES_USER", "admin_user"),
         "PASSWORD": getenv("POSTGRES_PASSWORD", "postgres_admin"),
-        "HOST": getenv("POSTGRES_HOST", "test_db"),
-        "PORT": getenv("POSTGRES_PORT", 5432),
+        # с PGBOUNCER_HOST соединения идут через PgBouncer (pool_mode=transaction)
+        "HOST": getenv("PGBOUNCER_HOST") or getenv("POSTGRES_HOST", "test_db"),
+        "PORT": getenv("PGBOUNCER_PORT") or getenv("POSTGRES_PORT", 5432),
+        # под WSGI соединение живет в потоке воркера: workers * threads штук;
+        # под ASGI потоки sync_to_async не закрывают соединения, поэтому 0
+        "CONN_MAX_AGE": int(
+            getenv("CONN_MAX_AGE") or (0 if SERVER_MODE == "asgi" else 60)
+        ),
+        "CONN_HEALTH_CHECKS": True,
+        # серверные курсоры не переживают смену соединения в PgBouncer
+        "DISABLE_SERVER_SIDE_CURSORS": bool(getenv("PGBOUNCER_HOST")),
     }
 }
 
+# реплики для чтения: POSTGRES_REPLICA_HOSTS=host[:port],host[:port]
+DATABASE_REPLICAS = []
+for number, replica in enumerate(
+    filter(None, getenv("POSTGRES_REPLICA_HOSTS", "").split(",")), start=1
+):
+    host, _, port = replica.strip().partition(":")
+    alias = f"replica{number}"
+    DATABASES[alias] = {
+        **DATABASES["default"],
+        "HOST": host,
+        "PORT": port or getenv("POSTGRES_PORT", 5432),
+        "DISABLE_SERVER_SIDE_CURSORS": False,
+        "TEST": {"MIRROR": "default"},
+    }
+    DATABASE_REPLICAS.append(alias)
+DATABASE_ROUTERS = ["apps.general.routers.ReplicaRouter"]
+# сколько секунд клиент читает из основной базы после своей записи
+DATABASE_REPLICA_PIN_TIMEOUT = int(getenv("POSTGRES_REPLICA_PIN_TIMEOUT", 10))
+
 
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -123,6 +156,55 @@ STATIC_ROOT = BASE_DIR / "staticfiles/static"
 MEDIA_URL = "media/"
 MEDIA_ROOT = BASE_DIR / "mediafiles"
 
+STORAGES = {
+    "default": {
+        "BACKEND": "django.core.files.storage.FileSystemStorage",
+    },
+    "staticfiles": {
+        "BACKEND": "django.contrib.staticfiles.storage.StaticFilesStorage",
+    },
+    # аватары называются по хэшу содержимого и не перезаписываются
+    "avatars": {
+        "BACKEND": "apps.general.storage.ContentHashStorage",
+        "OPTIONS": {"references": ["users.CustomUser.image"]},
+    },
+}
+# s3 - аватары в S3-совместимом хранилище с прямой загрузкой клиентом
+AVATAR_STORAGE = getenv("AVATAR_STORAGE", "filesystem")
+if AVATAR_STORAGE == "s3":
+    STORAGES["avatars"] = {
+        "BACKEND": "apps.general.s3.S3ContentHashStorage",
+        "OPTIONS": {
+            "references": ["users.CustomUser.image"],
+            "bucket_name": getenv("AWS_STORAGE_BUCKET_NAME", "avatars"),
+            "access_key": getenv("AWS_ACCESS_KEY_ID"),
+            "secret_key": getenv("AWS_SECRET_ACCESS_KEY"),
+            "region_name": getenv("AWS_S3_REGION_NAME"),
+            # MinIO: адрес для бэкенда и адрес для клиентов
+            "endpoint_url": getenv("AWS_S3_ENDPOINT_URL"),
+            "upload_endpoint_url": getenv("AWS_S3_UPLOAD_ENDPOINT_URL"),
+            "custom_domain": getenv("AWS_S3_CUSTOM_DOMAIN"),
+            "url_protocol": getenv("AWS_S3_URL_PROTOCOL", "https:"),
+            "addressing_style": "path",
+            # сохраненные аватары публичны, имя файла меняется с содержимым
+            "querystring_auth": False,
+            "file_overwrite": True,
+            "object_parameters": {
+                "CacheControl": "public, max-age=31536000, immutable",
+            },
+        },
+    }
+# время жизни presigned POST для загрузки аватара, секунд
+AVATAR_UPLOAD_EXPIRES = int(getenv("AVATAR_UPLOAD_EXPIRES", 600))
+# миниатюры аватаров строятся в пуле потоков после ответа
+THUMBNAILS_IN_BACKGROUND = True
+# индекс подсказок людей строится в фоновом потоке воркера
+PEOPLE_INDEX_IN_BACKGROUND = True
+# максимальный размер аватара, загружаемого через multipart/form-data
+AVATAR_MAX_UPLOAD_SIZE = int(
+    getenv("AVATAR_MAX_UPLOAD_SIZE", 10 * 1024 * 1024)
+)
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/4.2/ref/settings/#default-auto-field
 
@@ -130,7 +212,7 @@ DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
 REST_FRAMEWORK = {
     "DEFAULT_AUTHENTICATION_CLASSES": (
-        "rest_framework_simplejwt.authentication.JWTAuthentication",
+        "api.authentication.CachedJWTAuthentication",
     ),
     "DEFAULT_PERMISSION_CLASSES": (
         "rest_framework.permissions.IsAuthenticated",
@@ -161,10 +243,30 @@ CACHES = {
         "BACKEND": "django_redis.cache.RedisCache",
         "LOCATION": "redis://redis:6379/1",
         "OPTIONS": {
-            "CLIENT_CLASS": "django_redis.client.DefaultClient",
+            # счетчики попаданий и размеров: python manage.py cache_stats
+            "CLIENT_CLASS": "apps.general.cache_client.MeteredClient",
+            # msgpack для простых данных, pickle для моделей и QuerySet
+            "SERIALIZER": "apps.general.cache_client.HybridSerializer",
+            "COMPRESSOR": "apps.general.cache_client.ZlibCompressor",
+            "COMPRESS_MIN_LENGTH": 1024,
+            # ограниченный пул: при нехватке соединений запрос ждет timeout
+            "CONNECTION_POOL_CLASS": "redis.BlockingConnectionPool",
+            "CONNECTION_POOL_KWARGS": {
+                "max_connections": int(getenv("REDIS_MAX_CONNECTIONS", 50)),
+                "timeout": 1,
+                "health_check_interval": 30,
+            },
+            "SOCKET_CONNECT_TIMEOUT": 0.5,
+            "SOCKET_TIMEOUT": 0.5,
+            # недоступный Redis — промах кэша, а не ошибка запроса
+            "IGNORE_EXCEPTIONS": True,
         },
         "TIMEOUT": 5 * 60,
     },
 }
+DJANGO_REDIS_LOG_IGNORED_EXCEPTIONS = True
+
+# асинхронные представления горячих путей чтения (ASGI, uvicorn)
+ASYNC_VIEWS = getenv("ASYNC_VIEWS", "false").lower() == "true"
 
 CORS_ORIGIN_ALLOW_ALL = True
@@ -9,6 +9,7 @@ DATABASES = {
         "NAME": BASE_DIR / "db.sqlite3",
     }
 }
+DATABASE_REPLICAS = []
 
 CACHES = {
     "default": {
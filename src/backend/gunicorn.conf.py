@@ -0,0 +1,76 @@
+"""
+Профиль gunicorn для контейнера.
+Количество воркеров и потоков считается от доступных процессу CPU,
+любое значение можно переопределить переменными окружения `GUNICORN_*`.
+"""
+
+import os
+
+
+def env_int(name, default):
+    return int(os.getenv(name) or default)
+
+
+def cpu_count():
+    # в контейнере учитывается ограничение по ядрам (cpuset)
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+
+SERVER_MODE = os.getenv("SERVER_MODE", "wsgi")
+
+bind = os.getenv("GUNICORN_BIND", "0.0.0.0:8000")
+
+if SERVER_MODE == "asgi":
+    # один асинхронный воркер на ядро обслуживает много запросов сразу
+    wsgi_app = "config.asgi:application"
+    worker_class = "uvicorn.workers.UvicornWorker"
+    workers = env_int("GUNICORN_WORKERS", cpu_count())
+else:
+    # потоки отдают ядро, пока запрос ждет базу данных или Redis
+    wsgi_app = "config.wsgi:application"
+    worker_class = "gthread"
+    workers = env_int("GUNICORN_WORKERS", cpu_count() * 2 + 1)
+    threads = env_int("GUNICORN_THREADS", 4)
+
+# приложение импортируется до fork, память воркеров общая (copy-on-write)
+preload_app = os.getenv("GUNICORN_PRELOAD", "true").lower() == "true"
+
+# перезапуск воркеров ограничивает рост памяти, jitter разносит рестарты
+max_requests = env_int("GUNICORN_MAX_REQUESTS", 1000)
+max_requests_jitter = env_int("GUNICORN_MAX_REQUESTS_JITTER", 100)
+
+timeout = env_int("GUNICORN_TIMEOUT", 30)
+graceful_timeout = env_int("GUNICORN_GRACEFUL_TIMEOUT", 30)
+# соединения от nginx переиспользуются между запросами
+keepalive = env_int("GUNICORN_KEEPALIVE", 5)
+
+accesslog = os.getenv("GUNICORN_ACCESS_LOG", "-")
+errorlog = "-"
+
+
+def post_fork(server, worker):
+    """Воркер не наследует соединения, открытые при загрузке приложения"""
+    from django.db import connections
+
+    connections.close_all()
+
+
+def post_worker_init(worker):
+    """
+    Индекс подсказок строится при старте воркера, а не в запросе.
+    Миниатюры, потерянные завершенными воркерами, ставятся в пул заново.
+    """
+    from apps.users.suggest import people_index
+    from apps.users.thumbnails import retry_pending_thumbnails
+
+    people_index.start()
+    retry_pending_thumbnails()
+
+
+def worker_exit(server, worker):
+    """Перезапускаемый воркер достраивает поставленные миниатюры"""
+    from apps.users.thumbnails import shutdown_executor
+
+    shutdown_executor()
@@ -3,10 +3,19 @@ import random
 from datetime import timedelta
 
 import pytest
+from django.core.cache import cache
 from django.utils import timezone
 
-from apps.projects.models import Department, Member, Project, ProjectTeam, Team
+from apps.projects.models import (
+    Department,
+    Member,
+    MemberDirectory,
+    Project,
+    ProjectTeam,
+    Team,
+)
 from apps.users.models import Profile
+from apps.users.suggest import people_index
 
 TAGS_COUNT = 3
 USER_NAMES = ["Иван", "Александр", "Алексей", "Игорь", "Виктор"]
@@ -14,6 +23,12 @@ CITIES = ["City1", "City2", "City3"]
 POSITIONS = ["Position1", "Position2", "Position3", "Position4"]
 
 
+@pytest.fixture(autouse=True)
+def clear_cache():
+    cache.clear()
+    people_index.reset()
+
+
 @pytest.fixture
 def password():
     return "Qwwte7435ge!erty123"
@@ -50,13 +65,18 @@ def user_with_profile(user):
     return user
 
 
-def client_force(user):
-    from rest_framework.test import APIClient
+def auth_headers(user):
     from rest_framework_simplejwt.tokens import RefreshToken
 
     refresh = RefreshToken.for_user(user)
+    return {"HTTP_AUTHORIZATION": f"Bearer {refresh.access_token}"}
+
+
+def client_force(user):
+    from rest_framework.test import APIClient
+
     client = APIClient()
-    client.credentials(HTTP_AUTHORIZATION=f"Bearer {refresh.access_token}")
+    client.credentials(**auth_headers(user))
     return client
 
 
@@ -70,6 +90,16 @@ def user_client(user):
     return client_force(user)
 
 
+@pytest.fixture
+def admin_headers(admin_user):
+    return auth_headers(admin_user)
+
+
+@pytest.fixture
+def user_headers(user):
+    return auth_headers(user)
+
+
 @pytest.fixture
 def test_project(admin_user):
     return Project.objects.create(
@@ -134,6 +164,18 @@ def test_team(admin_user, test_departments, test_project):
     return team, member
 
 
+@pytest.fixture
+def test_team_tree(test_team, create_users):
+    team, owner = test_team
+    lead = Member.objects.create(
+        team=team, user=create_users[0], department_id=1, parent=owner
+    )
+    employee = Member.objects.create(
+        team=team, user=create_users[1], department_id=2, parent=lead
+    )
+    return team, owner, lead, employee
+
+
 @pytest.fixture
 def test_teams(create_users, test_departments):
     return Team.objects.bulk_create(
@@ -144,7 +186,7 @@ def test_teams(create_users, test_departments):
 
 @pytest.fixture
 def test_members(test_teams, create_users, test_departments):
-    return Member.objects.bulk_create(
+    members = Member.objects.bulk_create(
         [
             Member(
                 team_id=i + 1,
@@ -154,6 +196,8 @@ def test_members(test_teams, create_users, test_departments):
             for i in range(10)
         ]
     )
+    MemberDirectory.objects.refresh(Member.objects.all())
+    return members
 
 
 @pytest.fixture
@@ -1,8 +1,29 @@
+import base64
+import hashlib
 import os
+import posixpath
+import threading
+from datetime import timedelta
+from io import BytesIO
 
+import pytest
+from django.contrib.auth.models import update_last_login
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.utils import timezone
+from PIL import Image
 from rest_framework import status
 
 from api.v1.users.constants import ERROR_TELEGRAM, ERROR_TIMEZONE
+from apps.general.cache import get_generations
+from apps.general.constants import CacheKey, CacheNamespace
+from apps.users import auth_cache, thumbnails
+from apps.users.constants import THUMBNAIL_SIZES
+from apps.users.models import CustomUser
+from apps.users.suggest import people_index
+from apps.users.thumbnails import thumbnail_name
+from apps.users.uploads import avatar_storage, upload_key, upload_prefix
 from .utils import (
     API_PREFIX,
     USER_DATA,
@@ -15,6 +36,7 @@ url_users = f"{API_PREFIX}/users/"
 url_user_by_id = url_users + "{id}/"
 url_me = url_users + "me/"
 url_avatar = url_users + "avatar/"
+url_suggest = f"{API_PREFIX}/suggest/people/"
 
 
 def test_admin_create_user(admin_client):
@@ -84,6 +106,30 @@ def test_anonymous_user(client, user):
     assert response.status_code == status.HTTP_401_UNAUTHORIZED
 
 
+def test_cached_authentication(
+    user_client,
+    user,
+    django_assert_num_queries,
+    django_capture_on_commit_callbacks,
+):
+    user_client.get(url_me)
+    with django_assert_num_queries(0):
+        response = user_client.get(url_me, HTTP_IF_NONE_MATCH="*")
+    assert response.status_code == status.HTTP_304_NOT_MODIFIED
+
+    stale_key = auth_cache._cache_key(user.id)
+    with django_capture_on_commit_callbacks(execute=True):
+        user.is_active = False
+        user.save()
+        # до фиксации запросы получают прежнее значение
+        assert auth_cache.get_auth_user(user.id).is_active
+    # запрос, прочитавший строку до фиксации, пишет под старым поколением
+    cache.set(stale_key, (user.id, False, True))
+    assert not auth_cache.get_auth_user(user.id).is_active
+    response = user_client.get(url_me)
+    assert response.status_code == status.HTTP_401_UNAUTHORIZED
+
+
 def test_change_user_avatar(user_client, user):
     response = user_client.patch(
         url_avatar,
@@ -95,3 +141,293 @@ def test_change_user_avatar(user_client, user):
     user.refresh_from_db()
     assert user.image is not None
     os.remove(user.image.path)
+
+
+def jpeg_bytes(color, size=(600, 400)):
+    buffer = BytesIO()
+    Image.new("RGB", size, color).save(buffer, "JPEG")
+    return buffer.getvalue()
+
+
+def jpeg_data_url(color, size=(600, 400)):
+    data = base64.b64encode(jpeg_bytes(color, size)).decode()
+    return f"data:image/jpeg;base64,{data}"
+
+
+def test_avatar_thumbnails(
+    user_client, user, settings, tmp_path, django_capture_on_commit_callbacks
+):
+    settings.MEDIA_ROOT = tmp_path
+    settings.THUMBNAILS_IN_BACKGROUND = False
+    with django_capture_on_commit_callbacks(execute=True):
+        user_client.patch(url_avatar, data={"image": jpeg_data_url("red")})
+    user.refresh_from_db()
+    first = user.image.name
+    assert user.thumbnails_source == first
+    for size in THUMBNAIL_SIZES:
+        with Image.open(tmp_path / thumbnail_name(first, size)) as thumb:
+            assert thumb.size == (size, size)
+
+    response = user_client.get(url_user_by_id.format(id=user.id))
+    assert response.json()["image"].endswith(thumbnail_name(first, 256))
+
+    with django_capture_on_commit_callbacks(execute=True):
+        user_client.patch(url_avatar, data={"image": jpeg_data_url("blue")})
+    user.refresh_from_db()
+    assert user.thumbnails_source == user.image.name != first
+    assert not (tmp_path / thumbnail_name(first, 48)).exists()
+
+
+def test_thumbnails_retried_after_worker_exit(
+    user, settings, tmp_path, monkeypatch
+):
+    settings.MEDIA_ROOT = tmp_path
+    settings.THUMBNAILS_IN_BACKGROUND = True
+    # задача из пула завершенного воркера потеряна: миниатюр нет
+    user.image.save("lost.jpg", ContentFile(jpeg_bytes("green")))
+    CustomUser.objects.filter(pk=user.pk).update(
+        updated=timezone.now() - timedelta(hours=1)
+    )
+
+    class Executor:
+        def submit(self, fn, *args):
+            fn(*args)
+
+    monkeypatch.setattr(thumbnails, "get_executor", Executor)
+    monkeypatch.setattr(thumbnails, "close_old_connections", lambda: None)
+    cache.delete(CacheKey.THUMBNAILS_RETRY)
+    thumbnails.retry_pending_thumbnails()
+    user.refresh_from_db()
+    assert user.thumbnails_source == user.image.name
+    assert (tmp_path / thumbnail_name(user.image.name, 48)).exists()
+
+    # в пределах интервала следующий воркер проход не повторяет
+    monkeypatch.setattr(thumbnails, "_retry_pending_thumbnails", None)
+    thumbnails.retry_pending_thumbnails()
+
+
+@pytest.mark.usefixtures("create_users")
+def test_users_cursor_pagination(user_client):
+    response = user_client.get(url_users + "?cursor=&limit=4")
+    assert response.status_code == status.HTTP_200_OK
+    json_response = response.json()
+    assert len(json_response["results"]) == 4
+
+    next_page = user_client.get(json_response["next"]).json()["results"]
+    names = [
+        (user["full_name"], user["id"])
+        for user in json_response["results"] + next_page
+    ]
+    assert len(set(names)) == 8
+
+
+@pytest.mark.usefixtures("create_users")
+def test_users_search(user_client, user):
+    response = user_client.get(url_users + f"?search={user.first_name[:3]}")
+    assert response.status_code == status.HTTP_200_OK
+    names = {u["full_name"] for u in response.json()["results"]}
+    assert names
+    assert all(user.first_name in name for name in names)
+
+
+@pytest.mark.usefixtures("create_users")
+def test_suggest_people(
+    user_client,
+    user,
+    settings,
+    django_assert_num_queries,
+    django_capture_on_commit_callbacks,
+):
+    settings.PEOPLE_INDEX_IN_BACKGROUND = False
+    response = user_client.get(url_suggest + "?q=ива&limit=3")
+    assert response.status_code == status.HTTP_200_OK
+    json_response = response.json()
+    assert len(json_response) == 3
+    assert all("Иван" in person["full_name"] for person in json_response)
+
+    # вход не меняет ФИО, поколение индекса остается прежним
+    generation = get_generations(CacheNamespace.SUGGEST)
+    with django_capture_on_commit_callbacks(execute=True):
+        update_last_login(None, user)
+    assert get_generations(CacheNamespace.SUGGEST) == generation
+
+    user.last_name = "Ёлкин"
+    with django_capture_on_commit_callbacks(execute=True):
+        user.save()
+    with django_assert_num_queries(1):  # только аутентификация
+        response = user_client.get(url_suggest + "?q=елк")
+    assert response.json() == [
+        {"id": user.id, "full_name": user.full_name(), "position": None}
+    ]
+
+
+def test_suggest_people_before_build(user_client, monkeypatch):
+    # индекс строится в фоне, запрос не ждет базу данных
+    built = threading.Event()
+    monkeypatch.setattr(people_index, "_build", built.set)
+    response = user_client.get(url_suggest + "?q=ива")
+    assert response.json() == []
+    assert built.wait(timeout=5)
+
+
+def test_avatar_multipart_upload(user_client, user, settings, tmp_path):
+    settings.MEDIA_ROOT = tmp_path
+
+    def upload(content):
+        return user_client.patch(
+            url_avatar,
+            {"image": SimpleUploadedFile("photo", content)},
+            format="multipart",
+        )
+
+    response = upload(jpeg_bytes("green"))
+    assert response.status_code == status.HTTP_200_OK
+    user.refresh_from_db()
+    assert user.image.name.endswith(".jpeg")
+    with Image.open(user.image.path) as image:
+        assert image.size == (600, 400)
+
+    assert upload(b"not an image").status_code == status.HTTP_400_BAD_REQUEST
+
+    settings.AVATAR_MAX_UPLOAD_SIZE = 1000
+    response = upload(jpeg_bytes("green"))
+    assert response.status_code == status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+
+
+def test_avatar_content_addressed(
+    user_client,
+    admin_client,
+    user,
+    admin_user,
+    settings,
+    tmp_path,
+    django_capture_on_commit_callbacks,
+):
+    settings.MEDIA_ROOT = tmp_path
+    settings.THUMBNAILS_IN_BACKGROUND = False
+    with django_capture_on_commit_callbacks(execute=True):
+        for client in (user_client, admin_client):
+            client.patch(url_avatar, data={"image": jpeg_data_url("red")})
+    user.refresh_from_db()
+    admin_user.refresh_from_db()
+    shared = user.image.name
+    assert shared == admin_user.image.name
+    assert len(list((tmp_path / "images/users").glob("*.jpeg"))) == 1
+
+    # общий файл остается, пока на него ссылается другой пользователь
+    for client in (user_client, admin_client):
+        with django_capture_on_commit_callbacks(execute=True):
+            client.patch(url_avatar, data={"image": jpeg_data_url("blue")})
+        assert (tmp_path / shared).exists() == (client is user_client)
+    assert not (tmp_path / thumbnail_name(shared, 48)).exists()
+
+
+def test_avatar_direct_upload_key(user_client, user, settings, tmp_path):
+    settings.MEDIA_ROOT = tmp_path
+    content = jpeg_bytes("red")
+    sha256 = hashlib.sha256(content).hexdigest()
+    response = user_client.post(
+        url_avatar + "upload/",
+        data={"content_type": "image/jpeg", "sha256": sha256},
+    )
+    # форму выдает только хранилище S3
+    assert response.status_code == status.HTTP_404_NOT_FOUND
+
+    storage = avatar_storage()
+    key = storage.save_derived(
+        upload_key(user.id, sha256, "jpg"), ContentFile(content)
+    )
+    for wrong_key in (
+        upload_key(user.id + 1, sha256, "jpg"),
+        upload_key(user.id, sha256, "gif"),
+        upload_prefix(user.id) + "upload.jpg",
+        key.split("/")[-1],
+    ):
+        response = user_client.patch(url_avatar, data={"image_key": wrong_key})
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+    response = user_client.patch(url_avatar, data={"image_key": key})
+    assert response.status_code == status.HTTP_200_OK
+    user.refresh_from_db()
+    # имя по хэшу берется из ключа загрузки
+    assert user.image.name == f"images/users/{sha256[:32]}.jpg"
+    assert not storage.exists(key)
+
+
+def test_avatar_s3_direct_upload(
+    user_client,
+    user,
+    settings,
+    monkeypatch,
+    django_capture_on_commit_callbacks,
+):
+    moto = pytest.importorskip("moto")
+    boto3 = pytest.importorskip("boto3")
+    requests = pytest.importorskip("requests")
+    from storages.backends.s3 import S3File
+
+    from apps.general.s3 import S3ContentHashStorage
+
+    settings.THUMBNAILS_IN_BACKGROUND = False
+    with moto.mock_aws():
+        boto3.resource("s3", region_name="us-east-1").create_bucket(
+            Bucket="avatars"
+        )
+        storage = S3ContentHashStorage(
+            bucket_name="avatars",
+            access_key="testing",
+            secret_key="testing",
+            region_name="us-east-1",
+            upload_endpoint_url="http://minio.local:9000/",
+            references=["users.CustomUser.image"],
+            querystring_auth=False,
+            file_overwrite=True,
+            object_parameters={"CacheControl": "max-age=31536000"},
+        )
+        monkeypatch.setattr(user._meta.get_field("image"), "storage", storage)
+        content = jpeg_bytes("red")
+        sha256 = hashlib.sha256(content).hexdigest()
+        response = user_client.post(
+            url_avatar + "upload/",
+            data={"content_type": "image/jpeg", "sha256": sha256},
+        )
+        assert response.status_code == status.HTTP_201_CREATED
+        upload = response.json()
+        key = upload["key"]
+        assert key == upload_key(user.id, sha256, "jpg")
+        assert upload["url"] == "http://minio.local:9000/avatars/"
+        assert upload["fields"]["key"] == key
+        assert upload["fields"]["Content-Type"] == "image/jpeg"
+        assert upload["fields"]["x-amz-checksum-sha256"] == (
+            base64.b64encode(bytes.fromhex(sha256)).decode()
+        )
+
+        # подпись формы не зависит от адреса хранилища
+        response = requests.post(
+            "https://avatars.s3.amazonaws.com/",
+            data=upload["fields"],
+            files={"file": ("avatar.jpg", content)},
+        )
+        assert response.ok
+        assert storage.exists(key)
+
+        # бэкенд проверяет только метаданные и не скачивает загрузку
+        with monkeypatch.context() as patch:
+            patch.setattr(
+                S3File, "file", property(lambda f: pytest.fail("download"))
+            )
+            with django_capture_on_commit_callbacks() as callbacks:
+                response = user_client.patch(
+                    url_avatar, data={"image_key": key}
+                )
+        assert response.status_code == status.HTTP_200_OK
+        for callback in callbacks:
+            callback()
+        user.refresh_from_db()
+        assert user.image.name == f"images/users/{sha256[:32]}.jpg"
+        assert not storage.exists(key)
+        # файл скопирован внутри бакета с параметрами хранилища
+        assert storage.exists(user.image.name)
+        obj = storage.bucket.Object(user.image.name)
+        assert obj.content_type == "image/jpeg"
+        assert obj.cache_control == "max-age=31536000"
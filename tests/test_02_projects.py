@@ -1,8 +1,19 @@
+import time
+
 import pytest
+from asgiref.sync import async_to_sync
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from django.utils import timezone
-from rest_framework import status
+from django.utils.http import http_date
+from rest_framework import permissions, status, throttling
+from rest_framework.test import force_authenticate
 
-from apps.projects.models import Project
+from api.async_views import CachedReadView
+from api.v1.projects.views import ProjectViewSet
+from apps.general.constants import CacheKey, CacheNamespace
+from apps.projects.models import Project, UserProject
 from .utils import API_PREFIX
 
 url_projects = f"{API_PREFIX}/projects/"
@@ -131,3 +142,331 @@ def test_delete_team_from_project(
     )
     assert response.status_code == expected_status
     assert test_project.teams.count() == teams_count - expected_change
+
+
+@pytest.mark.usefixtures("create_projects")
+def test_projects_list_cached(admin_client, django_assert_num_queries):
+    response = admin_client.get(url_projects)
+    assert response.status_code == status.HTTP_200_OK
+
+    with django_assert_num_queries(0):
+        cached_response = admin_client.get(url_projects)
+    assert cached_response.json() == response.json()
+
+
+def test_projects_list_not_modified(
+    admin_client,
+    test_project,
+    django_assert_num_queries,
+    django_capture_on_commit_callbacks,
+):
+    response = admin_client.get(url_projects)
+    etag = response["ETag"]
+
+    with django_assert_num_queries(0):
+        response = admin_client.get(url_projects, HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == status.HTTP_304_NOT_MODIFIED
+    assert response["ETag"] == etag
+    assert not response.content
+
+    with django_capture_on_commit_callbacks(execute=True):
+        test_project.name = "renamed"
+        test_project.save()
+    response = admin_client.get(url_projects, HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == status.HTTP_200_OK
+    assert response["ETag"] != etag
+
+
+def test_projects_list_if_modified_since(admin_client, test_project):
+    # инвалидация в текущей секунде: дата не отдается и не учитывается
+    response = admin_client.get(url_projects)
+    assert not response.has_header("Last-Modified")
+    response = admin_client.get(
+        url_projects, HTTP_IF_MODIFIED_SINCE=http_date(time.time() + 60)
+    )
+    assert response.status_code == status.HTTP_200_OK
+
+    cache.set(
+        CacheKey.GENERATION.format(namespace=CacheNamespace.PROJECTS),
+        time.time_ns() - 2 * 10**9,
+        timeout=None,
+    )
+    last_modified = admin_client.get(url_projects)["Last-Modified"]
+    response = admin_client.get(
+        url_projects, HTTP_IF_MODIFIED_SINCE=last_modified
+    )
+    assert response.status_code == status.HTTP_304_NOT_MODIFIED
+
+    # при If-None-Match дата не учитывается
+    response = admin_client.get(
+        url_projects,
+        HTTP_IF_MODIFIED_SINCE=last_modified,
+        HTTP_IF_NONE_MATCH='"other"',
+    )
+    assert response.status_code == status.HTTP_200_OK
+
+
+@pytest.mark.usefixtures("create_projects")
+def test_projects_changed_since(
+    admin_client, test_project, django_capture_on_commit_callbacks
+):
+    since = timezone.now().isoformat()
+    assert admin_client.get(url_projects).json()
+    response = admin_client.get(url_projects, {"changed_since": since})
+    assert response.json() == []
+
+    with django_capture_on_commit_callbacks(execute=True):
+        test_project.description = "changed"
+        test_project.save()
+    response = admin_client.get(url_projects, {"changed_since": since})
+    assert [project["id"] for project in response.json()] == [test_project.id]
+
+
+def test_deleted_since(admin_client, test_project, test_teams):
+    url = f"{API_PREFIX}/deleted/"
+    since = timezone.now().isoformat()
+    assert admin_client.get(url).status_code == status.HTTP_400_BAD_REQUEST
+
+    project_id, team_id = test_project.id, test_teams[0].id
+    test_project.delete()
+    test_teams[0].delete()
+    response = admin_client.get(url, {"changed_since": since})
+    assert response.status_code == status.HTTP_200_OK
+    deleted = response.json()
+    assert deleted["projects"] == [project_id]
+    assert deleted["teams"] == [team_id]
+
+    since = timezone.now().isoformat()
+    response = admin_client.get(url, {"changed_since": since})
+    assert response.json()["projects"] == []
+
+
+def test_links_changed_since(admin_client, test_project, test_teams):
+    url_teams = f"{API_PREFIX}/teams/"
+    team = test_teams[0]
+
+    def changed(url, since):
+        response = admin_client.get(url, {"changed_since": since})
+        return [item["id"] for item in response.json()]
+
+    since = timezone.now().isoformat()
+    test_project.teams.add(team)
+    assert changed(url_projects, since) == [test_project.id]
+    assert changed(url_teams, since) == [team.id]
+
+    since = timezone.now().isoformat()
+    team.name = "renamed"
+    team.save()
+    assert changed(url_projects, since) == [test_project.id]
+
+    since = timezone.now().isoformat()
+    test_project.name = "renamed"
+    test_project.save()
+    assert changed(url_teams, since) == [team.id]
+
+    since = timezone.now().isoformat()
+    test_project.teams.clear()
+    assert changed(url_projects, since) == [test_project.id]
+    assert changed(url_teams, since) == [team.id]
+
+
+def test_projects_list_invalidated(
+    admin_client, test_project, test_teams, django_capture_on_commit_callbacks
+):
+    response = admin_client.get(url_projects)
+    assert response.json()[0]["teams"] == []
+
+    with django_capture_on_commit_callbacks(execute=True):
+        admin_client.put(
+            url_project_update_team_by_id.format(id=test_project.id),
+            data={"team_id": test_teams[0].id},
+        )
+    response = admin_client.get(url_projects)
+    assert response.json()[0]["teams"] == [
+        {"id": test_teams[0].id, "name": test_teams[0].name}
+    ]
+
+
+def test_projects_invalidated_after_commit(
+    admin_client, test_project, django_capture_on_commit_callbacks
+):
+    etag = admin_client.get(url_projects)["ETag"]
+    with django_capture_on_commit_callbacks() as callbacks:
+        test_project.name = "renamed"
+        test_project.save()
+        # до фиксации конкурентный запрос не кэширует старые строки
+        # под новым поколением
+        response = admin_client.get(url_projects, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == status.HTTP_304_NOT_MODIFIED
+    for callback in callbacks:
+        callback()
+    response = admin_client.get(url_projects, HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == status.HTTP_200_OK
+
+
+def test_team_members_projects_invalidated(
+    admin_client, test_project, test_team, django_capture_on_commit_callbacks
+):
+    team, _ = test_team
+    url_me = f"{API_PREFIX}/users/me/"
+    assert admin_client.get(url_me).json()["projects"] == [test_project.name]
+
+    with django_capture_on_commit_callbacks(execute=True):
+        admin_client.delete(
+            url_project_update_team_by_id.format(id=test_project.id),
+            data={"team_id": team.id},
+        )
+    assert admin_client.get(url_me).json()["projects"] == []
+
+
+def test_user_projects_projection(test_project, test_team_tree):
+    team, owner, lead, employee = test_team_tree
+
+    def project_users():
+        return set(
+            UserProject.objects.filter(project=test_project).values_list(
+                "user_id", flat=True
+            )
+        )
+
+    assert project_users() == {owner.user_id, lead.user_id, employee.user_id}
+    employee.delete()
+    assert project_users() == {owner.user_id, lead.user_id}
+    test_project.teams.clear()
+    assert project_users() == set()
+    team.projects.add(test_project)
+    assert project_users() == {owner.user_id, lead.user_id}
+
+
+@pytest.mark.usefixtures("test_team_tree")
+def test_users_list_include_projects(admin_client, test_project):
+    url_users = f"{API_PREFIX}/users/"
+    admin_client.get(url_users)
+    cache.clear()
+    with CaptureQueriesContext(connection) as plain:
+        admin_client.get(url_users)
+    cache.clear()
+    with CaptureQueriesContext(connection) as included:
+        response = admin_client.get(url_users + "?include=projects")
+    assert len(included) == len(plain) + 1
+    with CaptureQueriesContext(connection) as cached:
+        admin_client.get(url_users + "?include=projects")
+    assert len(cached) == 0
+
+    projects = {
+        user["id"]: user["projects"] for user in response.json()["results"]
+    }
+    assert projects[test_project.owner_id] == [
+        {"id": test_project.id, "name": test_project.name}
+    ]
+
+
+@pytest.mark.usefixtures("create_projects")
+def test_projects_list_cache_reads(admin_user, rf, monkeypatch):
+    view = ProjectViewSet.as_view({"get": "list"})
+    request = rf.get(url_projects)
+    force_authenticate(request, admin_user)
+    view(request)
+    calls = []
+    for name in ("get", "get_many"):
+        method = getattr(cache, name)
+        monkeypatch.setattr(
+            cache,
+            name,
+            lambda key, *args, _method=method, _name=name, **kwargs: (
+                calls.append((_name, key)) or _method(key, *args, **kwargs)
+            ),
+        )
+    request = rf.get(url_projects)
+    force_authenticate(request, admin_user)
+    response = view(request)
+    assert response.status_code == status.HTTP_200_OK
+    # поколения читаются один раз и для ETag, и для ключа страницы
+    assert [name for name, key in calls].count("get_many") == 1
+    page_prefix = CacheKey.PROJECTS_PAGE.split("{")[0]
+    page_reads = [key for name, key in calls if name == "get"]
+    assert len([k for k in page_reads if k.startswith(page_prefix)]) == 1
+
+
+@pytest.mark.usefixtures("create_projects")
+def test_projects_list_async(
+    admin_client,
+    admin_headers,
+    rf,
+    test_project,
+    django_capture_on_commit_callbacks,
+):
+    view = async_to_sync(
+        CachedReadView.as_view(ProjectViewSet, {"get": "list"})
+    )
+
+    response = view(rf.get(url_projects, **admin_headers))
+    assert response.status_code == status.HTTP_200_OK
+    assert response.content == admin_client.get(url_projects).content
+
+    with CaptureQueriesContext(connection) as queries:
+        cached = view(rf.get(url_projects, **admin_headers))
+    assert len(queries) == 0
+    assert cached.content == response.content
+
+    cached = view(
+        rf.get(
+            url_projects, HTTP_IF_NONE_MATCH=cached["ETag"], **admin_headers
+        )
+    )
+    assert cached.status_code == status.HTTP_304_NOT_MODIFIED
+
+    with django_capture_on_commit_callbacks(execute=True):
+        test_project.name = "renamed"
+        test_project.save()
+    response = view(rf.get(url_projects, **admin_headers))
+    assert "renamed" in response.content.decode()
+
+    response = view(rf.get(url_projects))
+    assert response.status_code == status.HTTP_401_UNAUTHORIZED
+
+
+class AdminProjectViewSet(ProjectViewSet):
+    permission_classes = [permissions.IsAdminUser]
+
+
+class ProjectListThrottle(throttling.UserRateThrottle):
+    rate = "2/min"
+
+
+class ThrottledProjectViewSet(ProjectViewSet):
+    throttle_classes = [ProjectListThrottle]
+
+
+@pytest.mark.usefixtures("create_projects")
+def test_async_cached_read_permissions(admin_headers, user_headers, rf):
+    view = async_to_sync(
+        CachedReadView.as_view(AdminProjectViewSet, {"get": "list"})
+    )
+    response = view(rf.get(url_projects, **admin_headers))
+    assert response.status_code == status.HTTP_200_OK
+    etag = response["ETag"]
+
+    # общий кэшированный ответ не отдается без прав на представление
+    response = view(rf.get(url_projects, **user_headers))
+    assert response.status_code == status.HTTP_403_FORBIDDEN
+    response = view(
+        rf.get(url_projects, HTTP_IF_NONE_MATCH=etag, **user_headers)
+    )
+    assert response.status_code == status.HTTP_403_FORBIDDEN
+
+
+@pytest.mark.usefixtures("create_projects")
+def test_async_cached_read_throttles(admin_headers, rf):
+    view = async_to_sync(
+        CachedReadView.as_view(ThrottledProjectViewSet, {"get": "list"})
+    )
+    statuses = [
+        view(rf.get(url_projects, **admin_headers)).status_code
+        for _ in range(3)
+    ]
+    assert statuses == [
+        status.HTTP_200_OK,
+        status.HTTP_200_OK,
+        status.HTTP_429_TOO_MANY_REQUESTS,
+    ]
@@ -1,11 +1,38 @@
+import time
+
 import pytest
+from asgiref.sync import async_to_sync, iscoroutinefunction
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.db import IntegrityError, transaction
+from django.http import HttpResponse
 from rest_framework import status
 
+from api.v1.projects.serializers import MemberTeamSerializer
+from apps.general.cache import advance_generation, get_generations
+from apps.general.cache_client import (
+    MSGPACK_MARKER,
+    HybridSerializer,
+    ZlibCompressor,
+)
+from apps.general.constants import REPLICA_PIN_COOKIE, CacheKey, CacheNamespace
+from apps.general.middleware import ReplicaMiddleware
+from apps.general.routers import (
+    ReplicaRouter,
+    read_primary,
+    read_primary_if_changed,
+)
+from apps.projects.models import Member, MemberDirectory, UserProject
+from apps.projects.trees import get_team_tree
 from .utils import API_PREFIX
 
 url_teams = f"{API_PREFIX}/teams/"
 url_teams_by_id = url_teams + "{id}/"
 url_add_member_to_team = url_teams_by_id + "member/"
+url_change_employee = url_teams_by_id + "change_employee/"
+url_change_employees = url_teams_by_id + "change_employees/"
+url_import_members = url_teams_by_id + "members/import/"
+url_member_subtree = url_teams_by_id + "members/{member_id}/subtree/"
 
 
 @pytest.mark.usefixtures("test_team")
@@ -49,3 +76,378 @@ def test_add_user_to_team(
         data=data,
     )
     assert response.status_code == expected_status
+
+
+def test_team_tree_nodes(test_team_tree):
+    team, *members = test_team_tree
+    nodes = get_team_tree(team)["nodes"]
+    for member in members:
+        assert nodes[member.id] == MemberTeamSerializer(member).data
+
+
+def test_change_employee_patches_tree(
+    admin_client, test_team_tree, django_capture_on_commit_callbacks
+):
+    team, owner, lead, employee = test_team_tree
+    url = url_teams_by_id.format(id=team.id)
+    subordinates = admin_client.get(url).json()["employees"]["subordinates"]
+    assert [node["id"] for node in subordinates] == [lead.id]
+
+    with django_capture_on_commit_callbacks(execute=True):
+        response = admin_client.put(
+            url_change_employee.format(id=team.id),
+            data={"member_id": employee.id, "parent_id": owner.id},
+        )
+    assert response.status_code == status.HTTP_200_OK
+    assert cache.get(CacheKey.TEAM_TREE.format(team_id=team.id)) is not None
+
+    subordinates = admin_client.get(url).json()["employees"]["subordinates"]
+    assert [node["id"] for node in subordinates] == [lead.id, employee.id]
+    assert subordinates[0]["subordinates"] == []
+
+
+def test_add_member_patches_tree(
+    admin_client, test_team_tree, user, django_capture_on_commit_callbacks
+):
+    team, owner, *_ = test_team_tree
+    url = url_teams_by_id.format(id=team.id)
+    admin_client.get(url)
+
+    # откаченное добавление не попадает в материализованное дерево
+    with django_capture_on_commit_callbacks(execute=True):
+        with pytest.raises(IntegrityError), transaction.atomic():
+            member = Member.objects.create(
+                team=team, user=user, department_id=1, parent=owner
+            )
+            Member.objects.create(team=team, user=user, department_id=1)
+    tree = cache.get(CacheKey.TEAM_TREE.format(team_id=team.id))
+    assert member.id not in tree["nodes"]
+
+    with django_capture_on_commit_callbacks(execute=True):
+        admin_client.post(
+            url_add_member_to_team.format(id=team.id),
+            data={"user_id": user.id, "parent_id": owner.id},
+        )
+    subordinates = admin_client.get(url).json()["employees"]["subordinates"]
+    assert subordinates[-1]["user_id"] == user.id
+
+
+def test_members_hierarchy(test_team_tree):
+    team, owner, lead, employee = test_team_tree
+    ids = set(Member.objects.hierarchy(team, 1).values_list("id", flat=True))
+    assert ids == {owner.id, lead.id}
+
+    ids = set(
+        Member.objects.hierarchy(team, 1, lead.id).values_list("id", flat=True)
+    )
+    assert ids == {lead.id, employee.id}
+
+
+@pytest.mark.parametrize("materialized", (False, True))
+def test_member_subtree(user_client, test_team_tree, materialized):
+    team, owner, lead, employee = test_team_tree
+    if materialized:
+        get_team_tree(team)
+
+    url = url_member_subtree.format(id=team.id, member_id=lead.id)
+    response = user_client.get(url + "?deep=1")
+    assert response.status_code == status.HTTP_200_OK
+    json_response = response.json()
+    assert json_response["id"] == lead.id
+    assert [node["id"] for node in json_response["subordinates"]] == [
+        employee.id
+    ]
+
+    assert json_response["subordinates"][0]["subordinates"] == []
+
+    url = url_member_subtree.format(id=team.id + 1, member_id=lead.id)
+    assert user_client.get(url).status_code == status.HTTP_404_NOT_FOUND
+
+
+def test_delete_team_and_department(
+    user_client,
+    test_teams,
+    test_departments,
+    django_capture_on_commit_callbacks,
+):
+    team, department = test_teams[0], test_departments[0]
+    Member.objects.create(
+        team=team, user=team.owner, department=test_departments[1]
+    )
+    url = url_teams_by_id.format(id=team.id)
+    assert user_client.get(url).status_code == status.HTTP_200_OK
+    assert cache.get(CacheKey.TEAM_TREE.format(team_id=team.id)) is not None
+    (teams,) = get_generations(CacheNamespace.TEAMS)
+
+    with django_capture_on_commit_callbacks(execute=True):
+        team.delete()
+    assert get_generations(CacheNamespace.TEAMS) != [teams]
+    assert cache.get(CacheKey.TEAM_TREE.format(team_id=team.id)) is None
+    assert user_client.get(url).status_code == status.HTTP_404_NOT_FOUND
+
+    (members,) = get_generations(CacheNamespace.MEMBERS)
+    with django_capture_on_commit_callbacks(execute=True):
+        department.delete()
+    assert get_generations(CacheNamespace.MEMBERS) != [members]
+
+
+def test_team_not_modified(
+    admin_client, test_team_tree, django_capture_on_commit_callbacks
+):
+    team, owner, lead, employee = test_team_tree
+    url = url_teams_by_id.format(id=team.id)
+    etag = admin_client.get(url)["ETag"]
+    response = admin_client.get(url, HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == status.HTTP_304_NOT_MODIFIED
+
+    with django_capture_on_commit_callbacks(execute=True):
+        admin_client.put(
+            url_change_employee.format(id=team.id),
+            data={"member_id": employee.id, "parent_id": owner.id},
+        )
+    response = admin_client.get(url, HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == status.HTTP_200_OK
+
+
+def test_change_employee_to_subordinate(admin_client, test_team_tree):
+    team, owner, lead, employee = test_team_tree
+    response = admin_client.put(
+        url_change_employee.format(id=team.id),
+        data={"member_id": lead.id, "parent_id": employee.id},
+    )
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+    lead.refresh_from_db()
+    assert lead.parent_id == owner.id
+
+
+def test_member_paths(test_team_tree, user):
+    team, owner, lead, employee = test_team_tree
+    assert employee.path == f"{owner.id}/{lead.id}/{employee.id}/"
+
+    other = Member.objects.create(
+        team=team, user=user, department_id=1, parent=owner
+    )
+    lead.parent = other
+    lead.save()
+    employee.refresh_from_db()
+    assert employee.path == f"{other.path}{lead.id}/{employee.id}/"
+    assert other.is_ancestor_of(employee)
+
+    lead.delete()
+    employee.refresh_from_db()
+    assert employee.path == f"{employee.id}/"
+    assert not other.is_ancestor_of(employee)
+
+
+def test_change_employees(
+    admin_client, test_team_tree, user, django_capture_on_commit_callbacks
+):
+    team, owner, lead, employee = test_team_tree
+    other = Member.objects.create(
+        team=team, user=user, department_id=1, parent=owner
+    )
+    url = url_teams_by_id.format(id=team.id)
+    admin_client.get(url)
+
+    moves = [
+        {"member_id": employee.id, "parent_id": owner.id},
+        {"member_id": lead.id, "parent_id": other.id},
+        {"member_id": employee.id, "parent_id": lead.id},
+    ]
+    with django_capture_on_commit_callbacks(execute=True):
+        response = admin_client.put(
+            url_change_employees.format(id=team.id), data=moves, format="json"
+        )
+    assert response.status_code == status.HTTP_200_OK
+
+    employee.refresh_from_db()
+    assert employee.parent_id == lead.id
+    assert employee.path == f"{owner.id}/{other.id}/{lead.id}/{employee.id}/"
+
+    subordinates = admin_client.get(url).json()["employees"]["subordinates"]
+    assert [node["id"] for node in subordinates] == [other.id]
+    assert subordinates[0]["subordinates"][0]["subordinates"][0]["id"] == (
+        employee.id
+    )
+
+
+def test_change_employees_invalid(admin_client, test_team_tree):
+    team, owner, lead, employee = test_team_tree
+    moves = [
+        {"member_id": owner.id, "parent_id": lead.id},
+        {"member_id": lead.id, "parent_id": lead.id},
+        {"member_id": employee.id, "parent_id": owner.id},
+    ]
+    response = admin_client.put(
+        url_change_employees.format(id=team.id), data=moves, format="json"
+    )
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+    errors = response.json()
+    assert "parent_id" in errors[0]
+    assert "member_id" in errors[1]
+    assert errors[2] == {}
+    employee.refresh_from_db()
+    assert employee.parent_id == lead.id
+
+
+def test_import_members(admin_client, test_team_tree, create_users):
+    team, owner, *_ = test_team_tree
+    url = url_import_members.format(id=team.id)
+    rows = [
+        "email,parent,department",
+        f"{create_users[2].email},{owner.user.email},Department 1",
+        f"{create_users[3].email},{create_users[2].email},New department",
+        f"{create_users[4].email},{create_users[5].email},Department 1",
+        f"{create_users[0].email},,Department 1",
+        "unknown@example.com,,Department 1",
+    ]
+    response = admin_client.post(
+        url, data="\n".join(rows), content_type="text/csv"
+    )
+    assert response.status_code == status.HTTP_201_CREATED
+    json_response = response.json()
+    assert json_response["created"] == 2
+    # номера строк файла, заголовок — первая строка
+    assert sorted(error["line"] for error in json_response["errors"]) == [
+        4,
+        5,
+        6,
+    ]
+
+    member = Member.objects.get(team=team, user=create_users[3])
+    assert member.department.name == "New department"
+    assert member.parent.user == create_users[2]
+    assert member.path.startswith(owner.path)
+
+
+def test_import_members_malformed(admin_client, test_team, user):
+    team, owner = test_team
+    url = url_import_members.format(id=team.id)
+    lines = [
+        "{broken",
+        "",
+        f'{{"email": "{user.email}", "department": "Department 1"}}',
+    ]
+    response = admin_client.post(
+        url, data="\n".join(lines), content_type="application/x-ndjson"
+    )
+    assert response.status_code == status.HTTP_201_CREATED
+    assert response.json() == {
+        "created": 1,
+        "errors": [
+            {"line": 1, "errors": {"non_field_errors": "Некорректный JSON."}}
+        ],
+    }
+
+    response = admin_client.post(
+        url,
+        data="email,parent,department\n".encode() + b"\xff\xfe,,x\n",
+        content_type="text/csv",
+    )
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+
+def test_import_members_json(admin_client, user_client, test_team, user):
+    team, owner = test_team
+    url = url_import_members.format(id=team.id)
+    data = [{"email": user.email, "department": "Department 1"}]
+    response = user_client.post(url, data=data, format="json")
+    assert response.status_code == status.HTTP_403_FORBIDDEN
+
+    response = admin_client.post(url, data=data, format="json")
+    assert response.json() == {"created": 1, "errors": []}
+    assert Member.objects.get(team=team, user=user).parent is None
+
+
+def test_import_members_command(tmp_path, test_team, user):
+    team, owner = test_team
+    path = tmp_path / "members.jsonl"
+    path.write_text(
+        f'{{"email": "{user.email}", "parent": "{owner.user.email}", '
+        '"department": "Department 2"}\n'
+    )
+    call_command("import_members", team.id, path)
+    assert Member.objects.get(team=team, user=user).parent == owner
+
+    path = tmp_path / "members.csv"
+    path.write_bytes(b"email,parent,department\n\xff,,x\n")
+    with pytest.raises(CommandError, match="UTF-8"):
+        call_command("import_members", team.id, path)
+
+
+@pytest.mark.django_db
+def test_add_fake_data(settings, tmp_path, django_capture_on_commit_callbacks):
+    settings.MEDIA_ROOT = tmp_path
+    settings.PASSWORD_HASHERS = [
+        "django.contrib.auth.hashers.MD5PasswordHasher"
+    ]
+    settings.THUMBNAILS_IN_BACKGROUND = False
+    with django_capture_on_commit_callbacks(execute=True):
+        call_command("add_fake_data")
+    # сигналы пропускают строки фикстур, производные данные строятся после
+    lead = Member.objects.filter(parent__isnull=False).first()
+    assert lead.path == lead.parent.path + f"{lead.id}/"
+    assert MemberDirectory.objects.count() == Member.objects.count()
+    assert UserProject.objects.exists()
+
+
+def test_replica_routing(rf, settings):
+    settings.DATABASE_REPLICAS = ["replica1"]
+    settings.DATABASE_REPLICA_PIN_TIMEOUT = 1
+
+    def view(request):
+        if request.GET.get("changed"):
+            advance_generation(CacheNamespace.TEAMS)
+            read_primary_if_changed(get_generations(CacheNamespace.TEAMS))
+        return HttpResponse(ReplicaRouter().db_for_read(Member))
+
+    middleware = ReplicaMiddleware(view)
+    assert middleware(rf.get(url_teams)).content == b"replica1"
+    assert middleware(rf.get(url_teams, {"changed": 1})).content == b"default"
+
+    response = middleware(rf.post(url_teams))
+    assert response.content == b"default"
+    pin = response.cookies[REPLICA_PIN_COOKIE]
+    request = rf.get(url_teams)
+    request.COOKIES[REPLICA_PIN_COOKIE] = pin.value
+    assert middleware(request).content == b"default"
+    assert middleware(rf.get(url_teams)).content == b"replica1"
+    assert ReplicaRouter().db_for_read(Member) == "default"
+    for expired in (str(time.time() - 1), "invalid"):
+        request = rf.get(url_teams)
+        request.COOKIES[REPLICA_PIN_COOKIE] = expired
+        assert middleware(request).content == b"replica1"
+
+    # в ASGI цепочка остается асинхронной
+    async def async_view(request):
+        return view(request)
+
+    async_middleware = ReplicaMiddleware(async_view)
+    assert iscoroutinefunction(async_middleware)
+    response = async_to_sync(async_middleware)(rf.get(url_teams))
+    assert response.content == b"replica1"
+
+    # кэши и индексы строятся по основной базе
+    def build_view(request):
+        with read_primary():
+            return HttpResponse(ReplicaRouter().db_for_read(Member))
+
+    assert ReplicaMiddleware(build_view)(rf.get(url_teams)).content == (
+        b"default"
+    )
+
+
+def test_team_tree_cache_encoding(test_team_tree):
+    serializer = HybridSerializer({})
+    compressor = ZlibCompressor({"COMPRESS_MIN_LENGTH": 100})
+    tree = get_team_tree(test_team_tree[0])
+
+    payload = serializer.dumps(tree)
+    assert payload.startswith(MSGPACK_MARKER)
+    stored = compressor.compress(payload)
+    assert len(stored) < len(payload)
+    assert serializer.loads(compressor.decompress(stored)) == tree
+
+    assert compressor.compress(b"short") == b"short"
+    member = Member.objects.first()
+    assert serializer.loads(serializer.dumps(member)) == member
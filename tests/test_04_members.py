@@ -1,10 +1,27 @@
+import base64
+import json
+from contextlib import contextmanager
+
 import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
 from rest_framework import status
 
+from apps.projects import facets
+from apps.projects.constants import FACETS_LOCK_WAIT
+from apps.projects.models import MemberDirectory
+from apps.users.uploads import avatar_storage
 from .utils import API_PREFIX, MEMBER_FIELDS, check_fields
 
 url_members = f"{API_PREFIX}/members/"
 url_members_by_id = url_members + "{id}/"
+url_members_facets = url_members + "facets/"
+url_filters = f"{API_PREFIX}/filters/"
+
+
+def encode_cursor(values):
+    return base64.urlsafe_b64encode(json.dumps(values).encode()).decode()
 
 
 @pytest.mark.usefixtures("test_members")
@@ -34,3 +51,149 @@ def test_filter_members(user_client, search, expected_fn):
     json_response = response.json()["results"]
     assert isinstance(json_response, list)
     assert expected_fn(json_response)
+
+
+@pytest.mark.usefixtures("test_members")
+def test_members_cursor_pagination(user_client):
+    members = user_client.get(url_members).json()
+    ids = []
+    url = url_members + "?cursor="
+    while url:
+        response = user_client.get(url)
+        assert response.status_code == status.HTTP_200_OK
+        json_response = response.json()
+        assert "count" not in json_response
+        ids.extend(member["id"] for member in json_response["results"])
+        url = json_response["next"]
+
+    assert len(ids) == members["count"]
+    assert len(set(ids)) == len(ids)
+
+
+@pytest.mark.parametrize(
+    "cursor",
+    [
+        "invalid",
+        encode_cursor([{}, "a", "b", 1]),
+        encode_cursor(["a", "b", "c", [1]]),
+        encode_cursor(["a", "b", "c", "x"]),
+        encode_cursor(["a", "b", "c", True]),
+        encode_cursor(["a", "b", None, 1]),
+    ],
+)
+def test_members_invalid_cursor(user_client, cursor):
+    response = user_client.get(url_members, {"cursor": cursor})
+    assert response.status_code == status.HTTP_404_NOT_FOUND
+
+
+def test_members_directory_updated(user_client, test_member):
+    profile = test_member.user.profile
+    profile.city = "Новгород"
+    profile.save()
+    test_member.department.name = "Аналитика"
+    test_member.department.save()
+
+    response = user_client.get(url_members + "?city=новгород")
+    json_response = response.json()["results"]
+    assert [member["id"] for member in json_response] == [test_member.id]
+    assert json_response[0]["department"] == "Аналитика"
+
+    test_member.delete()
+    response = user_client.get(url_members + "?city=Новгород")
+    assert response.json()["results"] == []
+
+
+@pytest.mark.usefixtures("test_members_with_profile")
+def test_members_facets(user_client):
+    response = user_client.get(url_members_facets)
+    assert response.status_code == status.HTTP_200_OK
+    facets = response.json()
+    assert sum(item["count"] for item in facets["departments"]) == 10
+    assert sum(item["count"] for item in facets["cities"]) == 10
+    city = facets["cities"][0]
+
+    count = user_client.get(url_members + f"?city={city['value']}").json()
+    facets = user_client.get(
+        url_members_facets + f"?city={city['value'].lower()}"
+    ).json()
+    assert facets["cities"] == [city]
+    assert city["count"] == count["count"]
+    assert sum(item["count"] for item in facets["positions"]) == city["count"]
+
+    filters = user_client.get(url_filters).json()
+    assert filters["cities"] == [
+        item["value"]
+        for item in user_client.get(url_members_facets).json()["cities"]
+    ]
+
+
+@pytest.mark.usefixtures("test_members_with_profile")
+def test_members_facets_while_building(monkeypatch):
+    class Pipeline:
+        def __enter__(self):
+            return self
+
+        def __exit__(self, *exc):
+            return False
+
+        def hgetall(self, key):
+            pass
+
+        def execute(self):
+            return [{} for _ in facets.FACET_FIELDS]
+
+    class Redis:
+        def pipeline(self, **kwargs):
+            return Pipeline()
+
+    @contextmanager
+    def busy_lock(key, blocking_timeout=None):
+        assert blocking_timeout == FACETS_LOCK_WAIT
+        yield False
+
+    def build(redis, queryset):
+        raise AssertionError("хэши строит другой запрос")
+
+    monkeypatch.setattr(facets, "get_redis", Redis)
+    monkeypatch.setattr(facets, "cache_lock", busy_lock)
+    monkeypatch.setattr(facets, "_build_facets", build)
+    queryset = MemberDirectory.objects.all()
+    assert facets.get_facets(queryset) == facets.count_facets(queryset)
+
+
+def test_members_directory_skips_untracked_fields(test_member):
+    user = test_member.user
+    user.last_login = timezone.now()
+    with CaptureQueriesContext(connection) as queries:
+        user.save(update_fields=["last_login"])
+    assert not any("memberdirectory" in q["sql"] for q in queries)
+
+    user.first_name = "Анна"
+    with CaptureQueriesContext(connection) as queries:
+        user.save(update_fields=["first_name"])
+    assert any("memberdirectory" in q["sql"] for q in queries)
+
+
+def test_members_changed_since(
+    user_client, test_member, django_capture_on_commit_callbacks
+):
+    since = timezone.now().isoformat()
+    response = user_client.get(url_members, {"changed_since": since})
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json()["results"] == []
+
+    profile = test_member.user.profile
+    profile.position = "Аналитик"
+    with django_capture_on_commit_callbacks(execute=True):
+        profile.save()
+    response = user_client.get(url_members, {"changed_since": since})
+    assert [m["id"] for m in response.json()["results"]] == [test_member.id]
+
+    response = user_client.get(url_members, {"changed_since": "yesterday"})
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+
+def test_members_directory_avatar_storage():
+    # URL аватара в /members/ строится тем же хранилищем, что и в /users/
+    directory_storage = MemberDirectory._meta.get_field("image").storage
+    assert directory_storage is avatar_storage()